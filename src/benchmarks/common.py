@@ -0,0 +1,84 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+
+import json
+import logging
+import os
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def summarize_latencies(samples_ms: list[float]) -> dict[str, float]:
+    """
+    Summarizes latency samples into the percentiles we report.
+
+    Parameters
+    ----------
+    samples_ms : list[float]
+        Latency samples in milliseconds.
+
+    Returns
+    -------
+    dict[str, float]
+        'count', 'mean', 'p50', 'p95', 'p99' and 'max' (all but 'count' in ms).
+    """
+    if not samples_ms:
+        return {"count": 0}
+
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "count": int(samples.size),
+        "mean": round(float(samples.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(samples.max()), 3),
+    }
+
+
+def load_jsonl(path: str) -> list[dict[str, Any]]:
+    """
+    Reads a JSON Lines file, skipping blank lines.
+
+    Parameters
+    ----------
+    path : str
+        Path to the .jsonl file.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        One dictionary per non-empty line.
+    """
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_report(report: dict[str, Any], output_path: str | None) -> None:
+    """
+    Writes a benchmark report as JSON to a file, or logs it if no path is given.
+
+    Parameters
+    ----------
+    report : dict[str, Any]
+        The machine-readable report.
+    output_path : str | None
+        Destination file path, or None to only log the report.
+
+    Returns
+    -------
+    None
+    """
+    serialized = json.dumps(report, indent=2, ensure_ascii=False)
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(serialized)
+        logger.info("Report written to %s", output_path)
+    else:
+        logger.info("Report:\n%s", serialized)
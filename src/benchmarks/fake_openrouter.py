@@ -0,0 +1,339 @@
+"""
+An OpenAI-compatible stand-in for OpenRouter, used to load-test the API offline.
+
+It serves POST /v1/chat/completions, with and without streaming, and returns
+canned text after a simulated delay. A configurable fraction of requests fails.
+The delay has two parts:
+
+- time to first token, drawn from a fixed, uniform or lognormal distribution;
+- a fixed inter-token delay per streamed chunk.
+
+A non-streaming completion waits for the whole generation before answering.
+GET /stats returns request and error counts.
+
+Point the API at it with OPENROUTER_BASE_URL:
+
+    python -m src.benchmarks.fake_openrouter --port 8011 --ttft-ms 400 --error-rate 0.02
+    OPENROUTER_BASE_URL=http://127.0.0.1:8011/v1 OPENROUTER_API_KEY=fake \\
+        uvicorn src.rag_api.api:app
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from src.rag_api.modules.logs import setup_logging
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+ANSWER_WORDS = (
+    "Zgodnie z informacjami na stronie Wydziału Matematyki i Nauk Informacyjnych "
+    "odpowiedź na to pytanie znajduje się w regulaminie studiów oraz w ogłoszeniach "
+    "dziekanatu, które są regularnie aktualizowane przed rozpoczęciem semestru."
+).split()
+
+
+class FakeLLMConfig:
+    """
+    Latency, length and failure settings of the stand-in server.
+    """
+
+    def __init__(
+        self,
+        ttft_ms: float = 400.0,
+        distribution: str = "lognormal",
+        spread: float = 0.5,
+        token_delay_ms: float = 15.0,
+        tokens: int = 60,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        ttft_ms : float, optional
+            Median time to first token in milliseconds, by default 400.
+        distribution : str, optional
+            "fixed", "uniform" (median +/- spread * median) or "lognormal"
+            (sigma = spread), by default "lognormal".
+        spread : float, optional
+            Width of the distribution, by default 0.5.
+        token_delay_ms : float, optional
+            Delay between streamed chunks in milliseconds, by default 15.
+        tokens : int, optional
+            Number of chunks (words) per answer, by default 60.
+        error_rate : float, optional
+            Fraction of requests answered with an error, by default 0.
+        error_status : int, optional
+            HTTP status of the simulated errors, by default 503.
+        seed : int | None, optional
+            Seed of the random generator, for reproducible runs.
+
+        Raises
+        ------
+        ValueError
+            If the distribution is not supported.
+        """
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unsupported latency distribution: {distribution}")
+        self.ttft_ms = ttft_ms
+        self.distribution = distribution
+        self.spread = spread
+        self.token_delay_ms = token_delay_ms
+        self.tokens = max(1, tokens)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+
+    def sample_ttft(self) -> float:
+        """
+        Draws a time to first token, in seconds.
+        """
+        if self.distribution == "fixed":
+            ms = self.ttft_ms
+        elif self.distribution == "uniform":
+            ms = self.rng.uniform(
+                self.ttft_ms * (1 - self.spread), self.ttft_ms * (1 + self.spread)
+            )
+        else:
+            ms = self.ttft_ms * math.exp(self.rng.gauss(0.0, self.spread))
+        return max(ms, 0.0) / 1000
+
+    def should_fail(self) -> bool:
+        """
+        Decides whether the current request fails.
+        """
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Returns the settings, for inclusion in reports.
+        """
+        return {
+            "ttft_ms": self.ttft_ms,
+            "distribution": self.distribution,
+            "spread": self.spread,
+            "token_delay_ms": self.token_delay_ms,
+            "tokens": self.tokens,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status,
+        }
+
+
+def _answer_chunks(tokens: int) -> list[str]:
+    """
+    Returns the streamed pieces of a canned answer with the given number of words.
+    """
+    words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(tokens)]
+    return [words[0], *(f" {word}" for word in words[1:])]
+
+
+def create_app(config: FakeLLMConfig) -> FastAPI:
+    """
+    Creates the stand-in server application.
+
+    Parameters
+    ----------
+    config : FakeLLMConfig
+        Latency, length and failure settings.
+
+    Returns
+    -------
+    FastAPI
+        The application.
+    """
+    app = FastAPI()
+    stats = {
+        "requests": 0,
+        "streams": 0,
+        "errors": 0,
+        "in_flight": 0,
+        "max_in_flight": 0,
+    }
+
+    @app.get("/stats")
+    async def stats_endpoint() -> dict[str, Any]:
+        return {**stats, "config": config.as_dict()}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Any:
+        body = await request.json()
+        model = body.get("model", "fake")
+        stream = bool(body.get("stream"))
+        ttft = config.sample_ttft()
+        token_delay = config.token_delay_ms / 1000
+        chunks = _answer_chunks(config.tokens)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        stats["requests"] += 1
+        stats["streams"] += stream
+
+        if config.should_fail():
+            stats["errors"] += 1
+            await asyncio.sleep(ttft)
+            return JSONResponse(
+                status_code=config.error_status,
+                content={
+                    "error": {
+                        "message": "Simulated upstream failure.",
+                        "code": config.error_status,
+                    }
+                },
+            )
+
+        def chunk(delta: dict[str, str], finish_reason: str | None = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events() -> AsyncIterator[str]:
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+            try:
+                await asyncio.sleep(ttft)
+                yield chunk({"role": "assistant", "content": chunks[0]})
+                for text in chunks[1:]:
+                    await asyncio.sleep(token_delay)
+                    yield chunk({"content": text})
+                yield chunk({}, finish_reason="stop")
+                yield "data: [DONE]\n\n"
+            finally:
+                stats["in_flight"] -= 1
+
+        if stream:
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(ttft + token_delay * (len(chunks) - 1))
+        finally:
+            stats["in_flight"] -= 1
+
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(chunks)},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": 0,
+                "completion_tokens": len(chunks),
+                "total_tokens": len(chunks),
+            },
+        }
+
+    return app
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the FakeLLMConfig options to a command-line parser.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        The parser to extend.
+
+    Returns
+    -------
+    None
+    """
+    group = parser.add_argument_group("fake LLM")
+    group.add_argument("--ttft-ms", type=float, default=400.0)
+    group.add_argument(
+        "--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal"
+    )
+    group.add_argument("--spread", type=float, default=0.5)
+    group.add_argument("--token-delay-ms", type=float, default=15.0)
+    group.add_argument("--tokens", type=int, default=60)
+    group.add_argument("--error-rate", type=float, default=0.0)
+    group.add_argument("--error-status", type=int, default=503)
+    group.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeLLMConfig:
+    """
+    Builds a FakeLLMConfig from options added by add_config_arguments.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The parsed arguments.
+
+    Returns
+    -------
+    FakeLLMConfig
+        The configuration.
+    """
+    return FakeLLMConfig(
+        ttft_ms=args.ttft_ms,
+        distribution=args.distribution,
+        spread=args.spread,
+        token_delay_ms=args.token_delay_ms,
+        tokens=args.tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    """
+    Runs the stand-in server until interrupted.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    setup_logging()
+
+    import uvicorn
+
+    uvicorn.run(
+        create_app(config_from_args(args)),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
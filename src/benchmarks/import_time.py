@@ -0,0 +1,117 @@
+"""
+Measures how long importing the API module takes and enforces a budget.
+
+The import runs in a fresh interpreter with `-X importtime`, so the numbers are
+those of a cold worker start. The script exits with status 1 when the cumulative
+import time exceeds the budget, which makes it usable as a CI gate.
+
+Usage:
+    python -m src.benchmarks.import_time [--module src.rag_api.api] [--budget-ms 1500]
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+
+from src.benchmarks.common import write_report
+from src.rag_api.modules.logs import setup_logging
+from src.utils.paths import find_repo_root
+
+logger = logging.getLogger(__name__)
+
+IMPORT_TIME_BUDGET_MS = float(os.environ.get("IMPORT_TIME_BUDGET_MS", 1500))
+
+
+def measure_import_time(module: str) -> dict[str, float]:
+    """
+    Imports a module in a fresh interpreter and returns cumulative import times.
+
+    Parameters
+    ----------
+    module : str
+        Dotted module path to import.
+
+    Returns
+    -------
+    dict[str, float]
+        Cumulative import time in milliseconds per imported module.
+
+    Raises
+    ------
+    RuntimeError
+        If the import fails.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=find_repo_root(),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    timings: dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        timings[name.strip()] = int(cumulative) / 1000
+    return timings
+
+
+def main() -> None:
+    """
+    Reports the import time of the module and its heaviest dependencies.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    parser = argparse.ArgumentParser(description="Import-time budget check.")
+    parser.add_argument("--module", default="src.rag_api.api")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="Where to write the JSON report.")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    timings = measure_import_time(args.module)
+    total = timings.get(args.module, 0.0)
+    # Only top-level packages, so nested modules are not counted twice.
+    heaviest = sorted(
+        ((name, ms) for name, ms in timings.items() if "." not in name),
+        key=lambda item: item[1],
+        reverse=True,
+    )[: args.top]
+
+    write_report(
+        {
+            "module": args.module,
+            "import_ms": round(total, 1),
+            "budget_ms": args.budget_ms,
+            "within_budget": total <= args.budget_ms,
+            "heaviest_packages_ms": {name: round(ms, 1) for name, ms in heaviest},
+        },
+        args.output,
+    )
+
+    if total > args.budget_ms:
+        logger.error(
+            "Import of %s took %.0f ms, over the %.0f ms budget.",
+            args.module,
+            total,
+            args.budget_ms,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,649 @@
+"""
+Load-tests the chat API against a local OpenRouter stand-in and reports latencies.
+
+By default both servers run inside this process under uvicorn, each in its own
+thread: the API and the fake LLM from fake_openrouter. With `--app uvicorn` the API
+runs as a separate uvicorn process, which keeps the load generator from competing
+for its GIL. `--url` targets a server that is already running; it must be
+configured with OPENROUTER_BASE_URL itself. The API uses the 'mini_docs' index
+(CHROMA_DIR, or `--db`). `--synthetic-facts N` builds a temporary index of N
+generated facts instead, with the configured embedding model.
+
+Queries are replayed from a JSON Lines file with 'query' and optional 'language'
+fields, or from a small built-in set. They are sent either with a fixed
+number of concurrent clients (closed loop, `--concurrency`) or with Poisson
+arrivals at a fixed rate (open loop, `--rate`). With several endpoints, each pass
+over the queries goes to the next endpoint. Every request is sent with debug
+enabled, so the report has throughput and p50/p95/p99 latency per endpoint, time
+to first token for streams and the same percentiles for every pipeline stage.
+
+The semantic answer cache is disabled unless `--answer-cache` is given, so
+repeated queries exercise the whole pipeline. Identical queries in flight at the
+same time are still coalesced, as in production; the 'fake_llm' section of the
+report shows how many LLM calls were made.
+
+Usage:
+    python -m src.benchmarks.load_test --concurrency 16 --requests 500
+    python -m src.benchmarks.load_test --queries queries.jsonl --rate 20 --duration 60 \\
+        --endpoints chat,stream --ttft-ms 800 --error-rate 0.05 --output report.json
+"""
+
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any
+
+import httpx
+
+from src.benchmarks.common import load_jsonl, summarize_latencies, write_report
+from src.benchmarks.fake_openrouter import (
+    add_config_arguments,
+    config_from_args,
+    create_app,
+)
+from src.rag_api.modules.logs import setup_logging
+from src.utils.paths import find_repo_root
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = {"chat": "/chat", "stream": "/chat/stream"}
+READY_TIMEOUT = float(os.environ.get("LOAD_TEST_READY_TIMEOUT", 300))
+REQUEST_TIMEOUT = float(os.environ.get("LOAD_TEST_REQUEST_TIMEOUT", 120))
+
+DEFAULT_QUERIES = [
+    {"query": "Kto jest dziekanem Wydziału MiNI?", "language": "pl"},
+    {"query": "Jak mogę złożyć podanie o urlop dziekański?", "language": "pl"},
+    {"query": "Kiedy zaczyna się sesja egzaminacyjna?", "language": "pl"},
+    {"query": "Gdzie znajduje się dziekanat?", "language": "pl"},
+    {"query": "Ile punktów ECTS trzeba zdobyć w semestrze?", "language": "pl"},
+    {"query": "Jakie są godziny otwarcia biblioteki?", "language": "pl"},
+    {"query": "Jak zapisać się na przedmioty obieralne?", "language": "pl"},
+    {"query": "Who is the dean of the faculty?", "language": "en"},
+    {"query": "How do I apply for a student dormitory?", "language": "en"},
+    {"query": "Коли починається семестр?", "language": "ua"},
+]
+
+SYNTHETIC_TEMPLATES = [
+    "Przedmiot {course} w semestrze {semester} prowadzi dr {name}; konsultacje "
+    "odbywają się w sali {room}.",
+    "Sala {room} znajduje się na {floor}. piętrze gmachu Wydziału MiNI.",
+    "Termin składania {document} w dziekanacie upływa {day} {month}.",
+    "Egzamin z przedmiotu {course} odbędzie się {day} {month} w sali {room}.",
+    "Za przedmiot {course} studenci otrzymują {ects} punktów ECTS.",
+]
+SYNTHETIC_VALUES = {
+    "course": [
+        "Analiza Matematyczna",
+        "Algebra Liniowa",
+        "Statystyka",
+        "Bazy Danych",
+        "Sieci Neuronowe",
+        "Systemy Operacyjne",
+        "Metody Numeryczne",
+        "Grafika Komputerowa",
+    ],
+    "semester": ["zimowym", "letnim"],
+    "name": ["Nowak", "Kowalska", "Wiśniewski", "Wójcik", "Kamińska", "Lewandowski"],
+    "room": [str(n) for n in range(100, 700, 7)],
+    "floor": [str(n) for n in range(1, 6)],
+    "document": ["podania o stypendium", "deklaracji", "pracy dyplomowej", "wniosku"],
+    "day": [str(n) for n in range(1, 29)],
+    "month": ["stycznia", "lutego", "marca", "czerwca", "września", "października"],
+    "ects": ["3", "4", "5", "6"],
+}
+
+
+def load_queries(path: str | None) -> list[dict[str, str]]:
+    """
+    Loads the queries to replay.
+
+    Parameters
+    ----------
+    path : str | None
+        JSON Lines file with 'query' and optional 'language' fields, or None for
+        the built-in queries. Lines without a 'query' are skipped.
+
+    Returns
+    -------
+    list[dict[str, str]]
+        Items with 'query' and 'language'.
+
+    Raises
+    ------
+    ValueError
+        If the file contains no queries.
+    """
+    if path is None:
+        return DEFAULT_QUERIES
+
+    queries = [
+        {"query": record["query"], "language": record.get("language", "pl")}
+        for record in load_jsonl(path)
+        if record.get("query")
+    ]
+    if not queries:
+        raise ValueError(f"No records with a 'query' field in {path}")
+    return queries
+
+
+def synthetic_facts(count: int, seed: int = 0) -> tuple[list[str], list[str]]:
+    """
+    Generates fact-like Polish sentences with made-up source URLs.
+
+    Parameters
+    ----------
+    count : int
+        Number of facts.
+    seed : int, optional
+        Seed of the random generator, by default 0.
+
+    Returns
+    -------
+    tuple[list[str], list[str]]
+        The facts and their source URLs, aligned by index.
+    """
+    rng = random.Random(seed)
+    texts, urls = [], []
+    for i in range(count):
+        template = rng.choice(SYNTHETIC_TEMPLATES)
+        values = {key: rng.choice(options) for key, options in SYNTHETIC_VALUES.items()}
+        texts.append(template.format(**values))
+        urls.append(f"https://ww2.mini.pw.edu.pl/synthetic/{i // 10}")
+    return texts, urls
+
+
+def build_synthetic_index(path_to_database: str, count: int) -> None:
+    """
+    Builds a Chroma database and the exported indexes from synthetic facts.
+
+    Parameters
+    ----------
+    path_to_database : str
+        Directory of the new database.
+    count : int
+        Number of facts.
+
+    Returns
+    -------
+    None
+    """
+    from src.data_ingest.modules.bm25_index import export_bm25_index
+    from src.data_ingest.modules.embedder import Embedder
+    from src.data_ingest.modules.numpy_index import export_numpy_index
+    from src.data_ingest.modules.vector_db import load_vector_db, save_to_vector_db
+
+    texts, urls = synthetic_facts(count)
+    embedder = Embedder()
+    logger.info("Embedding %d synthetic facts with %s...", count, embedder.model_name)
+    embeddings = embedder.generate_embeddings(texts)
+    save_to_vector_db(
+        texts,
+        embeddings,
+        urls,
+        path_to_database,
+        embedding_model=embedder.model_name,
+    )
+    collection = load_vector_db(path_to_database)
+    export_numpy_index(collection, os.path.join(path_to_database, "numpy_index"))
+    export_bm25_index(collection, os.path.join(path_to_database, "bm25_index"))
+
+
+def _free_port() -> int:
+    """
+    Returns a TCP port that is currently free on the loopback interface.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    """
+    Runs an ASGI application under uvicorn in a background thread.
+    """
+
+    def __init__(self, app: Any, port: int):
+        """
+        Parameters
+        ----------
+        app : Any
+            The ASGI application.
+        port : int
+            Port to listen on, on the loopback interface.
+        """
+        import uvicorn
+
+        config = uvicorn.Config(
+            app, host="127.0.0.1", port=port, log_config=None, log_level="warning"
+        )
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.url = f"http://127.0.0.1:{port}"
+
+    def start(self, timeout: float = 30.0) -> "ServerThread":
+        """
+        Starts the server and waits until it accepts connections.
+
+        Raises
+        ------
+        RuntimeError
+            If the server does not start within the timeout.
+        """
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"Server on {self.url} failed to start.")
+            time.sleep(0.05)
+        return self
+
+    def stop(self) -> None:
+        """
+        Asks the server to exit and waits for the thread.
+        """
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def start_api(mode: str, env: dict[str, str], workers: int) -> tuple[str, Any]:
+    """
+    Starts the API with the given environment.
+
+    Parameters
+    ----------
+    mode : str
+        "inprocess" (uvicorn in a thread of this process) or "uvicorn" (a
+        separate uvicorn process).
+    env : dict[str, str]
+        Environment variables configuring the API.
+    workers : int
+        Number of uvicorn worker processes, used by the "uvicorn" mode.
+
+    Returns
+    -------
+    tuple[str, Any]
+        The base URL and a callable that stops the server.
+
+    Raises
+    ------
+    RuntimeError
+        If the API module was already imported with another configuration.
+    """
+    port = _free_port()
+    if mode == "inprocess":
+        if "src.rag_api.api" in sys.modules:
+            raise RuntimeError("The API must be configured before it is imported.")
+        # The API reads its configuration when its modules are imported.
+        os.environ.update(env)
+        api = importlib.import_module("src.rag_api.api")
+        server = ServerThread(api.app, port).start()
+        return server.url, server.stop
+
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "src.rag_api.api:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=find_repo_root(),
+        env={**os.environ, **env},
+    )
+
+    def stop() -> None:
+        process.terminate()
+        process.wait(timeout=30)
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float) -> None:
+    """
+    Polls /ready until the API has warmed up.
+
+    Parameters
+    ----------
+    client : httpx.AsyncClient
+        Client bound to the API base URL.
+    timeout : float
+        Maximum waiting time in seconds.
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    TimeoutError
+        If the API is not ready in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"API not ready after {timeout:.0f}s")
+
+
+async def send_request(
+    client: httpx.AsyncClient, endpoint: str, item: dict[str, str]
+) -> dict[str, Any]:
+    """
+    Sends one chat request and measures it.
+
+    Parameters
+    ----------
+    client : httpx.AsyncClient
+        Client bound to the API base URL.
+    endpoint : str
+        "chat" or "stream".
+    item : dict[str, str]
+        The query and its language.
+
+    Returns
+    -------
+    dict[str, Any]
+        'endpoint', 'status' (None on a transport error), 'latency_ms', the
+        stage 'timings' reported by the API, 'ttft_ms' for streams and 'error'.
+    """
+    payload = {"query": item["query"], "language": item["language"], "debug": True}
+    record: dict[str, Any] = {"endpoint": endpoint, "status": None, "timings": {}}
+    start = time.perf_counter()
+    try:
+        if endpoint == "chat":
+            response = await client.post(ENDPOINTS[endpoint], json=payload)
+            record["status"] = response.status_code
+            if response.status_code == 200:
+                record["timings"] = response.json().get("timings", {})
+        else:
+            async with client.stream(
+                "POST", ENDPOINTS[endpoint], json=payload
+            ) as response:
+                record["status"] = response.status_code
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[len("event:") :].strip()
+                    elif not line.startswith("data:"):
+                        continue
+                    elif event == "token" and "ttft_ms" not in record:
+                        record["ttft_ms"] = (time.perf_counter() - start) * 1000
+                    elif event == "done":
+                        data = json.loads(line[len("data:") :])
+                        record["timings"] = data.get("timings", {})
+    except httpx.HTTPError as e:
+        record["error"] = type(e).__name__
+    record["latency_ms"] = (time.perf_counter() - start) * 1000
+    return record
+
+
+async def run_load(
+    base_url: str,
+    queries: list[dict[str, str]],
+    endpoints: list[str],
+    concurrency: int,
+    rate: float | None,
+    requests: int | None,
+    duration: float | None,
+    seed: int | None = None,
+) -> tuple[list[dict[str, Any]], float]:
+    """
+    Replays the queries against the API.
+
+    Parameters
+    ----------
+    base_url : str
+        Base URL of the API.
+    queries : list[dict[str, str]]
+        The queries, replayed in order and repeated as needed.
+    endpoints : list[str]
+        Endpoints ("chat", "stream"); each pass over the queries uses the next one.
+    concurrency : int
+        Number of concurrent clients in the closed-loop mode.
+    rate : float | None
+        Arrival rate in requests per second (open loop), or None for the
+        closed-loop mode.
+    requests : int | None
+        Number of requests to send, or None to stop after the duration.
+    duration : float | None
+        Maximum duration in seconds, or None.
+    seed : int | None, optional
+        Seed of the arrival process.
+
+    Returns
+    -------
+    tuple[list[dict[str, Any]], float]
+        The per-request records and the elapsed time in seconds.
+    """
+
+    def request_at(i: int) -> tuple[str, dict[str, str]]:
+        endpoint = endpoints[(i // len(queries)) % len(endpoints)]
+        return endpoint, queries[i % len(queries)]
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=REQUEST_TIMEOUT, limits=limits
+    ) as client:
+        await wait_until_ready(client, READY_TIMEOUT)
+
+        start = time.perf_counter()
+        deadline = start + duration if duration else None
+        results: list[dict[str, Any]] = []
+
+        if rate:
+            rng = random.Random(seed)
+            tasks = []
+            next_at = start
+            for i in itertools.count():
+                if requests is not None and i >= requests:
+                    break
+                if deadline is not None and next_at >= deadline:
+                    break
+                await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+                tasks.append(asyncio.create_task(send_request(client, *request_at(i))))
+                next_at += rng.expovariate(rate)
+            results = list(await asyncio.gather(*tasks))
+        else:
+            counter = itertools.count()
+
+            async def worker() -> None:
+                while True:
+                    i = next(counter)
+                    if requests is not None and i >= requests:
+                        return
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        return
+                    results.append(await send_request(client, *request_at(i)))
+
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+        return results, time.perf_counter() - start
+
+
+def summarize_results(
+    results: list[dict[str, Any]], elapsed: float
+) -> dict[str, dict[str, Any]]:
+    """
+    Aggregates the request records per endpoint.
+
+    Parameters
+    ----------
+    results : list[dict[str, Any]]
+        Records returned by send_request.
+    elapsed : float
+        Duration of the run in seconds.
+
+    Returns
+    -------
+    dict[str, dict[str, Any]]
+        Per endpoint: request and error counts, status codes, throughput of
+        successful requests, and latency, time-to-first-token and per-stage
+        percentiles in milliseconds.
+    """
+    summary = {}
+    for endpoint in sorted({record["endpoint"] for record in results}):
+        records = [r for r in results if r["endpoint"] == endpoint]
+        ok = [r for r in records if r["status"] == 200]
+
+        stages: dict[str, list[float]] = {}
+        for record in ok:
+            for name, value in record["timings"].items():
+                stages.setdefault(name, []).append(value)
+
+        summary[endpoint] = {
+            "requests": len(records),
+            "errors": len(records) - len(ok),
+            "status_codes": dict(
+                Counter(str(r["status"] or r.get("error")) for r in records)
+            ),
+            "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+            "latency_ms": summarize_latencies([r["latency_ms"] for r in ok]),
+            "stages_ms": {
+                name: summarize_latencies(values)
+                for name, values in sorted(stages.items())
+            },
+        }
+        ttft = [r["ttft_ms"] for r in ok if "ttft_ms" in r]
+        if ttft:
+            summary[endpoint]["ttft_ms"] = summarize_latencies(ttft)
+    return summary
+
+
+def main() -> None:
+    """
+    Starts the servers, runs the load and writes the JSON report.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", help="Queries to replay (JSONL).")
+    parser.add_argument("--endpoints", default="chat", help="e.g. chat,stream")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, help="Arrivals per second (open loop).")
+    parser.add_argument("--requests", type=int, help="Number of requests to send.")
+    parser.add_argument("--duration", type=float, help="Maximum run time in seconds.")
+    parser.add_argument("--url", help="Use an already running API.")
+    parser.add_argument("--app", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--db", help="Chroma database of the API (CHROMA_DIR).")
+    parser.add_argument("--synthetic-facts", type=int, default=0)
+    parser.add_argument("--answer-cache", action="store_true")
+    parser.add_argument("--output", help="Where to write the JSON report.")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    setup_logging()
+    # One line per request from the load generator's own client is only noise.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown or not endpoints:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown)) or '(none)'}")
+    if args.requests is None and args.duration is None:
+        args.requests = 200
+
+    queries = load_queries(args.queries)
+    llm_config = config_from_args(args)
+    stops = []
+    fake_llm = None
+
+    with tempfile.TemporaryDirectory(prefix="load_test_") as workdir:
+        try:
+            base_url = args.url
+            if base_url is None:
+                fake_llm = ServerThread(create_app(llm_config), _free_port()).start()
+                stops.append(fake_llm.stop)
+
+                env = {
+                    "OPENROUTER_BASE_URL": f"{fake_llm.url}/v1",
+                    "OPENROUTER_API_KEY": "load-test",
+                    "TRANSLATION_CACHE_PATH": os.path.join(workdir, "translations.db"),
+                }
+                if not args.answer_cache:
+                    env["ANSWER_CACHE_SIZE"] = "0"
+                if args.synthetic_facts:
+                    env["CHROMA_DIR"] = os.path.join(workdir, "chroma_db")
+                    build_synthetic_index(env["CHROMA_DIR"], args.synthetic_facts)
+                elif args.db:
+                    env["CHROMA_DIR"] = os.path.abspath(args.db)
+
+                base_url, stop_api = start_api(args.app, env, args.workers)
+                stops.insert(0, stop_api)
+
+            logger.info(
+                "Sending %s requests to %s (%s)...",
+                args.requests or "timed",
+                base_url,
+                f"{args.rate}/s" if args.rate else f"concurrency {args.concurrency}",
+            )
+            results, elapsed = asyncio.run(
+                run_load(
+                    base_url,
+                    queries,
+                    endpoints,
+                    args.concurrency,
+                    args.rate,
+                    args.requests,
+                    args.duration,
+                    args.seed,
+                )
+            )
+            fake_llm_stats = (
+                httpx.get(f"{fake_llm.url}/stats").json() if fake_llm else None
+            )
+        finally:
+            for stop in stops:
+                stop()
+
+    ok = sum(1 for r in results if r["status"] == 200)
+    write_report(
+        {
+            "mode": "url" if args.url else args.app,
+            "load": (
+                {"rate_rps": args.rate}
+                if args.rate
+                else {"concurrency": args.concurrency}
+            ),
+            "queries": len(queries),
+            "requests": len(results),
+            "duration_s": round(elapsed, 3),
+            "throughput_rps": round(ok / elapsed, 3) if elapsed else 0.0,
+            "endpoints": summarize_results(results, elapsed),
+            "fake_llm": fake_llm_stats,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
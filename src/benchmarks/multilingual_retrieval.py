@@ -0,0 +1,232 @@
+"""
+Compares the two retrieval modes for non-Polish queries on the 'mini_docs' data.
+
+- translate: the query is translated to Polish with the LLM, then embedded with the
+  monolingual model (the current default).
+- multilingual: the query is embedded directly with a multilingual model.
+
+Both modes search the same facts with exact cosine search, so the numbers reflect the
+embedding model and the translation step only. The labeled query set is a JSON Lines
+file with one object per line:
+
+    {"query": "Who is the dean?", "language": "en", "expected_source": "https://..."}
+
+Usage:
+    python -m src.benchmarks.multilingual_retrieval --queries queries.jsonl
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import Any
+
+import numpy as np
+
+from src.benchmarks.common import load_jsonl, summarize_latencies, write_report
+from src.data_ingest.modules.embedder import (
+    DEFAULT_MODEL_NAME,
+    MULTILINGUAL_MODEL_NAME,
+    Embedder,
+)
+from src.data_ingest.modules.vector_db import iter_collection, load_vector_db
+from src.rag_api.modules.logs import setup_logging
+from src.rag_api.modules.translator import translate_text
+from src.utils.paths import get_data_dir
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get("CHROMA_DIR", get_data_dir("chroma_db"))
+
+
+def load_corpus(path_to_database: str) -> tuple[list[str], list[str]]:
+    """
+    Reads all fact texts and their source URLs from the Chroma collection.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+
+    Returns
+    -------
+    tuple[list[str], list[str]]
+        The texts and the source URLs, aligned by index.
+    """
+    texts, urls = [], []
+    for page in iter_collection(load_vector_db(path_to_database)):
+        texts.extend(page["documents"])
+        urls.extend(meta.get("url", "") for meta in page["metadatas"])
+    return texts, urls
+
+
+def embed_corpus(embedder: Embedder, texts: list[str]) -> np.ndarray:
+    """
+    Embeds the corpus and returns a row-normalized float32 matrix.
+
+    Parameters
+    ----------
+    embedder : Embedder
+        The embedder of the evaluated mode.
+    texts : list[str]
+        The fact texts.
+
+    Returns
+    -------
+    np.ndarray
+        Matrix of shape (len(texts), dim).
+    """
+    matrix = np.asarray(embedder.generate_embeddings(texts), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    return matrix
+
+
+def top_k_indices(matrix: np.ndarray, vector: list[float], top_k: int) -> np.ndarray:
+    """
+    Returns indices of the top_k rows most similar to the vector, best first.
+
+    Parameters
+    ----------
+    matrix : np.ndarray
+        Row-normalized corpus matrix.
+    vector : list[float]
+        The query embedding.
+    top_k : int
+        Number of results.
+
+    Returns
+    -------
+    np.ndarray
+        Row indices ordered by decreasing cosine similarity.
+    """
+    query = np.asarray(vector, dtype=np.float32)
+    scores = matrix @ (query / (np.linalg.norm(query) + 1e-12))
+    top_k = min(top_k, scores.shape[0])
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def run_mode(
+    embedder: Embedder,
+    matrix: np.ndarray,
+    urls: list[str],
+    queries: list[dict[str, Any]],
+    translate: bool,
+    top_k: int,
+) -> dict[str, Any]:
+    """
+    Measures per-stage latency and recall@k of one retrieval mode.
+
+    Parameters
+    ----------
+    embedder : Embedder
+        The embedder used for queries.
+    matrix : np.ndarray
+        The corpus embedded with the same embedder.
+    urls : list[str]
+        Source URLs aligned with the matrix rows.
+    queries : list[dict[str, Any]]
+        Labeled queries with 'query', 'language' and 'expected_source'.
+    translate : bool
+        Whether non-Polish queries are translated to Polish before embedding.
+    top_k : int
+        Number of retrieved facts considered for recall.
+
+    Returns
+    -------
+    dict[str, Any]
+        Latency summaries per stage and recall@k.
+    """
+    translate_ms, embed_ms, search_ms, total_ms = [], [], [], []
+    found = 0
+
+    for item in queries:
+        query = item["query"]
+        start = time.perf_counter()
+
+        if translate and item.get("language", "pl") != "pl":
+            t0 = time.perf_counter()
+            query = translate_text(query, target_lang_code="pl")
+            translate_ms.append((time.perf_counter() - t0) * 1000)
+
+        t0 = time.perf_counter()
+        vector = embedder.generate_embeddings([query])[0]
+        embed_ms.append((time.perf_counter() - t0) * 1000)
+
+        t0 = time.perf_counter()
+        indices = top_k_indices(matrix, vector, top_k)
+        search_ms.append((time.perf_counter() - t0) * 1000)
+
+        total_ms.append((time.perf_counter() - start) * 1000)
+
+        if item.get("expected_source") in {urls[i] for i in indices}:
+            found += 1
+
+    return {
+        "model": embedder.model_name,
+        "translate_query": translate,
+        "latency_ms": {
+            "translate": summarize_latencies(translate_ms),
+            "embed": summarize_latencies(embed_ms),
+            "search": summarize_latencies(search_ms),
+            "total": summarize_latencies(total_ms),
+        },
+        f"recall@{top_k}": round(found / len(queries), 4) if queries else 0.0,
+    }
+
+
+def main() -> None:
+    """
+    Runs both modes on the labeled queries and writes a JSON report.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", required=True, help="Labeled queries (JSONL).")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--db", default=DB_PATH, help="Path to the Chroma database.")
+    parser.add_argument("--monolingual-model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--multilingual-model", default=MULTILINGUAL_MODEL_NAME)
+    parser.add_argument("--output", help="Where to write the JSON report.")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    queries = load_jsonl(args.queries)
+    texts, urls = load_corpus(args.db)
+    logger.info("Loaded %d facts and %d queries.", len(texts), len(queries))
+
+    modes = []
+    for model_name, translate in (
+        (args.monolingual_model, True),
+        (args.multilingual_model, False),
+    ):
+        embedder = Embedder(model_name)
+        logger.info("Embedding corpus with %s...", model_name)
+        t0 = time.perf_counter()
+        matrix = embed_corpus(embedder, texts)
+        corpus_seconds = time.perf_counter() - t0
+
+        result = run_mode(embedder, matrix, urls, queries, translate, args.top_k)
+        result["corpus_embedding_seconds"] = round(corpus_seconds, 2)
+        modes.append(result)
+
+    write_report(
+        {
+            "facts": len(texts),
+            "queries": len(queries),
+            "top_k": args.top_k,
+            "modes": modes,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,649 @@
+"""
+Benchmarks Chroma HNSW against exact search on fact corpora of growing size.
+
+For every corpus size, the vectors are written to a temporary Chroma database with
+the settings of save_to_vector_db. They are then exported to the numpy index,
+which is the exact-search backend (RETRIEVAL_BACKEND=numpy). Each backend and
+size reports:
+
+- build time and on-disk size;
+- the resident memory added by opening and querying the index;
+- single-query latency percentiles;
+- recall@k of the expected sources.
+
+HNSW additionally reports neighbour recall@k, its overlap with the exact top-k,
+for each requested ef_search.
+
+Corpus:
+- with `--db`, the embeddings of the real 'mini_docs' facts are read from Chroma.
+  Sizes above the real corpus are padded with distractors, i.e. perturbed copies
+  of real facts with made-up sources;
+- otherwise the corpus is synthetic: facts are noisy copies of per-source
+  centers, and sources are grouped into topics. A larger corpus contains every
+  smaller one.
+
+Queries:
+- with `--queries` (and `--db`), a labeled JSON Lines file such as
+  {"query": "Kto jest dziekanem?", "expected_source": "https://..."} is embedded
+  with the model recorded in the collection, which must be available locally;
+- otherwise the queries are perturbed copies of facts from the smallest corpus,
+  each expecting the source of the fact it was derived from.
+
+Nothing is downloaded and everything runs on CPU. Set HF_HUB_OFFLINE=1 to make
+sure the embedding model is loaded from the local cache.
+
+Usage:
+    python -m src.benchmarks.retrieval_backends --sizes 1000,10000,100000
+    python -m src.benchmarks.retrieval_backends --db src/data/chroma_db \\
+        --queries queries.jsonl --sizes 10000,1000000 --search-ef 10,50,200
+"""
+
+import argparse
+import gc
+import logging
+import os
+import tempfile
+import time
+from collections.abc import Iterator
+from typing import Any
+
+import numpy as np
+
+from src.benchmarks.common import load_jsonl, summarize_latencies, write_report
+from src.data_ingest.modules.numpy_index import export_numpy_index, load_numpy_index
+from src.data_ingest.modules.vector_db import (
+    COLLECTION_NAME,
+    get_embedding_model,
+    iter_collection,
+    load_vector_db,
+)
+from src.rag_api.modules.logs import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Rows are generated and written in blocks of this size; generation is seeded per
+# block, so the first N rows are the same for every corpus size.
+BLOCK_SIZE = 5000
+FACTS_PER_SOURCE = 10
+SYNTHETIC_TOPICS = 200
+# Standard deviations relative to unit-norm vectors.
+SOURCE_SPREAD = 0.6
+FACT_SPREAD = 0.35
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scales the rows to unit length.
+    """
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+def _perturb(vectors: np.ndarray, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Adds isotropic Gaussian noise of the given relative magnitude and renormalizes.
+    """
+    scale = noise / np.sqrt(vectors.shape[1])
+    return _normalize(vectors + rng.normal(0.0, scale, vectors.shape))
+
+
+class Corpus:
+    """
+    Produces the vectors and sources of a corpus of any size, block by block.
+    """
+
+    def __init__(
+        self,
+        dim: int = 384,
+        seed: int = 0,
+        base_vectors: np.ndarray | None = None,
+        base_sources: list[str] | None = None,
+        noise: float = FACT_SPREAD,
+    ):
+        """
+        Parameters
+        ----------
+        dim : int, optional
+            Dimension of the synthetic vectors, by default 384. Ignored when
+            base vectors are given.
+        seed : int, optional
+            Seed of the generated rows, by default 0.
+        base_vectors : np.ndarray | None, optional
+            Real fact embeddings placed first in every corpus.
+        base_sources : list[str] | None, optional
+            Source URLs of the base vectors.
+        noise : float, optional
+            Relative noise of the distractors derived from base vectors, by
+            default FACT_SPREAD.
+        """
+        self.seed = seed
+        self.noise = noise
+        self.base_vectors = (
+            _normalize(base_vectors.astype(np.float32))
+            if base_vectors is not None
+            else None
+        )
+        self.base_sources = base_sources or []
+        self.dim = base_vectors.shape[1] if base_vectors is not None else dim
+        self._topics = _normalize(
+            np.random.default_rng([seed, 0]).standard_normal(
+                (SYNTHETIC_TOPICS, self.dim)
+            )
+        )
+
+    @property
+    def base_size(self) -> int:
+        """
+        Number of real facts at the start of the corpus.
+        """
+        return 0 if self.base_vectors is None else len(self.base_vectors)
+
+    def _source_centers(self, sources: np.ndarray) -> np.ndarray:
+        """
+        Returns the centers of synthetic sources, each drawn around its topic.
+        """
+        centers = np.stack(
+            [
+                np.random.default_rng([self.seed, 1, int(s)]).standard_normal(self.dim)
+                for s in sources
+            ]
+        )
+        scale = SOURCE_SPREAD / np.sqrt(self.dim)
+        return _normalize(self._topics[sources % SYNTHETIC_TOPICS] + scale * centers)
+
+    def _block(self, index: int) -> tuple[np.ndarray, list[str]]:
+        """
+        Generates the rows of one block that are not base facts.
+        """
+        start = max(index * BLOCK_SIZE, self.base_size)
+        stop = (index + 1) * BLOCK_SIZE
+        rows = np.arange(start, stop)
+        rng = np.random.default_rng([self.seed, 2, index])
+
+        if self.base_vectors is not None:
+            originals = self.base_vectors[rows % self.base_size]
+            urls = [f"https://synthetic.invalid/distractor/{row}" for row in rows]
+            return _perturb(originals, self.noise, rng).astype(np.float32), urls
+
+        sources = rows // FACTS_PER_SOURCE
+        unique, inverse = np.unique(sources, return_inverse=True)
+        centers = self._source_centers(unique)[inverse]
+        urls = [f"https://synthetic.invalid/source/{s}" for s in sources]
+        return _perturb(centers, FACT_SPREAD, rng).astype(np.float32), urls
+
+    def iter_rows(
+        self, size: int, batch_size: int = BLOCK_SIZE
+    ) -> Iterator[tuple[np.ndarray, list[str]]]:
+        """
+        Yields the first `size` rows as (vectors, sources) batches.
+
+        Parameters
+        ----------
+        size : int
+            Number of rows.
+        batch_size : int, optional
+            Maximum rows per batch, by default BLOCK_SIZE.
+
+        Yields
+        ------
+        tuple[np.ndarray, list[str]]
+            Unit-norm float32 vectors and their source URLs.
+        """
+        produced = 0
+        if self.base_vectors is not None:
+            for start in range(0, min(size, self.base_size), batch_size):
+                stop = min(start + batch_size, size, self.base_size)
+                yield self.base_vectors[start:stop], self.base_sources[start:stop]
+                produced = stop
+
+        block = produced // BLOCK_SIZE
+        while produced < size:
+            vectors, urls = self._block(block)
+            offset = produced - max(block * BLOCK_SIZE, self.base_size)
+            take = min(size - produced, len(vectors) - offset)
+            for start in range(offset, offset + take, batch_size):
+                stop = min(start + batch_size, offset + take)
+                yield vectors[start:stop], urls[start:stop]
+            produced += take
+            block += 1
+
+    def sample_queries(
+        self, count: int, pool_size: int, noise: float
+    ) -> tuple[np.ndarray, list[str]]:
+        """
+        Derives queries from random facts among the first `pool_size` rows.
+
+        Parameters
+        ----------
+        count : int
+            Number of queries.
+        pool_size : int
+            Rows the queries are drawn from (the smallest benchmarked size).
+        noise : float
+            Relative noise added to the fact vectors.
+
+        Returns
+        -------
+        tuple[np.ndarray, list[str]]
+            The query vectors and their expected sources.
+        """
+        vectors, urls = [], []
+        for batch_vectors, batch_urls in self.iter_rows(pool_size):
+            vectors.append(batch_vectors)
+            urls.extend(batch_urls)
+        pool = np.concatenate(vectors)
+
+        rng = np.random.default_rng([self.seed, 3])
+        picked = rng.choice(len(pool), size=min(count, len(pool)), replace=False)
+        return _perturb(pool[picked], noise, rng), [urls[i] for i in picked]
+
+
+def load_real_corpus(path_to_database: str) -> tuple[np.ndarray, list[str], str | None]:
+    """
+    Reads the fact embeddings and source URLs of the 'mini_docs' collection.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+
+    Returns
+    -------
+    tuple[np.ndarray, list[str], str | None]
+        The embeddings, their source URLs and the recorded embedding model.
+    """
+    collection = load_vector_db(path_to_database)
+    vectors, urls = [], []
+    for page in iter_collection(collection, include=["metadatas", "embeddings"]):
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        urls.extend((meta or {}).get("url", "") for meta in page["metadatas"])
+    return np.concatenate(vectors), urls, get_embedding_model(collection)
+
+
+def embed_labeled_queries(
+    path: str, model_name: str | None
+) -> tuple[np.ndarray, list[str]]:
+    """
+    Embeds labeled queries with the model the corpus was built with.
+
+    Parameters
+    ----------
+    path : str
+        JSON Lines file with 'query' and 'expected_source' fields.
+    model_name : str | None
+        The embedding model, or None for the configured default.
+
+    Returns
+    -------
+    tuple[np.ndarray, list[str]]
+        The query vectors and their expected sources.
+    """
+    from src.data_ingest.modules.embedder import Embedder
+
+    items = [item for item in load_jsonl(path) if item.get("expected_source")]
+    embedder = Embedder(model_name) if model_name else Embedder()
+    vectors = embedder.generate_embeddings([item["query"] for item in items])
+    return _normalize(np.asarray(vectors, dtype=np.float32)), [
+        item["expected_source"] for item in items
+    ]
+
+
+def _rss_bytes() -> int | None:
+    """
+    Returns the resident set size of this process, or None if unavailable.
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _memory_mb(before: int | None, after: int | None) -> float | None:
+    """
+    Returns the growth of the resident set size in megabytes.
+
+    Memory freed by earlier measurements can be reused, so this is an
+    approximation that may underestimate; it is never negative.
+    """
+    if before is None or after is None:
+        return None
+    return round(max(after - before, 0) / 1024**2, 3)
+
+
+def _directory_mb(path: str) -> float:
+    """
+    Returns the total size of the files under a directory, in megabytes.
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return round(total / 1024**2, 3)
+
+
+def _release_chroma() -> None:
+    """
+    Drops the cached Chroma clients so that their indexes can be freed.
+    """
+    from chromadb.api.client import SharedSystemClient
+
+    SharedSystemClient.clear_system_cache()
+    gc.collect()
+
+
+def build_chroma(
+    path_to_database: str,
+    corpus: Corpus,
+    size: int,
+    construction_ef: int,
+    max_neighbors: int,
+) -> float:
+    """
+    Writes the first `size` rows of the corpus to a new Chroma database.
+
+    Parameters
+    ----------
+    path_to_database : str
+        Directory of the new database.
+    corpus : Corpus
+        The corpus.
+    size : int
+        Number of rows.
+    construction_ef : int
+        HNSW ef used while building the graph.
+    max_neighbors : int
+        HNSW links per node (M).
+
+    Returns
+    -------
+    float
+        The build time in seconds.
+    """
+    import chromadb
+
+    start = time.perf_counter()
+    settings = chromadb.config.Settings(anonymized_telemetry=False)
+    client = chromadb.PersistentClient(path=path_to_database, settings=settings)
+    collection = client.create_collection(
+        name=COLLECTION_NAME,
+        metadata={
+            "hnsw:space": "cosine",
+            "hnsw:construction_ef": construction_ef,
+            "hnsw:M": max_neighbors,
+        },
+    )
+    row = 0
+    for vectors, urls in corpus.iter_rows(size):
+        collection.add(
+            ids=[f"ids_{row + i + 1}" for i in range(len(vectors))],
+            embeddings=vectors,
+            metadatas=[{"url": url} for url in urls],
+            documents=[f"Fact {row + i + 1}" for i in range(len(vectors))],
+        )
+        row += len(vectors)
+    return time.perf_counter() - start
+
+
+def run_queries(
+    index: Any, queries: np.ndarray, top_k: int
+) -> tuple[list[list[str]], list[list[str]], list[float], float]:
+    """
+    Queries an index one vector at a time.
+
+    Parameters
+    ----------
+    index : Any
+        A Chroma collection or a NumpyIndex.
+    queries : np.ndarray
+        The query vectors.
+    top_k : int
+        Number of results per query.
+
+    Returns
+    -------
+    tuple[list[list[str]], list[list[str]], list[float], float]
+        Result ids and sources per query, latencies in milliseconds of all but
+        the first query, and the duration of the first query in seconds (which
+        includes loading the index).
+    """
+    ids, sources, latencies = [], [], []
+    first = 0.0
+    for i, vector in enumerate(queries):
+        start = time.perf_counter()
+        result = index.query(
+            query_embeddings=[vector.tolist()], n_results=top_k, include=["metadatas"]
+        )
+        elapsed = time.perf_counter() - start
+        if i == 0:
+            first = elapsed
+        else:
+            latencies.append(elapsed * 1000)
+        ids.append(result["ids"][0])
+        sources.append([(meta or {}).get("url") for meta in result["metadatas"][0]])
+    return ids, sources, latencies, first
+
+
+def source_recall(sources: list[list[str]], expected: list[str]) -> float:
+    """
+    Returns the fraction of queries whose expected source was retrieved.
+    """
+    found = sum(want in got for got, want in zip(sources, expected, strict=True))
+    return round(found / len(expected), 4) if expected else 0.0
+
+
+def neighbour_recall(ids: list[list[str]], exact_ids: list[list[str]]) -> float:
+    """
+    Returns the mean overlap of approximate and exact top-k results.
+    """
+    overlaps = [
+        len(set(got) & set(want)) / len(want)
+        for got, want in zip(ids, exact_ids, strict=True)
+        if want
+    ]
+    return round(float(np.mean(overlaps)), 4) if overlaps else 0.0
+
+
+def benchmark_size(
+    workdir: str,
+    corpus: Corpus,
+    size: int,
+    queries: np.ndarray,
+    expected: list[str],
+    top_k: int,
+    search_efs: list[int],
+    construction_ef: int,
+    max_neighbors: int,
+) -> list[dict[str, Any]]:
+    """
+    Builds both indexes for one corpus size and measures them.
+
+    Parameters
+    ----------
+    workdir : str
+        Directory for the temporary databases.
+    corpus : Corpus
+        The corpus.
+    size : int
+        Number of facts.
+    queries : np.ndarray
+        The query vectors.
+    expected : list[str]
+        The expected source of each query.
+    top_k : int
+        Number of retrieved facts considered for recall.
+    search_efs : list[int]
+        HNSW ef_search values to measure.
+    construction_ef : int
+        HNSW ef used while building the graph.
+    max_neighbors : int
+        HNSW links per node (M).
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        One entry for the exact index and one per ef_search value.
+    """
+    path = os.path.join(workdir, f"chroma_{size}")
+    numpy_dir = os.path.join(path, "numpy_index")
+
+    logger.info("Building Chroma database with %d facts...", size)
+    chroma_build = build_chroma(path, corpus, size, construction_ef, max_neighbors)
+
+    start = time.perf_counter()
+    export_numpy_index(load_vector_db(path), numpy_dir)
+    numpy_build = time.perf_counter() - start
+    _release_chroma()
+
+    entries = []
+
+    rss = _rss_bytes()
+    index = load_numpy_index(numpy_dir)
+    exact_ids, sources, latencies, first = run_queries(index, queries, top_k)
+    rss_after = _rss_bytes()
+    entries.append(
+        {
+            "size": size,
+            "backend": "exact",
+            "params": {},
+            "build_s": round(numpy_build, 3),
+            "load_s": round(first, 3),
+            "disk_mb": _directory_mb(numpy_dir),
+            "memory_mb": _memory_mb(rss, rss_after),
+            "latency_ms": summarize_latencies(latencies),
+            f"recall@{top_k}": source_recall(sources, expected),
+        }
+    )
+    del index
+    gc.collect()
+
+    chroma_disk = _directory_mb(path) - entries[0]["disk_mb"]
+    for ef in search_efs:
+        # The new ef_search only applies to an index opened after the change.
+        load_vector_db(path).modify(configuration={"hnsw": {"ef_search": ef}})
+        _release_chroma()
+
+        rss = _rss_bytes()
+        collection = load_vector_db(path)
+        ids, sources, latencies, first = run_queries(collection, queries, top_k)
+        rss_after = _rss_bytes()
+        del collection
+        _release_chroma()
+        entries.append(
+            {
+                "size": size,
+                "backend": "chroma",
+                "params": {
+                    "ef_search": ef,
+                    "ef_construction": construction_ef,
+                    "max_neighbors": max_neighbors,
+                },
+                "build_s": round(chroma_build, 3),
+                "load_s": round(first, 3),
+                "disk_mb": round(chroma_disk, 3),
+                "memory_mb": _memory_mb(rss, rss_after),
+                "latency_ms": summarize_latencies(latencies),
+                f"recall@{top_k}": source_recall(sources, expected),
+                f"neighbour_recall@{top_k}": neighbour_recall(ids, exact_ids),
+            }
+        )
+
+    for entry in entries:
+        logger.info(
+            "%8d %-6s %-18s p50 %.3f ms, recall %.3f",
+            size,
+            entry["backend"],
+            entry["params"].get("ef_search", ""),
+            entry["latency_ms"].get("p50", 0.0),
+            entry[f"recall@{top_k}"],
+        )
+    return entries
+
+
+def main() -> None:
+    """
+    Runs the benchmark for every corpus size and writes a JSON report.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--db", help="Use the real facts of this Chroma database.")
+    parser.add_argument("--queries", help="Labeled queries (JSONL), requires --db.")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--query-noise", type=float, default=0.25)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--search-ef", default="10,100")
+    parser.add_argument("--construction-ef", type=int, default=100)
+    parser.add_argument("--max-neighbors", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Where to build the indexes (temporary).")
+    parser.add_argument("--output", help="Where to write the JSON report.")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    if args.queries and not args.db:
+        parser.error("--queries requires --db")
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    search_efs = [int(ef) for ef in args.search_ef.split(",")]
+
+    model_name = None
+    if args.db:
+        vectors, urls, model_name = load_real_corpus(args.db)
+        corpus = Corpus(seed=args.seed, base_vectors=vectors, base_sources=urls)
+        logger.info("Loaded %d facts embedded with %s.", len(vectors), model_name)
+    else:
+        corpus = Corpus(dim=args.dim, seed=args.seed)
+
+    if args.queries:
+        queries, expected = embed_labeled_queries(args.queries, model_name)
+    else:
+        queries, expected = corpus.sample_queries(
+            args.num_queries,
+            min(sizes[0], corpus.base_size or sizes[0]),
+            args.query_noise,
+        )
+    logger.info("Benchmarking %d queries on sizes %s.", len(queries), sizes)
+
+    results = []
+    with tempfile.TemporaryDirectory(
+        prefix="retrieval_bench_", dir=args.workdir
+    ) as workdir:
+        for size in sizes:
+            results.extend(
+                benchmark_size(
+                    workdir,
+                    corpus,
+                    size,
+                    queries,
+                    expected,
+                    args.top_k,
+                    search_efs,
+                    args.construction_ef,
+                    args.max_neighbors,
+                )
+            )
+
+    write_report(
+        {
+            "corpus": "mini_docs" if args.db else "synthetic",
+            "embedding_model": model_name,
+            "dim": corpus.dim,
+            "base_facts": corpus.base_size,
+            "queries": len(queries),
+            "labeled_queries": bool(args.queries),
+            "top_k": args.top_k,
+            "results": results,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
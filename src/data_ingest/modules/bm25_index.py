@@ -0,0 +1,338 @@
+import json
+import logging
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from src.data_ingest.modules.vector_db import (
+    bump_generation,
+    iter_collection,
+    write_export_metadata,
+)
+
+if TYPE_CHECKING:
+    from chromadb.api.models.Collection import Collection
+
+logger = logging.getLogger(__name__)
+
+POSTINGS_FILE = "bm25.npz"
+VOCABULARY_FILE = "vocabulary.json"
+DOCUMENTS_FILE = "documents.jsonl"
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+_EXTRA_FOLDS = str.maketrans({"ł": "l", "Ł": "L"})
+
+STOPWORDS = frozenset(
+    "a aby ale am and are as at be by bez byc co czy dla do i in is it jak jako jest "
+    "ku lub na nad nie o od of oraz po pod przez przy sa sie ta tak te the to "
+    "tu w we what where when who z za ze".split()
+)
+
+# Inflectional endings (after diacritics folding), longest first. Stripping them
+# conflates most case forms of a noun, e.g. dziekan / dziekana / dziekanem.
+POLISH_SUFFIXES = sorted(
+    (
+        "owie ami ach ego emu ich ych ymi imi iej owi ow om em ej ie " "a e i y u o"
+    ).split(),
+    key=len,
+    reverse=True,
+)
+MIN_STEM_LENGTH = 4
+
+
+def _fold(text: str) -> str:
+    """
+    Lowercases text and strips diacritics (ą -> a, ł -> l, ...).
+    """
+    decomposed = unicodedata.normalize("NFKD", text.translate(_EXTRA_FOLDS))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def stem(token: str) -> str:
+    """
+    Applies a light Polish stemmer that strips one inflectional suffix.
+
+    Short tokens, tokens containing digits and acronyms (e.g. "isi", "iad", room
+    numbers) are kept intact, since exact matches on them are the point of the
+    lexical index.
+
+    Parameters
+    ----------
+    token : str
+        A folded, lowercase token.
+
+    Returns
+    -------
+    str
+        The stem.
+    """
+    if not token.isalpha():
+        return token
+    for suffix in POLISH_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into folded, stemmed tokens without stopwords.
+
+    Parameters
+    ----------
+    text : str
+        Input text in Polish (or English).
+
+    Returns
+    -------
+    list[str]
+        The index terms.
+    """
+    return [
+        stem(token)
+        for token in TOKEN_PATTERN.findall(_fold(text))
+        if token not in STOPWORDS
+    ]
+
+
+def export_bm25_index(
+    collection: "Collection",
+    output_dir: str,
+    k1: float = 1.5,
+    b: float = 0.75,
+    batch_size: int = 5000,
+    source_generation: str | None = None,
+) -> int:
+    """
+    Builds a BM25 inverted index over the collection and writes it to disk.
+
+    Per-posting BM25 weights are precomputed, so scoring a query is only a sum of
+    the posting lists of its terms. Postings are stored as flat numpy arrays
+    (CSR layout) indexed by term id; row order follows the collection.
+
+    Parameters
+    ----------
+    collection : chromadb.api.models.Collection.Collection
+        The source collection.
+    output_dir : str
+        Directory where the index files are written.
+    k1 : float, optional
+        BM25 term-frequency saturation, by default 1.5.
+    b : float, optional
+        BM25 length normalization, by default 0.75.
+    batch_size : int, optional
+        Number of records read from Chroma at a time, by default 5000.
+    source_generation : str | None, optional
+        Generation of the source database, recorded in the index metadata.
+
+    Returns
+    -------
+    int
+        The number of indexed documents.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    documents_path = os.path.join(output_dir, DOCUMENTS_FILE)
+    tmp_documents = f"{documents_path}.tmp"
+
+    postings: dict[str, list[tuple[int, int]]] = {}
+    doc_lengths: list[int] = []
+
+    with open(tmp_documents, "w", encoding="utf-8") as docs_file:
+        for page in iter_collection(collection, batch_size=batch_size):
+            for doc_id, doc, meta in zip(
+                page["ids"], page["documents"], page["metadatas"], strict=True
+            ):
+                row = len(doc_lengths)
+                terms = Counter(tokenize(doc or ""))
+                doc_lengths.append(sum(terms.values()))
+                for term, tf in terms.items():
+                    postings.setdefault(term, []).append((row, tf))
+                docs_file.write(
+                    json.dumps(
+                        {"id": doc_id, "document": doc, "metadata": meta or {}},
+                        ensure_ascii=False,
+                    )
+                    + "\n"
+                )
+
+    n_docs = len(doc_lengths)
+    if n_docs == 0:
+        logger.warning("Collection is empty, BM25 index not exported.")
+        os.remove(tmp_documents)
+        return 0
+
+    lengths = np.asarray(doc_lengths, dtype=np.float32)
+    avg_length = max(float(lengths.mean()), 1.0)
+    vocabulary = sorted(postings)
+
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    rows, weights = [], []
+    for term_id, term in enumerate(vocabulary):
+        term_rows = np.fromiter((r for r, _ in postings[term]), dtype=np.int32)
+        tf = np.fromiter((t for _, t in postings[term]), dtype=np.float32)
+        df = len(term_rows)
+        idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = k1 * (1.0 - b + b * lengths[term_rows] / avg_length)
+        rows.append(term_rows)
+        weights.append((idf * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32))
+        offsets[term_id + 1] = offsets[term_id] + df
+
+    tmp_postings = os.path.join(output_dir, f"tmp_{POSTINGS_FILE}")
+    np.savez(
+        tmp_postings,
+        offsets=offsets,
+        rows=np.concatenate(rows),
+        weights=np.concatenate(weights),
+        n_docs=np.int64(n_docs),
+    )
+    vocabulary_path = os.path.join(output_dir, VOCABULARY_FILE)
+    with open(f"{vocabulary_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(vocabulary, f, ensure_ascii=False)
+
+    os.replace(f"{vocabulary_path}.tmp", vocabulary_path)
+    os.replace(tmp_postings, os.path.join(output_dir, POSTINGS_FILE))
+    os.replace(tmp_documents, documents_path)
+    write_export_metadata(
+        output_dir, {"count": n_docs, "source_generation": source_generation}
+    )
+    bump_generation(output_dir)
+
+    logger.info(
+        "Exported BM25 index (%d documents, %d terms) to %s",
+        n_docs,
+        len(vocabulary),
+        output_dir,
+    )
+    return n_docs
+
+
+class BM25Index:
+    """
+    Lexical BM25 search over the precomputed on-disk index.
+
+    Scoring a query adds the precomputed weights of each query term's posting list
+    into a dense score array, which takes microseconds for typical short queries.
+    The query interface mirrors Collection.query, taking texts instead of vectors.
+    """
+
+    def __init__(self, index_dir: str):
+        """
+        Loads the index files written by export_bm25_index.
+
+        Parameters
+        ----------
+        index_dir : str
+            Directory containing the index files.
+        """
+        self.index_dir = index_dir
+        with np.load(os.path.join(index_dir, POSTINGS_FILE)) as data:
+            self.offsets = data["offsets"]
+            self.rows = data["rows"]
+            self.weights = data["weights"]
+            self.n_docs = int(data["n_docs"])
+
+        with open(os.path.join(index_dir, VOCABULARY_FILE), encoding="utf-8") as f:
+            self.term_ids = {term: i for i, term in enumerate(json.load(f))}
+
+        self.ids: list[str] = []
+        self.documents: list[str] = []
+        self.metadatas: list[dict[str, Any]] = []
+        with open(os.path.join(index_dir, DOCUMENTS_FILE), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                self.ids.append(record["id"])
+                self.documents.append(record["document"])
+                self.metadatas.append(record["metadata"])
+
+    def score(self, query: str) -> np.ndarray:
+        """
+        Computes the BM25 score of every document for the query.
+
+        Parameters
+        ----------
+        query : str
+            The query text.
+
+        Returns
+        -------
+        np.ndarray
+            Scores aligned with the document rows (zero for no matching term).
+        """
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in tokenize(query):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            # rows are unique within a posting list, so fancy-index addition is safe
+            scores[self.rows[start:end]] += self.weights[start:end]
+        return scores
+
+    def query(
+        self,
+        query_texts: list[str],
+        n_results: int = 10,
+        include: list[str] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Returns up to n_results best-scoring documents for each query text.
+
+        Parameters
+        ----------
+        query_texts : list[str]
+            One or more query strings.
+        n_results : int, optional
+            Maximum number of results per query, by default 10.
+        include : list[str] | None, optional
+            Any of "documents", "metadatas" and "scores", by default all.
+
+        Returns
+        -------
+        dict[str, Any]
+            A dictionary shaped like the result of Collection.query, with one inner
+            list per query. Only documents matching at least one term are returned.
+        """
+        include = include or ["documents", "metadatas", "scores"]
+        results: dict[str, Any] = {"ids": []}
+        for field in include:
+            results[field] = []
+
+        for query in query_texts:
+            scores = self.score(query)
+            matched = np.flatnonzero(scores)
+            if len(matched) > n_results:
+                matched = matched[np.argpartition(-scores[matched], n_results - 1)][
+                    :n_results
+                ]
+            order = matched[np.argsort(-scores[matched], kind="stable")]
+
+            results["ids"].append([self.ids[i] for i in order])
+            if "documents" in include:
+                results["documents"].append([self.documents[i] for i in order])
+            if "metadatas" in include:
+                results["metadatas"].append([self.metadatas[i] for i in order])
+            if "scores" in include:
+                results["scores"].append(scores[order].tolist())
+
+        return results
+
+
+def load_bm25_index(index_dir: str) -> BM25Index:
+    """
+    Opens the BM25 index stored in the given directory.
+
+    Parameters
+    ----------
+    index_dir : str
+        Directory containing the index files.
+
+    Returns
+    -------
+    BM25Index
+        The loaded index.
+    """
+    return BM25Index(index_dir)
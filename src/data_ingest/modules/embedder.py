@@ -1,4 +1,52 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+import os
+from typing import Any
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Maps Polish, English and Ukrainian text into one vector space, so queries in any
+# of them can be matched against the Polish facts without translating them first.
+MULTILINGUAL_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL_NAME)
+# "torch" (HuggingFace/PyTorch), "onnx" or "onnx-int8" (onnxruntime, no torch import)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+# Unix socket of a shared embedding service; unset to run the model in-process.
+EMBEDDING_SERVICE_SOCKET = os.getenv("EMBEDDING_SERVICE_SOCKET") or None
+# Directory of a persistent embedding store (see embedding_store); unset to disable.
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR") or None
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float32")
+
+
+def _load_model(model_name: str, backend: str, onnx_dir: str | None) -> Any:
+    """
+    Loads the model object that produces the embeddings in-process.
+
+    Parameters
+    ----------
+    model_name : str
+        The name or path of the HuggingFace model.
+    backend : str
+        "torch", "onnx" or "onnx-int8".
+    onnx_dir : str | None
+        Directory with the exported ONNX model, or None for the default.
+
+    Returns
+    -------
+    Any
+        An object with embed_query and embed_documents methods.
+    """
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=model_name)
+
+    from src.data_ingest.modules.onnx_embedder import (
+        OnnxEmbeddingModel,
+        default_onnx_dir,
+    )
+
+    onnx_dir = onnx_dir or os.getenv("ONNX_MODEL_DIR", default_onnx_dir(model_name))
+    return OnnxEmbeddingModel(onnx_dir, quantized=backend == "onnx-int8")
 
 
 class Embedder:
@@ -6,18 +54,78 @@ class Embedder:
     A wrapper class for generating embeddings using HuggingFace models.
     """
 
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL,
+        backend: str = EMBEDDING_BACKEND,
+        onnx_dir: str | None = None,
+        service_socket: str | None = EMBEDDING_SERVICE_SOCKET,
+        store_dir: str | None = EMBEDDING_STORE_DIR,
+    ):
         """
         Initializes the Embedder with a specific HuggingFace model.
 
+        The same model must be used at ingest and query time. Set the EMBEDDING_MODEL
+        environment variable (e.g. to MULTILINGUAL_MODEL_NAME) for both the ingest
+        and the API containers to switch models.
+
         Parameters
         ----------
         model_name : str, optional
             The name or path of the HuggingFace model to use,
-            by default "sentence-transformers/all-MiniLM-L6-v2".
+            by default the EMBEDDING_MODEL environment variable or
+            "sentence-transformers/all-MiniLM-L6-v2".
+        backend : str, optional
+            "torch" to run the model with PyTorch, "onnx" or "onnx-int8" to run an
+            exported (optionally quantized) model with onnxruntime, by default the
+            EMBEDDING_BACKEND environment variable or "torch".
+        onnx_dir : str | None, optional
+            Directory with the exported ONNX model, by default the ONNX_MODEL_DIR
+            environment variable or src/data/onnx/<model name>.
+        service_socket : str | None, optional
+            Unix socket of the embedding service (see embedding_service). If set,
+            texts are embedded by the service and the model is loaded in-process
+            only while the service is unavailable. By default the
+            EMBEDDING_SERVICE_SOCKET environment variable, or None.
+        store_dir : str | None, optional
+            Directory of a persistent embedding store. If set, generate_embeddings
+            returns stored vectors of texts embedded before, by this or an earlier
+            process, and embeds and stores only the others. By default the
+            EMBEDDING_STORE_DIR environment variable, or None.
+
+        Raises
+        ------
+        ValueError
+            If the backend is not supported.
         """
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unsupported embedding backend: {backend}")
+
         self.model_name = model_name
-        self.embedder = HuggingFaceEmbeddings(model_name=model_name)
+        self.backend = backend
+
+        if service_socket:
+            from src.data_ingest.modules.embedding_service import (
+                RemoteEmbeddingModel,
+            )
+
+            self.embedder = RemoteEmbeddingModel(
+                service_socket,
+                model_name,
+                fallback=lambda: _load_model(model_name, backend, onnx_dir),
+                backend=backend,
+            )
+        else:
+            self.embedder = _load_model(model_name, backend, onnx_dir)
+
+        self.store = None
+        if store_dir:
+            from src.data_ingest.modules.embedding_store import EmbeddingStore
+
+            # Quantized models produce slightly different vectors.
+            self.store = EmbeddingStore(
+                store_dir, f"{model_name}@{backend}", dtype=EMBEDDING_STORE_DTYPE
+            )
 
     def generate_embedding(self, text: str) -> list[float]:
         """
@@ -49,4 +157,42 @@ class Embedder:
         list[list[float]]
             A list of vectors, where each vector corresponds to a text in the input list.
         """
-        return self.embedder.embed_documents(texts)
+        if self.store is None:
+            return self.embedder.embed_documents(texts)
+
+        vectors = self.store.get_many(texts)
+        missing = list(
+            dict.fromkeys(
+                text
+                for text, vector in zip(texts, vectors, strict=True)
+                if vector is None
+            )
+        )
+        if missing:
+            # The stored (possibly rounded) copies are used, so that a miss and
+            # a later hit return the same vector.
+            computed = dict(
+                zip(
+                    missing,
+                    self.store.put_many(
+                        missing, self.embedder.embed_documents(missing)
+                    ),
+                    strict=True,
+                )
+            )
+            vectors = [
+                computed[text] if vector is None else vector
+                for text, vector in zip(texts, vectors, strict=True)
+            ]
+        return vectors
+
+    def store_stats(self) -> dict[str, Any] | None:
+        """
+        Returns the hit rate of the embedding store, or None without a store.
+
+        Returns
+        -------
+        dict[str, Any] | None
+            EmbeddingStore.stats() or None.
+        """
+        return self.store.stats() if self.store is not None else None
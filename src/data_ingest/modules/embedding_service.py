@@ -0,0 +1,450 @@
+"""
+Embedding sidecar that serves one copy of the model to all API workers.
+
+When EMBEDDING_SERVICE_SOCKET is set, the Embedder sends texts to this process over
+a Unix socket instead of loading its own copy of the model.
+
+Usage:
+    python -m src.data_ingest.modules.embedding_service [--socket PATH]
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/tmp/chatbot_mini_embeddings.sock"
+# Per-request timeout of the client, in seconds.
+EMBEDDING_SERVICE_TIMEOUT = float(os.getenv("EMBEDDING_SERVICE_TIMEOUT", 10))
+# How long the first request waits for a sidecar that is still starting up.
+EMBEDDING_SERVICE_STARTUP_WAIT = float(os.getenv("EMBEDDING_SERVICE_STARTUP_WAIT", 30))
+# After a failure, the in-process model is used for this long before reconnecting.
+EMBEDDING_SERVICE_RETRY_SECONDS = float(
+    os.getenv("EMBEDDING_SERVICE_RETRY_SECONDS", 30)
+)
+
+MAX_MESSAGE_BYTES = 256 * 1024 * 1024
+_LENGTH = struct.Struct("!I")
+
+
+class EmbeddingServiceError(RuntimeError):
+    """
+    Raised when the embedding service rejects a request or answers incorrectly.
+    """
+
+
+def _send_message(sock: socket.socket, payload: bytes) -> None:
+    """
+    Sends one length-prefixed message.
+    """
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes | None:
+    """
+    Reads exactly `size` bytes, or returns None if the peer closed first.
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            return None
+        received += count
+    return bytes(buffer)
+
+
+def _recv_message(sock: socket.socket) -> bytes | None:
+    """
+    Reads one length-prefixed message, or returns None at end of stream.
+
+    Raises
+    ------
+    EmbeddingServiceError
+        If the announced length exceeds MAX_MESSAGE_BYTES.
+    """
+    header = _recv_exactly(sock, _LENGTH.size)
+    if header is None:
+        return None
+    (size,) = _LENGTH.unpack(header)
+    if size > MAX_MESSAGE_BYTES:
+        raise EmbeddingServiceError(f"Message of {size} bytes exceeds the limit.")
+    return _recv_exactly(sock, size)
+
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """
+    Serves the requests of one client connection until it is closed.
+
+    Each message is a 4-byte big-endian length followed by the payload. A request
+    is a JSON object {"model": str, "backend": str, "texts": [str], "query": bool}.
+    The reply is a JSON header {"model": str, "backend": str, "rows": n, "dim": d},
+    or {"error": str}, followed on success by n * d little-endian float32 values.
+    """
+
+    server: "EmbeddingServer"
+
+    def handle(self) -> None:
+        while True:
+            try:
+                message = _recv_message(self.request)
+            except (OSError, EmbeddingServiceError) as e:
+                logger.warning("Dropping embedding client: %s", e)
+                return
+            if message is None:
+                return
+
+            try:
+                request = json.loads(message)
+                vectors = self.server.embed(
+                    request["texts"],
+                    request.get("model"),
+                    request.get("query", False),
+                    request.get("backend"),
+                )
+                header = {
+                    "model": self.server.embedder.model_name,
+                    "backend": self.server.embedder.backend,
+                    "rows": vectors.shape[0],
+                    "dim": vectors.shape[1],
+                }
+                replies = [json.dumps(header).encode(), vectors.astype("<f4").tobytes()]
+            except Exception as e:
+                logger.error("Embedding request failed: %s", e)
+                replies = [json.dumps({"error": str(e)}).encode()]
+
+            try:
+                for reply in replies:
+                    _send_message(self.request, reply)
+            except OSError as e:
+                logger.warning("Dropping embedding client: %s", e)
+                return
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server running the embedding model for many clients.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, embedder: Any):
+        """
+        Binds the socket, replacing a stale socket file left by a previous run.
+
+        Parameters
+        ----------
+        socket_path : str
+            Path of the Unix socket.
+        embedder : Embedder
+            The in-process embedder serving the requests.
+        """
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+        self.embedder = embedder
+        self.requests = 0
+        self.texts = 0
+        self._model_lock = threading.Lock()
+        super().__init__(socket_path, EmbeddingRequestHandler)
+
+    def embed(
+        self,
+        texts: list[str],
+        model: str | None,
+        query: bool,
+        backend: str | None = None,
+    ) -> np.ndarray:
+        """
+        Embeds texts with the served model.
+
+        Parameters
+        ----------
+        texts : list[str]
+            The texts to embed.
+        model : str | None
+            The model the client expects; must match the served model if given.
+        query : bool
+            Whether the single text is a query (embed_query) or documents.
+        backend : str | None, optional
+            The backend the client expects; must match the served one if given.
+
+        Returns
+        -------
+        np.ndarray
+            The embeddings, one row per text.
+
+        Raises
+        ------
+        EmbeddingServiceError
+            If the client expects another model or backend.
+        """
+        served = (self.embedder.model_name, self.embedder.backend)
+        if (model and model != served[0]) or (backend and backend != served[1]):
+            raise EmbeddingServiceError(
+                f"Service runs '{served[0]}' ({served[1]}), client expects "
+                f"'{model}' ({backend})."
+            )
+        with self._model_lock:
+            if query and len(texts) == 1:
+                vectors = [self.embedder.generate_embedding(texts[0])]
+            else:
+                vectors = self.embedder.generate_embeddings(texts)
+            self.requests += 1
+            self.texts += len(texts)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+class RemoteEmbeddingModel:
+    """
+    Client of the embedding service with a fallback to an in-process model.
+
+    Exposes the embed_query/embed_documents interface of HuggingFaceEmbeddings, so
+    the Embedder can use it as its model. Each thread keeps its own connection. If
+    the service cannot be reached or fails, the fallback model is loaded (once)
+    and used until EMBEDDING_SERVICE_RETRY_SECONDS have passed.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        model_name: str,
+        fallback: Callable[[], Any],
+        backend: str | None = None,
+        timeout: float = EMBEDDING_SERVICE_TIMEOUT,
+        startup_wait: float = EMBEDDING_SERVICE_STARTUP_WAIT,
+        retry_seconds: float = EMBEDDING_SERVICE_RETRY_SECONDS,
+    ):
+        """
+        Parameters
+        ----------
+        socket_path : str
+            Path of the service's Unix socket.
+        model_name : str
+            The model the service must run.
+        fallback : Callable[[], Any]
+            Loads the in-process model used while the service is unavailable.
+        backend : str | None, optional
+            The backend the service must run (torch, onnx, ...); vectors of
+            different backends differ slightly, so a mismatch is rejected.
+            By default any backend is accepted.
+        timeout : float, optional
+            Per-request timeout in seconds, by default EMBEDDING_SERVICE_TIMEOUT.
+        startup_wait : float, optional
+            How long the first request waits for the socket to appear, by
+            default EMBEDDING_SERVICE_STARTUP_WAIT.
+        retry_seconds : float, optional
+            How long to use the fallback after a failure, by default
+            EMBEDDING_SERVICE_RETRY_SECONDS.
+        """
+        self.socket_path = socket_path
+        self.model_name = model_name
+        self.backend = backend
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self._fallback_loader = fallback
+        self._fallback: Any = None
+        self._fallback_lock = threading.Lock()
+        self._local = threading.local()
+        self._startup_deadline = time.monotonic() + startup_wait
+        self._unavailable_until = 0.0
+        self.remote_requests = 0
+        self.fallback_requests = 0
+
+    def _connect(self) -> socket.socket:
+        """
+        Opens a connection, waiting for the service during its startup window.
+        """
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+                return sock
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if time.monotonic() >= self._startup_deadline:
+                    raise
+                time.sleep(0.2)
+
+    def _close(self) -> None:
+        """
+        Closes the connection of the current thread, if any.
+        """
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _request(self, texts: list[str], query: bool) -> np.ndarray:
+        """
+        Sends one request to the service and returns the embeddings.
+
+        Raises
+        ------
+        OSError
+            If the service cannot be reached.
+        EmbeddingServiceError
+            If the service rejects the request or the reply is malformed.
+        """
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = self._local.sock = self._connect()
+
+        request = {
+            "model": self.model_name,
+            "backend": self.backend,
+            "texts": texts,
+            "query": query,
+        }
+        _send_message(sock, json.dumps(request, ensure_ascii=False).encode())
+        message = _recv_message(sock)
+        if message is None:
+            raise EmbeddingServiceError("Service closed the connection.")
+        header = json.loads(message)
+        if "error" in header:
+            raise EmbeddingServiceError(header["error"])
+        if header.get("model") != self.model_name or (
+            self.backend and header.get("backend") != self.backend
+        ):
+            raise EmbeddingServiceError(
+                f"Service answered with '{header.get('model')}' "
+                f"({header.get('backend')}), expected '{self.model_name}' "
+                f"({self.backend})."
+            )
+
+        payload = _recv_message(sock)
+        rows, dim = header["rows"], header["dim"]
+        if payload is None or len(payload) != rows * dim * 4 or rows != len(texts):
+            raise EmbeddingServiceError("Malformed reply from the service.")
+        return np.frombuffer(payload, dtype="<f4").reshape(rows, dim)
+
+    def _get_fallback(self) -> Any:
+        """
+        Returns the in-process model, loading it on first use.
+        """
+        if self._fallback is None:
+            with self._fallback_lock:
+                if self._fallback is None:
+                    logger.info("Loading in-process embedding model as fallback...")
+                    self._fallback = self._fallback_loader()
+        return self._fallback
+
+    def _embed(self, texts: list[str], query: bool) -> list[list[float]]:
+        """
+        Embeds texts remotely, or with the fallback model.
+        """
+        if time.monotonic() >= self._unavailable_until:
+            try:
+                vectors = self._request(texts, query)
+                self.remote_requests += 1
+                return vectors.tolist()
+            except (OSError, EmbeddingServiceError, ValueError) as e:
+                self._close()
+                self._unavailable_until = time.monotonic() + self.retry_seconds
+                logger.warning(
+                    "Embedding service at %s unavailable (%s), using the "
+                    "in-process model for %.0fs.",
+                    self.socket_path,
+                    e,
+                    self.retry_seconds,
+                )
+
+        self.fallback_requests += 1
+        model = self._get_fallback()
+        if query:
+            return [model.embed_query(texts[0])]
+        return model.embed_documents(texts)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds a list of texts.
+
+        Parameters
+        ----------
+        texts : list[str]
+            Texts to embed.
+
+        Returns
+        -------
+        list[list[float]]
+            One vector per text.
+        """
+        if not texts:
+            return []
+        return self._embed(texts, query=False)
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embeds a single query.
+
+        Parameters
+        ----------
+        text : str
+            Text to embed.
+
+        Returns
+        -------
+        list[float]
+            The vector embedding.
+        """
+        return self._embed([text], query=True)[0]
+
+
+def main() -> None:
+    """
+    Loads the embedding model and serves it until interrupted.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    from src.data_ingest.modules.embedder import Embedder
+    from src.rag_api.modules.logs import setup_logging
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--socket",
+        default=os.getenv("EMBEDDING_SERVICE_SOCKET") or DEFAULT_SOCKET_PATH,
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+
+    embedder = Embedder(service_socket=None)
+    embedder.generate_embeddings(["warmup"])
+
+    with EmbeddingServer(args.socket, embedder) as server:
+        logger.info(
+            "Serving %s (%s) on %s", embedder.model_name, embedder.backend, args.socket
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        logger.info("Served %d requests (%d texts).", server.requests, server.texts)
+
+
+if __name__ == "__main__":
+    main()
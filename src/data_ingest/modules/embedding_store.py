@@ -0,0 +1,227 @@
+import fcntl
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.bin"
+INDEX_FILE = "index.sqlite3"
+STORE_DTYPES = ("float16", "float32")
+
+
+def _disk_dtype(dtype: str) -> np.dtype:
+    """
+    Returns the little-endian numpy dtype vectors of the given type are stored as.
+    """
+    return np.dtype(dtype).newbyteorder("<")
+
+
+class EmbeddingStore:
+    """
+    Persistent, content-addressed store of embeddings keyed on (model, text hash).
+
+    Vectors are appended to a single binary file as little-endian float32 (or
+    float16) arrays; a sqlite index maps each key to the offset and length of its
+    vector. Nothing is ever rewritten, so the store survives Chroma wipes, recrawls
+    and pipeline version changes, and is shared by every rebuild that uses the
+    same model. A vector is appended and flushed before its index row is
+    committed, so a crash can leave unused bytes at the end of the file but never
+    an index row pointing at a partial vector. Appends take an exclusive lock on
+    the file, so several processes can share the store.
+    """
+
+    def __init__(self, directory: str, model: str, dtype: str = "float32"):
+        """
+        Opens (or creates) the store.
+
+        Parameters
+        ----------
+        directory : str
+            Directory holding the vectors file and the sqlite index.
+        model : str
+            Identifies the model producing the vectors; part of the key.
+        dtype : str, optional
+            "float32" or "float16" (half the size, about 3 significant digits),
+            by default "float32". Only used for new vectors; stored ones keep
+            the dtype they were written with.
+
+        Raises
+        ------
+        ValueError
+            If the dtype is not supported.
+        """
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"Unsupported embedding store dtype: {dtype}")
+
+        self.directory = directory
+        self.model = model
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(
+            os.path.join(directory, VECTORS_FILE), os.O_RDWR | os.O_CREAT, 0o644
+        )
+        self._conn = sqlite3.connect(
+            os.path.join(directory, INDEX_FILE), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                dim INTEGER NOT NULL,
+                dtype TEXT NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.commit()
+
+        (count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)
+        ).fetchone()
+        logger.info(
+            "Embedding store %s holds %d vectors of %s.", directory, count, model
+        )
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        """
+        Returns the SHA-256 hex digest of the text.
+        """
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: list[str]) -> list[list[float] | None]:
+        """
+        Looks up the stored vectors of texts.
+
+        Parameters
+        ----------
+        texts : list[str]
+            The embedded texts.
+
+        Returns
+        -------
+        list[list[float] | None]
+            The vector of each text, or None where it is not stored.
+        """
+        hashes = [self._hash(text) for text in texts]
+        rows: dict[str, tuple[int, int, str]] = {}
+        with self._lock:
+            # Stay well below sqlite's limit on the number of query parameters.
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for text_hash, offset, dim, dtype in self._conn.execute(
+                    "SELECT text_hash, offset, dim, dtype FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    (self.model, *chunk),
+                ):
+                    rows[text_hash] = (offset, dim, dtype)
+
+        vectors: list[list[float] | None] = []
+        for text_hash in hashes:
+            row = rows.get(text_hash)
+            if row is None:
+                self.misses += 1
+                vectors.append(None)
+                continue
+            offset, dim, dtype = row
+            disk_dtype = _disk_dtype(dtype)
+            data = os.pread(self._fd, dim * disk_dtype.itemsize, offset)
+            self.hits += 1
+            vectors.append(np.frombuffer(data, dtype=disk_dtype).tolist())
+        return vectors
+
+    def put_many(
+        self, texts: list[str], vectors: list[list[float]]
+    ) -> list[list[float]]:
+        """
+        Appends vectors to the store in a single transaction.
+
+        Parameters
+        ----------
+        texts : list[str]
+            The embedded texts.
+        vectors : list[list[float]]
+            Their vectors, aligned with texts.
+
+        Returns
+        -------
+        list[list[float]]
+            The vectors as stored, i.e. as get_many will return them. With
+            float16 they are rounded, so callers should use these instead of
+            the inputs to index the same values on every run.
+        """
+        if not texts:
+            return []
+
+        array = np.asarray(vectors, dtype=_disk_dtype(self.dtype)).reshape(
+            len(texts), -1
+        )
+        dim = array.shape[1]
+        payload = array.tobytes()
+
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset = os.lseek(self._fd, 0, os.SEEK_END)
+                os.pwrite(self._fd, payload, offset)
+                os.fsync(self._fd)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+            row_bytes = dim * array.itemsize
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings "
+                "(model, text_hash, offset, dim, dtype) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        self.model,
+                        self._hash(text),
+                        offset + i * row_bytes,
+                        dim,
+                        self.dtype,
+                    )
+                    for i, text in enumerate(texts)
+                ],
+            )
+            self._conn.commit()
+
+        return array.tolist()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the hit and miss counts of this store since it was opened.
+
+        Returns
+        -------
+        dict[str, Any]
+            'hits', 'misses' and 'hit_rate'.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        """
+        Closes the vectors file and the sqlite index.
+        """
+        with self._lock:
+            self._conn.close()
+            os.close(self._fd)
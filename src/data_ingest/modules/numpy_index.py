@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from src.data_ingest.modules.vector_db import (
+    EXPORT_METADATA_FILE,
+    bump_generation,
+    get_embedding_model,
+    iter_collection,
+    write_export_metadata,
+)
+
+if TYPE_CHECKING:
+    from chromadb.api.models.Collection import Collection
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_FILE = "embeddings.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+METADATA_FILE = EXPORT_METADATA_FILE
+
+
+def export_numpy_index(
+    collection: "Collection",
+    output_dir: str,
+    batch_size: int = 5000,
+    source_generation: str | None = None,
+) -> int:
+    """
+    Exports the collection as an exact-search index of normalized float32 vectors.
+
+    Vectors are written page by page into a .npy file that the API memory-maps,
+    and the texts, ids and metadatas go to a JSON Lines side file in the same
+    row order. Files are written under temporary names and swapped in atomically,
+    so readers never see a half-written index.
+
+    Parameters
+    ----------
+    collection : chromadb.api.models.Collection.Collection
+        The source collection.
+    output_dir : str
+        Directory where the index files are written.
+    batch_size : int, optional
+        Number of records read from Chroma at a time, by default 5000.
+    source_generation : str | None, optional
+        Generation of the source database, recorded in the index metadata.
+
+    Returns
+    -------
+    int
+        The number of exported vectors.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    total = collection.count()
+
+    embeddings_path = os.path.join(output_dir, EMBEDDINGS_FILE)
+    documents_path = os.path.join(output_dir, DOCUMENTS_FILE)
+    tmp_embeddings = f"{embeddings_path}.tmp.npy"
+    tmp_documents = f"{documents_path}.tmp"
+
+    matrix = None
+    row = 0
+    with open(tmp_documents, "w", encoding="utf-8") as docs_file:
+        for page in iter_collection(
+            collection,
+            include=["documents", "metadatas", "embeddings"],
+            batch_size=batch_size,
+        ):
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(
+                    tmp_embeddings,
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=(total, vectors.shape[1]),
+                )
+            matrix[row : row + len(vectors)] = vectors
+            row += len(vectors)
+
+            for doc_id, doc, meta in zip(
+                page["ids"], page["documents"], page["metadatas"], strict=True
+            ):
+                docs_file.write(
+                    json.dumps(
+                        {"id": doc_id, "document": doc, "metadata": meta or {}},
+                        ensure_ascii=False,
+                    )
+                    + "\n"
+                )
+
+    if matrix is None:
+        logger.warning("Collection is empty, numpy index not exported.")
+        os.remove(tmp_documents)
+        return 0
+
+    matrix.flush()
+    del matrix
+
+    os.replace(tmp_embeddings, embeddings_path)
+    os.replace(tmp_documents, documents_path)
+    write_export_metadata(
+        output_dir,
+        {
+            "count": row,
+            "embedding_model": get_embedding_model(collection),
+            "source_generation": source_generation,
+        },
+    )
+    bump_generation(output_dir)
+
+    logger.info("Exported %d vectors to numpy index at %s", row, output_dir)
+    return row
+
+
+class NumpyIndex:
+    """
+    Exact cosine-similarity search over a memory-mapped matrix of normalized vectors.
+
+    The matrix is opened with mmap, so startup does not read it and several worker
+    processes share the same pages through the OS page cache. Search is a single
+    matrix product followed by an argpartition top-k, which ranks results exactly
+    like Chroma's cosine space. The query interface mirrors Collection.query.
+    """
+
+    def __init__(self, index_dir: str):
+        """
+        Opens the index files written by export_numpy_index.
+
+        Parameters
+        ----------
+        index_dir : str
+            Directory containing the index files.
+        """
+        self.index_dir = index_dir
+        self.embeddings = np.load(
+            os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r"
+        )
+
+        self.ids: list[str] = []
+        self.documents: list[str] = []
+        self.metadatas: list[dict[str, Any]] = []
+        with open(os.path.join(index_dir, DOCUMENTS_FILE), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                self.ids.append(record["id"])
+                self.documents.append(record["document"])
+                self.metadatas.append(record["metadata"])
+
+        try:
+            with open(os.path.join(index_dir, METADATA_FILE), encoding="utf-8") as f:
+                self.metadata: dict[str, Any] = json.load(f)
+        except FileNotFoundError:
+            self.metadata = {}
+
+    def count(self) -> int:
+        """
+        Returns the number of indexed vectors.
+        """
+        return int(self.embeddings.shape[0])
+
+    def query(
+        self,
+        query_embeddings: list[list[float]],
+        n_results: int = 10,
+        include: list[str] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Returns the n_results nearest neighbours of each query embedding.
+
+        Parameters
+        ----------
+        query_embeddings : list[list[float]]
+            One or more query vectors.
+        n_results : int, optional
+            Number of neighbours per query, by default 10.
+        include : list[str] | None, optional
+            Any of "documents", "metadatas" and "distances", by default all.
+
+        Returns
+        -------
+        dict[str, Any]
+            A dictionary shaped like the result of Collection.query, with one inner
+            list per query. Distances are cosine distances (1 - similarity).
+        """
+        include = include or ["documents", "metadatas", "distances"]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+
+        n_results = min(n_results, self.count())
+        results: dict[str, Any] = {"ids": []}
+        for field in include:
+            results[field] = []
+
+        if n_results == 0:
+            for field in results:
+                results[field] = [[] for _ in range(len(queries))]
+            return results
+
+        scores = queries @ self.embeddings.T
+        top = np.argpartition(-scores, n_results - 1, axis=1)[:, :n_results]
+
+        for row_scores, candidates in zip(scores, top, strict=True):
+            order = candidates[np.argsort(-row_scores[candidates], kind="stable")]
+            results["ids"].append([self.ids[i] for i in order])
+            if "documents" in include:
+                results["documents"].append([self.documents[i] for i in order])
+            if "metadatas" in include:
+                results["metadatas"].append([self.metadatas[i] for i in order])
+            if "distances" in include:
+                results["distances"].append((1.0 - row_scores[order]).tolist())
+
+        return results
+
+
+def load_numpy_index(index_dir: str) -> NumpyIndex:
+    """
+    Opens the numpy index stored in the given directory.
+
+    Parameters
+    ----------
+    index_dir : str
+        Directory containing the index files.
+
+    Returns
+    -------
+    NumpyIndex
+        The memory-mapped index.
+    """
+    return NumpyIndex(index_dir)
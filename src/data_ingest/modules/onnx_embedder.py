@@ -0,0 +1,299 @@
+"""
+ONNX Runtime backend for the Embedder.
+
+The model is exported once (this step needs torch and optimum) and then served with
+onnxruntime and the `tokenizers` library only, so the API process never imports torch.
+
+Usage:
+    python -m src.data_ingest.modules.onnx_embedder [--quantize] [--model NAME]
+"""
+
+import argparse
+import logging
+import os
+
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Tokenizer
+
+from src.utils.paths import get_data_dir
+
+logger = logging.getLogger(__name__)
+
+ONNX_FILE = "model.onnx"
+QUANTIZED_ONNX_FILE = "model_quantized.onnx"
+VERIFY_TEXTS = [
+    "Dziekanem Wydziału MiNI jest prof. dr hab. Grzegorz Świątek.",
+    "Dziekanat jest czynny w poniedziałek, wtorek, czwartek i piątek w godzinach 11:00-14:00.",
+    "Who is the dean of the faculty?",
+    "ISI",
+    "Informatyka i Systemy Informacyjne to kierunek studiów I i II stopnia.",
+]
+
+
+def default_onnx_dir(model_name: str) -> str:
+    """
+    Returns the default directory for the exported ONNX model.
+
+    Parameters
+    ----------
+    model_name : str
+        The HuggingFace model name.
+
+    Returns
+    -------
+    str
+        Path inside src/data/onnx named after the model.
+    """
+    return get_data_dir("onnx", model_name.replace("/", "__"))
+
+
+class OnnxEmbeddingModel:
+    """
+    Sentence embedding model running on onnxruntime.
+
+    Reproduces the sentence-transformers pipeline of MiniLM-style models: mean pooling
+    over the last hidden state followed by L2 normalization. Exposes the same
+    embed_query/embed_documents interface as HuggingFaceEmbeddings.
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        quantized: bool = False,
+        max_length: int = 256,
+        batch_size: int = 32,
+    ):
+        """
+        Loads the exported model and its tokenizer.
+
+        Parameters
+        ----------
+        model_dir : str
+            Directory produced by export_onnx_model.
+        quantized : bool, optional
+            Whether to load the dynamic-int8-quantized model, by default False.
+        max_length : int, optional
+            Maximum number of tokens per text, by default 256 (as in MiniLM).
+        batch_size : int, optional
+            Number of texts per inference call, by default 32.
+        """
+        file_name = QUANTIZED_ONNX_FILE if quantized else ONNX_FILE
+        model_path = os.path.join(model_dir, file_name)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"ONNX model not found at {model_path}. Export it with "
+                "'python -m src.data_ingest.modules.onnx_embedder"
+                f"{' --quantize' if quantized else ''}'."
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        """
+        Embeds one batch of texts.
+
+        Parameters
+        ----------
+        texts : list[str]
+            Texts to embed.
+
+        Returns
+        -------
+        np.ndarray
+            Normalized float32 embeddings of shape (len(texts), dim).
+        """
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array(
+                [e.type_ids for e in encodings], dtype=np.int64
+            )
+
+        hidden = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.linalg.norm(pooled, axis=1, keepdims=True) + 1e-12
+        return pooled.astype(np.float32)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds a list of texts.
+
+        Parameters
+        ----------
+        texts : list[str]
+            Texts to embed.
+
+        Returns
+        -------
+        list[list[float]]
+            One vector per text.
+        """
+        if not texts:
+            return []
+        batches = [
+            self._embed_batch(texts[i : i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        return np.concatenate(batches).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embeds a single text.
+
+        Parameters
+        ----------
+        text : str
+            Text to embed.
+
+        Returns
+        -------
+        list[float]
+            The vector embedding.
+        """
+        return self.embed_documents([text])[0]
+
+
+def export_onnx_model(model_name: str, output_dir: str, quantize: bool = False) -> None:
+    """
+    Exports a HuggingFace sentence-transformers model to ONNX.
+
+    Requires torch and optimum[onnxruntime]; only needed once per model.
+
+    Parameters
+    ----------
+    model_name : str
+        The HuggingFace model name.
+    output_dir : str
+        Directory where model.onnx and the tokenizer files are written.
+    quantize : bool, optional
+        Whether to also write a dynamic-int8-quantized model_quantized.onnx,
+        by default False.
+
+    Returns
+    -------
+    None
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    logger.info("Exporting %s to ONNX in %s...", model_name, output_dir)
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+
+    if quantize:
+        logger.info("Applying dynamic int8 quantization...")
+        quantizer = ORTQuantizer.from_pretrained(output_dir, file_name=ONNX_FILE)
+        config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=output_dir, quantization_config=config)
+
+
+def verify_onnx_model(
+    model_name: str,
+    model_dir: str,
+    quantized: bool = False,
+    tolerance: float = 0.99,
+    texts: list[str] | None = None,
+) -> float:
+    """
+    Checks that ONNX embeddings point the same way as the PyTorch ones.
+
+    Vectors in an existing index were produced by the PyTorch model, so the ONNX
+    backend may only be used against it if every test text keeps a cosine similarity
+    of at least `tolerance` to its PyTorch embedding.
+
+    Parameters
+    ----------
+    model_name : str
+        The HuggingFace model name.
+    model_dir : str
+        Directory produced by export_onnx_model.
+    quantized : bool, optional
+        Whether to check the quantized model, by default False.
+    tolerance : float, optional
+        Minimum accepted cosine similarity, by default 0.99.
+    texts : list[str] | None, optional
+        Texts to compare on, by default a small set of faculty sentences.
+
+    Returns
+    -------
+    float
+        The smallest cosine similarity observed.
+
+    Raises
+    ------
+    ValueError
+        If any similarity falls below the tolerance.
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    texts = texts or VERIFY_TEXTS
+    reference = np.asarray(
+        HuggingFaceEmbeddings(model_name=model_name).embed_documents(texts)
+    )
+    candidate = np.asarray(
+        OnnxEmbeddingModel(model_dir, quantized=quantized).embed_documents(texts)
+    )
+
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+    similarity = float((reference * candidate).sum(axis=1).min())
+    logger.info("Minimum cosine similarity ONNX vs PyTorch: %.5f", similarity)
+
+    if similarity < tolerance:
+        raise ValueError(
+            f"ONNX embeddings deviate from PyTorch (cosine {similarity:.5f} < {tolerance})."
+        )
+    return similarity
+
+
+def main() -> None:
+    """
+    Exports the embedding model to ONNX and verifies it against PyTorch.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    from src.data_ingest.modules.embedder import EMBEDDING_MODEL
+    from src.rag_api.modules.logs import setup_logging
+
+    parser = argparse.ArgumentParser(description="Export the Embedder model to ONNX.")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--output", help="Output directory (default: src/data/onnx).")
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.99)
+    args = parser.parse_args()
+
+    setup_logging()
+
+    output_dir = args.output or default_onnx_dir(args.model)
+    export_onnx_model(args.model, output_dir, quantize=args.quantize)
+    verify_onnx_model(args.model, output_dir, tolerance=args.tolerance)
+    if args.quantize:
+        verify_onnx_model(
+            args.model, output_dir, quantized=True, tolerance=args.tolerance
+        )
+
+
+if __name__ == "__main__":
+    main()
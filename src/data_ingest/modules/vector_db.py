@@ -1,7 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from typing import TYPE_CHECKING, Any
 
-import chromadb
-from chromadb.api.models.Collection import Collection
+# chromadb takes about a second to import; it is imported where a client is created
+# so that processes using only the numpy index (or not yet serving) do not pay for it.
+if TYPE_CHECKING:
+    from chromadb.api.models.Collection import Collection
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "mini_docs"
+GENERATION_FILE = "index_generation"
+SQLITE_FILE = "chroma.sqlite3"
+# Chroma rejects writes larger than about 5.4k records per call.
+WRITE_BATCH_SIZE = 5000
+# Number of facts embedded and written at a time by sync_vector_db.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 256))
+# Seconds between progress reports of sync_vector_db.
+INGEST_PROGRESS_INTERVAL = float(os.getenv("INGEST_PROGRESS_INTERVAL", 10))
+# Present while sync_vector_db is writing; left behind by a crashed run.
+INGEST_MARKER_FILE = "ingest_in_progress"
+# Written last by the index exporters, with the database generation they exported.
+EXPORT_METADATA_FILE = "index.json"
+# Seconds a replaced Chroma system keeps running for readers that still use it.
+RETIRED_SYSTEM_GRACE_SECONDS = float(os.getenv("RETIRED_SYSTEM_GRACE_SECONDS", 30))
+
+
+def fact_id(text: str, source_url: str) -> str:
+    """
+    Returns the stable ID of a fact, derived from its source and text.
+
+    The same fact always gets the same ID, so re-ingesting it overwrites the
+    stored record instead of adding a duplicate.
+
+    Parameters
+    ----------
+    text : str
+        The fact text.
+    source_url : str
+        The URL the fact was extracted from.
+
+    Returns
+    -------
+    str
+        A hex digest identifying the (source, text) pair.
+    """
+    digest = hashlib.sha256(f"{source_url}\n{text}".encode())
+    return digest.hexdigest()[:32]
+
+
+def _get_or_create_collection(
+    path_to_database: str, embedding_model: str | None
+) -> "Collection":
+    """
+    Opens the collection for writing, creating it if needed.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+    embedding_model : str | None
+        Name of the model that produced the embeddings to be written.
+
+    Returns
+    -------
+    chromadb.api.models.Collection.Collection
+        The ChromaDB collection object named 'mini_docs'.
+
+    Raises
+    ------
+    ValueError
+        If the collection already holds vectors from a different embedding model.
+    """
+    import chromadb
+
+    settings = chromadb.config.Settings(anonymized_telemetry=False)
+    chroma_client = chromadb.PersistentClient(path=path_to_database, settings=settings)
+
+    metadata = {
+        "description": "Database with docs scrapped from mini website",
+        "created": str(datetime.now()),
+        "hnsw:space": "cosine",
+    }
+    if embedding_model:
+        metadata["embedding_model"] = embedding_model
+
+    collection = chroma_client.get_or_create_collection(
+        name=COLLECTION_NAME,
+        metadata=metadata,
+    )
+
+    stored_model = (collection.metadata or {}).get("embedding_model")
+    if embedding_model and stored_model and stored_model != embedding_model:
+        raise ValueError(
+            f"Collection '{COLLECTION_NAME}' was built with '{stored_model}', "
+            f"cannot add embeddings from '{embedding_model}'. Wipe the database first."
+        )
+    return collection
 
 
 def save_to_vector_db(
@@ -9,10 +111,14 @@ def save_to_vector_db(
     embedding: list[float] | list[list[float]],
     source_url: str | list[str],
     path_to_database: str,
+    embedding_model: str | None = None,
 ) -> None:
     """
     Saves text chunks, embeddings, and URLs to the vector database.
 
+    Records are keyed by fact_id and upserted, so saving the same facts again
+    does not duplicate them.
+
     Parameters
     ----------
     text_chunk : str | list[str]
@@ -23,10 +129,18 @@ def save_to_vector_db(
         The source URLs for the documents. Can be a single URL string or a list of strings.
     path_to_database : str
         The local file path to the persistent Chroma database.
+    embedding_model : str | None, optional
+        Name of the model that produced the embeddings. It is recorded in the
+        collection metadata so that queries can be embedded with the same model.
 
     Returns
     -------
     None
+
+    Raises
+    ------
+    ValueError
+        If the collection already holds vectors from a different embedding model.
     """
     if not isinstance(text_chunk, list):
         text_chunk = [text_chunk]
@@ -37,37 +151,278 @@ def save_to_vector_db(
     if not isinstance(source_url, list):
         source_url = [source_url]
 
-    settings = chromadb.config.Settings(anonymized_telemetry=False)
-    chroma_client = chromadb.PersistentClient(path=path_to_database, settings=settings)
+    collection = _get_or_create_collection(path_to_database, embedding_model)
 
-    collection = chroma_client.get_or_create_collection(
-        name="mini_docs",
-        metadata={
-            "description": "Database with docs scrapped from mini website",
-            "created": str(datetime.now()),
-            "hnsw:space": "cosine",
-        },
+    # Identical facts from the same source share an ID; keep the first one.
+    records = {
+        fact_id(text, url): (text, vector, url)
+        for text, vector, url in reversed(
+            list(zip(text_chunk, embedding, source_url, strict=True))
+        )
+    }
+    ids = list(records)
+
+    for i in range(0, len(ids), WRITE_BATCH_SIZE):
+        batch_ids = ids[i : i + WRITE_BATCH_SIZE]
+        collection.upsert(
+            ids=batch_ids,
+            documents=[records[id_][0] for id_ in batch_ids],
+            embeddings=[records[id_][1] for id_ in batch_ids],
+            metadatas=[{"url": records[id_][2]} for id_ in batch_ids],
+        )
+
+    bump_generation(path_to_database)
+
+
+def _write_batch(
+    collection: "Collection",
+    ids: list[str],
+    texts: list[str],
+    urls: list[str],
+    embeddings: list[list[float]],
+) -> None:
+    """
+    Upserts one batch of facts.
+    """
+    collection.upsert(
+        ids=ids,
+        documents=texts,
+        embeddings=embeddings,
+        metadatas=[{"url": url} for url in urls],
     )
 
-    number_of_docs = collection.count()
 
-    batch_size = 5000
-    total_docs = len(text_chunk)
+def _migrate_legacy_records(
+    collection: "Collection", stale: list[str], wanted: set[str], missing: set[str]
+) -> tuple[set[str], list[str]]:
+    """
+    Copies records stored under legacy (non-content) IDs to their content IDs.
 
-    for i in range(0, total_docs, batch_size):
-        batch_texts = text_chunk[i : i + batch_size]
-        batch_embeddings = embedding[i : i + batch_size]
-        batch_urls = source_url[i : i + batch_size]
+    Only facts in `missing` are copied; the stored embeddings are reused, so
+    these facts are not embedded again. The old records stay in `stale`.
 
-        collection.add(
-            documents=batch_texts,
-            embeddings=batch_embeddings,
-            metadatas=[{"url": url} for url in batch_urls],
-            ids=[f"ids_{number_of_docs + i + j + 1}" for j in range(len(batch_texts))],
+    Returns
+    -------
+    tuple[set[str], list[str]]
+        The content IDs that were written, and the stale IDs whose fact is in
+        `wanted`. The latter are duplicates, safe to delete even when the input
+        is incomplete.
+    """
+    migrated: set[str] = set()
+    replaced: list[str] = []
+    for i in range(0, len(stale), WRITE_BATCH_SIZE):
+        page = collection.get(
+            ids=stale[i : i + WRITE_BATCH_SIZE],
+            include=["documents", "metadatas", "embeddings"],
         )
+        ids, texts, urls, vectors = [], [], [], []
+        for old_id, doc, meta, vector in zip(
+            page["ids"],
+            page["documents"],
+            page["metadatas"],
+            page["embeddings"],
+            strict=True,
+        ):
+            url = (meta or {}).get("url", "")
+            new_id = fact_id(doc or "", url)
+            if new_id in wanted:
+                replaced.append(old_id)
+            if new_id in missing and new_id not in migrated:
+                migrated.add(new_id)
+                ids.append(new_id)
+                texts.append(doc)
+                urls.append(url)
+                vectors.append([float(x) for x in vector])
+        if ids:
+            _write_batch(collection, ids, texts, urls, vectors)
+    return migrated, replaced
+
+
+def sync_vector_db(
+    facts: Callable[[], Iterable[tuple[str, str]]],
+    path_to_database: str,
+    embed: Callable[[list[str]], list[list[float]]],
+    embedding_model: str | None = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    keep_stale: Callable[[], bool] | None = None,
+) -> dict[str, int]:
+    """
+    Makes the collection hold exactly the given facts, embedding only new ones.
+
+    The facts are streamed twice. The first pass collects their fact_id and
+    diffs them against the stored IDs. The second pass embeds the facts that
+    are not stored yet in batches of `batch_size` and upserts each batch in a
+    background thread while the next one is embedded, so memory holds at most
+    two batches of texts and vectors (plus the IDs). Stored facts that are not
+    in the input are deleted at the end, unless `keep_stale` says the input was
+    incomplete. Records with IDs from before content hashing are migrated to
+    their new ID by reusing their stored embedding.
+
+    Every written batch is final, so a run that crashed is resumed by running
+    it again: the diff skips what was already written. A marker file next to
+    the database records an unfinished run, so that the resumed run bumps the
+    generation even if nothing was left to write.
+
+    Parameters
+    ----------
+    facts : Callable[[], Iterable[tuple[str, str]]]
+        Returns a fresh iterable of (fact text, source URL) pairs; called twice.
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+    embed : Callable[[list[str]], list[list[float]]]
+        Embeds a list of texts, e.g. Embedder.generate_embeddings.
+    embedding_model : str | None, optional
+        Name of the model used by embed, recorded in the collection metadata.
+    batch_size : int, optional
+        Number of facts embedded and written at a time, by default
+        EMBED_BATCH_SIZE.
+    keep_stale : Callable[[], bool] | None, optional
+        Called after the first pass over the facts. If it returns True (e.g.
+        because some input files could not be read), stored facts missing from
+        the input are kept instead of deleted, as they may still be current.
 
+    Returns
+    -------
+    dict[str, int]
+        Counts of 'added', 'migrated', 'deleted' and 'unchanged' facts, and of
+        stale facts 'kept' because of keep_stale.
 
-def load_vector_db(path_to_database: str) -> Collection:
+    Raises
+    ------
+    ValueError
+        If the collection already holds vectors from a different embedding model,
+        or if the input holds no facts while the collection is not empty.
+    """
+    batch_size = max(1, min(batch_size, WRITE_BATCH_SIZE))
+    wanted = {fact_id(text, url) for text, url in facts()}
+    incomplete = keep_stale is not None and keep_stale()
+
+    collection = _get_or_create_collection(path_to_database, embedding_model)
+    stored = {
+        id_
+        for page in iter_collection(collection, include=[], batch_size=WRITE_BATCH_SIZE)
+        for id_ in page["ids"]
+    }
+    # An empty input is far more likely a wrong path or a failed extraction than
+    # a deliberate wipe of the knowledge base.
+    if not wanted and stored and not incomplete:
+        raise ValueError(
+            f"The input holds no facts; refusing to delete all {len(stored)} facts "
+            f"stored in {path_to_database}. Remove the database to start over."
+        )
+    stale = [id_ for id_ in stored if id_ not in wanted]
+    missing = wanted - stored
+
+    marker_path = os.path.join(path_to_database, INGEST_MARKER_FILE)
+    resumed = os.path.exists(marker_path)
+    if resumed:
+        logger.info("Resuming an interrupted ingest into %s.", path_to_database)
+    if missing or stale:
+        with open(marker_path, "w", encoding="utf-8") as f:
+            f.write(str(time.time_ns()))
+
+    migrated, replaced = _migrate_legacy_records(collection, stale, wanted, missing)
+    missing -= migrated
+    # Migrated legacy records are always removed, their fact is stored anew.
+    to_delete = replaced if incomplete else stale
+    kept = len(stale) - len(to_delete)
+    if kept:
+        logger.warning("The input is incomplete, keeping %d stale facts.", kept)
+    total = len(missing)
+    logger.info(
+        "Vector DB diff: %d new, %d migrated, %d stale, %d unchanged facts.",
+        total,
+        len(migrated),
+        len(stale),
+        len(stored) - len(stale),
+    )
+
+    started = last_report = time.monotonic()
+    done = 0
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer") as writer:
+        pending: Future | None = None
+        batch: list[tuple[str, str, str]] = []
+
+        def flush() -> None:
+            nonlocal pending, done, last_report
+            ids, texts, urls = (list(column) for column in zip(*batch, strict=True))
+            embeddings = embed(texts)
+            # Wait for the previous write before queueing this one.
+            if pending is not None:
+                pending.result()
+            pending = writer.submit(
+                _write_batch, collection, ids, texts, urls, embeddings
+            )
+            done += len(ids)
+            batch.clear()
+
+            now = time.monotonic()
+            if now - last_report >= INGEST_PROGRESS_INTERVAL or done == total:
+                rate = done / max(now - started, 1e-9)
+                logger.info(
+                    "Embedded %d/%d facts (%.1f%%, %.0f facts/s, ETA %.0fs).",
+                    done,
+                    total,
+                    100 * done / total,
+                    rate,
+                    (total - done) / rate,
+                )
+                last_report = now
+
+        if missing:
+            for text, url in facts():
+                id_ = fact_id(text, url)
+                if id_ not in missing:
+                    continue
+                missing.discard(id_)
+                batch.append((id_, text, url))
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+        if pending is not None:
+            pending.result()
+
+    if missing:
+        raise RuntimeError(
+            f"{len(missing)} facts disappeared from the input while ingesting."
+        )
+
+    for i in range(0, len(to_delete), WRITE_BATCH_SIZE):
+        collection.delete(ids=to_delete[i : i + WRITE_BATCH_SIZE])
+
+    if total or migrated or to_delete or resumed:
+        bump_generation(path_to_database)
+    if os.path.exists(marker_path):
+        os.remove(marker_path)
+
+    return {
+        "added": total,
+        "migrated": len(migrated),
+        "deleted": len(to_delete) - len(replaced),
+        "unchanged": len(stored) - len(stale),
+        "kept": kept,
+    }
+
+
+def get_embedding_model(collection: "Collection") -> str | None:
+    """
+    Returns the name of the embedding model recorded for the collection.
+
+    Parameters
+    ----------
+    collection : chromadb.api.models.Collection.Collection
+        The ChromaDB collection.
+
+    Returns
+    -------
+    str | None
+        The model name, or None for collections created without it.
+    """
+    return (collection.metadata or {}).get("embedding_model")
+
+
+def load_vector_db(path_to_database: str) -> "Collection":
     """
     Retrieves the vector database collection from the given path.
 
@@ -82,8 +437,295 @@ def load_vector_db(path_to_database: str) -> Collection:
         The ChromaDB collection object named 'mini_docs'.
     """
     # for use chroma locally, once we got docker set switch PersistentClient() -> HttpClient()
-    chroma_client = chromadb.PersistentClient(path=path_to_database)
+    # Settings must match save_to_vector_db, Chroma refuses two clients for one path
+    # with different settings in the same process.
+    import chromadb
+
+    settings = chromadb.config.Settings(anonymized_telemetry=False)
+    chroma_client = chromadb.PersistentClient(path=path_to_database, settings=settings)
 
-    collection = chroma_client.get_collection(name="mini_docs")
+    collection = chroma_client.get_collection(name=COLLECTION_NAME)
 
     return collection
+
+
+def iter_collection(
+    collection: "Collection",
+    include: list[str] | None = None,
+    batch_size: int = 5000,
+) -> Iterator[dict[str, Any]]:
+    """
+    Iterates over the whole collection in pages of bounded size.
+
+    Parameters
+    ----------
+    collection : chromadb.api.models.Collection.Collection
+        The ChromaDB collection to read.
+    include : list[str] | None, optional
+        Fields to fetch (e.g. ["documents", "metadatas", "embeddings"]), by
+        default documents and metadatas. An empty list fetches only the IDs.
+    batch_size : int, optional
+        Number of records fetched per page, by default 5000.
+
+    Yields
+    ------
+    dict[str, Any]
+        The result of collection.get() for consecutive pages.
+    """
+    include = ["documents", "metadatas"] if include is None else include
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=batch_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+def bump_generation(path_to_database: str) -> str:
+    """
+    Writes a new generation marker next to the database after it has been modified.
+
+    Readers compare the marker with the one they loaded to decide whether their
+    open collection handle is stale.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+
+    Returns
+    -------
+    str
+        The newly written generation identifier.
+    """
+    generation = str(time.time_ns())
+    marker_path = os.path.join(path_to_database, GENERATION_FILE)
+    tmp_path = f"{marker_path}.tmp"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(tmp_path, marker_path)
+
+    return generation
+
+
+def get_generation(path_to_database: str) -> str | None:
+    """
+    Reads the current generation of the database stored at the given path.
+
+    Falls back to the modification time of the Chroma sqlite file for databases
+    written before generation markers were introduced.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+
+    Returns
+    -------
+    str | None
+        The generation identifier, or None if the database does not exist yet.
+    """
+    try:
+        with open(
+            os.path.join(path_to_database, GENERATION_FILE), encoding="utf-8"
+        ) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+
+    try:
+        mtime = os.stat(os.path.join(path_to_database, SQLITE_FILE)).st_mtime_ns
+        return f"mtime-{mtime}"
+    except FileNotFoundError:
+        return None
+
+
+def write_export_metadata(output_dir: str, metadata: dict[str, Any]) -> None:
+    """
+    Atomically writes the metadata file of an exported index.
+
+    Exporters call it after all other index files are in place, so an export that
+    crashed halfway still carries the source generation of the previous one.
+
+    Parameters
+    ----------
+    output_dir : str
+        Directory of the exported index.
+    metadata : dict[str, Any]
+        The metadata, including the 'source_generation' the index was built from.
+
+    Returns
+    -------
+    None
+    """
+    metadata_path = os.path.join(output_dir, EXPORT_METADATA_FILE)
+    with open(f"{metadata_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    os.replace(f"{metadata_path}.tmp", metadata_path)
+
+
+def get_exported_generation(output_dir: str) -> str | None:
+    """
+    Reads the database generation an exported index was built from.
+
+    Parameters
+    ----------
+    output_dir : str
+        Directory of the exported index.
+
+    Returns
+    -------
+    str | None
+        The source generation, or None if the index is missing, was exported
+        before source generations were recorded, or its metadata is unreadable.
+    """
+    try:
+        with open(
+            os.path.join(output_dir, EXPORT_METADATA_FILE), encoding="utf-8"
+        ) as f:
+            return json.load(f).get("source_generation")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _evict_chroma_system(path_to_database: str) -> Any:
+    """
+    Removes the Chroma system cached for one database path.
+
+    Chroma shares one system per path within a process, so a new client for the
+    path would otherwise reuse the system holding the old HNSW segment. Systems
+    of other paths are left alone.
+
+    Returns
+    -------
+    Any
+        The evicted system, still running, or None if none was cached.
+    """
+    from chromadb.api.client import SharedSystemClient
+
+    identifier = str(path_to_database)
+    getattr(SharedSystemClient, "_identifier_to_refcount", {}).pop(identifier, None)
+    return SharedSystemClient._identifier_to_system.pop(identifier, None)
+
+
+def _stop_retired_system(system: Any) -> None:
+    """
+    Stops a Chroma system replaced by a newer one, releasing its segments,
+    sqlite connections and threads.
+    """
+    try:
+        system.stop()
+    except Exception as e:
+        logger.warning("Failed to stop a replaced Chroma system: %s", e)
+
+
+class CollectionHandle:
+    """
+    Process-wide, thread-safe handle to the 'mini_docs' collection.
+
+    The collection is opened once and reused across requests. On every access
+    the generation marker is checked (a single small file read) and the client
+    is reopened only when ingestion has written a new index; the Chroma system
+    of the replaced collection is stopped after RETIRED_SYSTEM_GRACE_SECONDS,
+    once readers have moved to the new one. A different loader
+    can be given to manage other index types stored with a generation marker
+    (e.g. the numpy exact-search index).
+    """
+
+    def __init__(
+        self,
+        path_to_database: str,
+        loader: Callable[[str], Any] | None = None,
+    ):
+        """
+        Initializes the handle without opening the database.
+
+        Parameters
+        ----------
+        path_to_database : str
+            The local file path to the persistent Chroma database
+            (or the index directory understood by loader).
+        loader : Callable[[str], Any] | None, optional
+            Function opening the index at the given path, by default load_vector_db.
+        """
+        self.path_to_database = path_to_database
+        self.loader = loader or load_vector_db
+        self._lock = threading.Lock()
+        self._collection: Any = None
+        self._generation: str | None = None
+
+    @property
+    def generation(self) -> str | None:
+        """
+        The generation of the currently loaded collection, or None if not loaded.
+        """
+        return self._generation
+
+    def get(self) -> Any:
+        """
+        Returns the open collection, reloading it if the index has changed on disk.
+
+        Returns
+        -------
+        Any
+            The ChromaDB collection object named 'mini_docs', or whatever the
+            configured loader returns.
+        """
+        current = get_generation(self.path_to_database)
+        collection = self._collection
+        if collection is not None and current == self._generation:
+            return collection
+
+        with self._lock:
+            if self._collection is None or current != self._generation:
+                if self._collection is not None:
+                    logger.info(
+                        "Index generation changed (%s -> %s), reopening collection.",
+                        self._generation,
+                        current,
+                    )
+                retired = None
+                if self._collection is not None and self.loader is load_vector_db:
+                    # Open a new system so the HNSW segment written by the ingest
+                    # process is read again.
+                    retired = _evict_chroma_system(self.path_to_database)
+                try:
+                    self._collection = self.loader(self.path_to_database)
+                except Exception:
+                    if retired is not None:
+                        self._restore_system(retired)
+                    raise
+                self._generation = current
+
+                if retired is not None:
+                    # Readers on the lock-free path above may still be querying
+                    # the old collection, so its system is stopped a bit later.
+                    timer = threading.Timer(
+                        RETIRED_SYSTEM_GRACE_SECONDS,
+                        _stop_retired_system,
+                        args=(retired,),
+                    )
+                    timer.daemon = True
+                    timer.start()
+            return self._collection
+
+    def _restore_system(self, system: Any) -> None:
+        """
+        Puts back the evicted system of the current collection after a failed
+        reload, so it is evicted and stopped by the next successful one.
+        """
+        from chromadb.api.client import SharedSystemClient
+
+        SharedSystemClient._identifier_to_system.setdefault(
+            str(self.path_to_database), system
+        )
+
+    def reset(self) -> None:
+        """
+        Drops the cached collection so that the next access reopens it.
+        """
+        with self._lock:
+            self._collection = None
+            self._generation = None
@@ -1,9 +1,13 @@
+import json
 import os
+from collections.abc import Iterator
+from typing import Any
 
 import requests
 import streamlit as st
 
 API_URL = os.getenv("API_URL", "http://127.0.0.1:8000/chat")
+STREAM_API_URL = os.getenv("STREAM_API_URL", f"{API_URL}/stream")
 
 st.set_page_config(page_title="Chatbot Wydziału MiNI PW", page_icon="🎓")
 
@@ -64,39 +68,76 @@ def t(key: str, lang: str) -> str:
     return UI_TEXTS.get(key, {}).get(lang, UI_TEXTS.get(key, {}).get("pl", ""))
 
 
+def iter_sse_events(response: requests.Response) -> Iterator[tuple[str, Any]]:
+    """
+    Parses a Server-Sent Events response into (event, data) pairs.
+    The data line of every event is expected to be JSON.
+    """
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:") :].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:") :].strip())
+
+
+def stream_answer(response: requests.Response, sources: list[str]) -> Iterator[str]:
+    """
+    Yields answer tokens from the stream and collects the sources sent at the end.
+    """
+    for event, data in iter_sse_events(response):
+        if event == "token":
+            yield data.get("text", "")
+        elif event == "sources":
+            sources.extend(data.get("sources", []))
+        elif event == "done":
+            break
+
+
 if prompt := st.chat_input(t("placeholders", selected_lang)):
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        with st.spinner(t("thinking", selected_lang)):
-            try:
+        try:
+            with st.spinner(t("thinking", selected_lang)):
                 response = requests.post(
-                    API_URL, json={"query": prompt, "language": selected_lang}
+                    STREAM_API_URL,
+                    json={"query": prompt, "language": selected_lang},
+                    stream=True,
                 )
-                if response.status_code == 200:
-                    data = response.json()
-                    answer = data.get("answer", t("no_answer", selected_lang))
-                    sources = list(dict.fromkeys(data.get("sources", [])[:5]))
-
-                    full_response = answer
-                    if sources:
-                        full_response += (
-                            "\n\n**"
-                            + t("sources", selected_lang)
-                            + ":**\n"
-                            + "\n".join([f"- {s}" for s in sources])
-                        )
-                    else:
-                        st.error(
-                            f"{t('api_error', selected_lang)}: {response.status_code}"
-                        )
-
-                    st.markdown(full_response)
-                    st.session_state.messages.append(
-                        {"role": "assistant", "content": full_response}
+
+            if response.status_code == 200:
+                sources: list[str] = []
+                answer = st.write_stream(stream_answer(response, sources))
+                if not answer:
+                    answer = t("no_answer", selected_lang)
+                    st.markdown(answer)
+
+                full_response = answer
+                sources = list(dict.fromkeys(sources[:5]))
+                if sources:
+                    sources_md = (
+                        "**"
+                        + t("sources", selected_lang)
+                        + ":**\n"
+                        + "\n".join([f"- {s}" for s in sources])
                     )
+                    st.markdown(sources_md)
+                    full_response += "\n\n" + sources_md
+
+                st.session_state.messages.append(
+                    {"role": "assistant", "content": full_response}
+                )
+            else:
+                st.error(f"{t('api_error', selected_lang)}: {response.status_code}")
 
-            except Exception as e:
-                st.error(f"{t('connection_error', selected_lang)} {e}")
+        except Exception as e:
+            st.error(f"{t('connection_error', selected_lang)} {e}")
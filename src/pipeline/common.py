@@ -1,17 +1,19 @@
 import logging
 import os
+from functools import cache
 from typing import Any
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 CURRENT_VERSION = int(os.getenv("PIPELINE_VERSION", 1))
 MODEL_WORKER = os.getenv("MODEL_NAME", "openai/gpt-4o-mini")
+# Any OpenAI-compatible endpoint, e.g. the stand-in server used by the load tests.
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 
 
 PIPELINE_CONFIG = {
@@ -73,8 +75,35 @@ def get_llm_client() -> OpenAI:
         logger.warning("OPENROUTER_API_KEY not found in environment variables.")
 
     client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
+        base_url=OPENROUTER_BASE_URL,
         api_key=openrouter_api_key,
     )
 
     return client
+
+
+@cache
+def get_async_llm_client() -> AsyncOpenAI:
+    """
+    Returns a shared asynchronous OpenAI client for OpenRouter API.
+
+    The client is created once per process so that its connection pool is reused
+    across requests served by the event loop.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    openai.AsyncOpenAI
+        The initialized asynchronous client configured for OpenRouter.
+    """
+    openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+    if not openrouter_api_key:
+        logger.warning("OPENROUTER_API_KEY not found in environment variables.")
+
+    return AsyncOpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=openrouter_api_key,
+    )
@@ -5,6 +5,7 @@ import pandas as pd
 from docx import Document
 
 from src.pipeline.common import CURRENT_VERSION, get_config, logger
+from src.rag_api.modules.logs import setup_logging
 
 config = get_config()
 
@@ -143,4 +144,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
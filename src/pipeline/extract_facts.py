@@ -1,5 +1,12 @@
 import json
 import os
+import random
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+import openai
+from openai import OpenAI
 
 from src.pipeline.common import (
     CURRENT_VERSION,
@@ -8,12 +15,29 @@ from src.pipeline.common import (
     get_llm_client,
     logger,
 )
+from src.rag_api.modules.logs import setup_logging
 
 config = get_config()
 
 INPUT_DIR = "src/data/processed_text"
 OUTPUT_DIR = "src/data/facts"
 
+# Maximum number of LLM requests in flight.
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", 8))
+# Request quota of the OpenRouter key; 0 disables rate limiting.
+EXTRACT_REQUESTS_PER_MINUTE = float(os.getenv("EXTRACT_REQUESTS_PER_MINUTE", 60))
+EXTRACT_BURST = int(os.getenv("EXTRACT_BURST", 5))
+EXTRACT_MAX_RETRIES = int(os.getenv("EXTRACT_MAX_RETRIES", 5))
+EXTRACT_RETRY_BASE_DELAY = float(os.getenv("EXTRACT_RETRY_BASE_DELAY", 1.0))
+
+# Rate limits (429), server errors (5xx), timeouts and connection errors.
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
 SYSTEM_PROMPT = """
     Jesteś inteligentnym asystentem z Wydziału MiNI PW, który pomaga wyodrębniać fakty z różnych dokumentów.
     Cechujesz się szczegółowością i precyzją.
@@ -28,12 +52,136 @@ SYSTEM_PROMPT = """
 """
 
 
-def extract_facts_list(text: str, filename: str) -> list[str]:
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the rate of LLM requests.
+
+    Holds up to `burst` tokens and refills at `rate` tokens per second; every
+    request takes one token, waiting for it if the bucket is empty.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Parameters
+        ----------
+        rate : float
+            Tokens added per second. With 0 or less, acquire() never waits.
+        burst : int, optional
+            Capacity of the bucket, by default 1.
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Takes one token, blocking until one is available.
+        """
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+rate_limiter = TokenBucket(EXTRACT_REQUESTS_PER_MINUTE / 60, burst=EXTRACT_BURST)
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Returns the wait before retrying: the server's Retry-After if it sent one,
+    otherwise an exponential backoff delay with full jitter.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return float(retry_after)
+    except ValueError:
+        pass
+    return random.uniform(0, EXTRACT_RETRY_BASE_DELAY * 2**attempt)
+
+
+def _complete(client: OpenAI, chunk: str, filename: str) -> str:
+    """
+    Asks the LLM for the facts of one chunk, retrying transient errors.
+
+    Every attempt takes a token from rate_limiter. Rate limits (429), server
+    errors (5xx), timeouts and connection errors are retried up to
+    EXTRACT_MAX_RETRIES times; other errors are raised at once.
+
+    Raises
+    ------
+    openai.APIError
+        If the request failed and was not retried, or every retry failed.
+    """
+    attempt = 0
+    while True:
+        rate_limiter.acquire()
+        try:
+            response = client.chat.completions.create(
+                model=MODEL_WORKER,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Tekst:\n{chunk}"},
+                ],
+                temperature=0.1,
+            )
+            return response.choices[0].message.content.strip()
+        except RETRYABLE_ERRORS as e:
+            if attempt >= EXTRACT_MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            attempt += 1
+            logger.warning(
+                f"LLM request for {filename} failed ({type(e).__name__}), "
+                f"retry {attempt}/{EXTRACT_MAX_RETRIES} in {delay:.1f}s."
+            )
+            time.sleep(delay)
+
+
+def _extract_chunk_facts(client: OpenAI, chunk: str, filename: str) -> list[str]:
+    """
+    Returns the facts the LLM extracted from one chunk of a file.
+
+    An answer that is not a JSON list is logged and yields no facts; API errors
+    are raised.
+    """
+    content = _complete(client, chunk, filename)
+
+    if content.startswith("```"):
+        content = content.replace("```json", "").replace("```", "")
+
+    try:
+        parsed = json.loads(content)
+        if isinstance(parsed, list):
+            return parsed
+    except json.JSONDecodeError:
+        logger.error(f"Error processing: {filename}")
+    return []
+
+
+def extract_facts_list(
+    text: str, filename: str, executor: Executor | None = None
+) -> list[str]:
     """
     Decides whether to use LLM or return raw text based on config.
 
     With LLM, it retrieves a list of fact strings from the provided text using the LLM client.
-    Each fact is expected to be a complete sentence extracted from the text.
+    Each fact is expected to be a complete sentence extracted from the text. The text is
+    split into 15000-character chunks, which are sent concurrently when an executor is
+    given; the facts are returned in chunk order either way.
 
     Parameters
     ----------
@@ -41,16 +189,19 @@ def extract_facts_list(text: str, filename: str) -> list[str]:
         The raw input text from which to extract facts.
     filename : str
         The name of the file being processed (used for error logging).
+    executor : concurrent.futures.Executor | None, optional
+        Runs the LLM requests of the chunks; by default they run one after another.
 
     Returns
     -------
     list[str]
         A list of strings, where each string is a fact (or the whole text if LLM is disabled).
+        Empty if any chunk failed with an API error.
     """
     if not config["use_llm_for_facts"]:
         return [text.strip()]
 
-    client = get_llm_client()
+    client = get_llm_client().with_options(max_retries=0)
 
     try:
         chunk_size = 15000
@@ -58,34 +209,70 @@ def extract_facts_list(text: str, filename: str) -> list[str]:
             text[i : i + chunk_size] for i in range(0, len(text), chunk_size)
         ]
 
-        raw_facts_strings = []
+        run = executor.map if executor is not None else map
+        chunk_facts = run(
+            lambda chunk: _extract_chunk_facts(client, chunk, filename), text_chunks
+        )
+        return [fact for facts in chunk_facts for fact in facts]
 
-        for chunk in text_chunks:
-            response = client.chat.completions.create(
-                model=MODEL_WORKER,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": f"Tekst:\n{chunk}"},
-                ],
-                temperature=0.1,
-            )
-            content = response.choices[0].message.content.strip()
+    except Exception as e:
+        logger.error(f"Error API for {filename}: {e}")
+        return []
 
-            if content.startswith("```"):
-                content = content.replace("```json", "").replace("```", "")
 
-            try:
-                parsed = json.loads(content)
-                if isinstance(parsed, list):
-                    raw_facts_strings.extend(parsed)
-            except json.JSONDecodeError:
-                logger.error(f"Error processing: {filename}")
+def _read_source(folder: str, txt_file: str) -> tuple[str, str]:
+    """
+    Reads a text file and resolves its source URL.
 
-        return raw_facts_strings
+    The URL comes from a "URL: " first line, or from a metadata file in
+    INPUT_DIR if there is one, falling back to the file name.
 
-    except Exception as e:
-        logger.error(f"Error API for {filename}: {e}")
-        return []
+    Returns
+    -------
+    tuple[str, str]
+        The source URL and the text content.
+    """
+    base_name = os.path.splitext(txt_file)[0]
+    txt_path = os.path.join(folder, txt_file)
+
+    with open(txt_path, encoding="utf-8") as f:
+        lines = f.readlines()
+
+    if lines and lines[0].startswith("URL: "):
+        source_url = lines[0].replace("URL: ", "").strip()
+        text_content = "".join(lines[1:]).strip()
+    else:
+        source_url = txt_file  # Fallback to filename
+        text_content = "".join(lines).strip()
+
+    # Check if there is a metadata file that should override the URL
+    meta_path = os.path.join(INPUT_DIR, f"{txt_file.replace('.txt', '.json')}")
+    if not os.path.exists(meta_path):
+        meta_path = os.path.join(INPUT_DIR, f"{base_name}.json")
+
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+            source_url = meta.get("source_url", source_url)
+
+    return source_url, text_content
+
+
+def _save_facts(txt_file: str, source_url: str, content_list: list[str]) -> None:
+    """
+    Writes the facts of one text file to OUTPUT_DIR.
+    """
+    if not content_list:
+        return
+
+    base_name = os.path.splitext(txt_file)[0]
+    structured_output = [{"source": source_url, "fact": item} for item in content_list]
+
+    out_path = os.path.join(OUTPUT_DIR, f"{base_name}_facts.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(structured_output, f, indent=2, ensure_ascii=False)
+
+    logger.info(f"Saved {len(structured_output)} items to {out_path}")
 
 
 def main() -> None:
@@ -95,6 +282,11 @@ def main() -> None:
     Processes all .txt files in the input folders, extracts facts using the LLM (if configured),
     and saves them in the output directory with associated source URLs.
 
+    Up to EXTRACT_CONCURRENCY LLM requests run at a time, at most
+    EXTRACT_REQUESTS_PER_MINUTE of them per minute. Results are written in the order
+    the files are listed, so the output is the same as that of a sequential run
+    (including which file wins when two folders hold files with the same name).
+
     Parameters
     ----------
     None
@@ -112,6 +304,7 @@ def main() -> None:
     )
     logger.info(f"Starting extraction. Version: {CURRENT_VERSION} | Mode: {mode_info}")
 
+    sources = []
     for folder in input_folders:
 
         if not os.path.exists(folder):
@@ -119,46 +312,38 @@ def main() -> None:
             continue
 
         files = [f for f in os.listdir(folder) if f.endswith(".txt")]
-
-        for txt_file in files:
-            base_name = os.path.splitext(txt_file)[0]
-            txt_path = os.path.join(folder, txt_file)
-
-            with open(txt_path, encoding="utf-8") as f:
-                lines = f.readlines()
-
-            if lines and lines[0].startswith("URL: "):
-                source_url = lines[0].replace("URL: ", "").strip()
-                text_content = "".join(lines[1:]).strip()
-            else:
-                source_url = txt_file  # Fallback to filename
-                text_content = "".join(lines).strip()
-
-            # Check if there is a metadata file that should override the URL
-            meta_path = os.path.join(INPUT_DIR, f"{txt_file.replace('.txt', '.json')}")
-            if not os.path.exists(meta_path):
-                meta_path = os.path.join(INPUT_DIR, f"{base_name}.json")
-
-            if os.path.exists(meta_path):
-                with open(meta_path, encoding="utf-8") as f:
-                    meta = json.load(f)
-                    source_url = meta.get("source_url", source_url)
-
+        sources.extend((folder, txt_file) for txt_file in files)
+
+    concurrency = max(1, EXTRACT_CONCURRENCY)
+    # Files wait on their chunks, which run in a separate pool, so a file
+    # never blocks a thread that one of its chunks needs.
+    with (
+        ThreadPoolExecutor(concurrency, thread_name_prefix="extract-llm") as llm_pool,
+        ThreadPoolExecutor(concurrency, thread_name_prefix="extract-file") as file_pool,
+    ):
+
+        def process(folder: str, txt_file: str) -> tuple[str, list[str]]:
+            source_url, text_content = _read_source(folder, txt_file)
             logger.info(f"Processing: {txt_file} (Source: {source_url})")
-
-            content_list = extract_facts_list(text_content, txt_file)
-
-            if content_list:
-                structured_output = [
-                    {"source": source_url, "fact": item} for item in content_list
-                ]
-
-                out_path = os.path.join(OUTPUT_DIR, f"{base_name}_facts.json")
-                with open(out_path, "w", encoding="utf-8") as f:
-                    json.dump(structured_output, f, indent=2, ensure_ascii=False)
-
-                logger.info(f"Saved {len(structured_output)} items to {out_path}")
+            return source_url, extract_facts_list(text_content, txt_file, llm_pool)
+
+        futures = [file_pool.submit(process, *source) for source in sources]
+
+        started = time.monotonic()
+        for done, ((_, txt_file), future) in enumerate(
+            zip(sources, futures, strict=True), start=1
+        ):
+            source_url, content_list = future.result()
+            _save_facts(txt_file, source_url, content_list)
+
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"Progress: {done}/{len(sources)} files "
+                f"({elapsed:.0f}s elapsed, "
+                f"ETA {elapsed / done * (len(sources) - done):.0f}s)."
+            )
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -1,48 +1,66 @@
 import json
 import logging
 import os
+from collections.abc import Iterator
 
+from src.data_ingest.modules.bm25_index import export_bm25_index
 from src.data_ingest.modules.embedder import Embedder
-from src.data_ingest.modules.vector_db import save_to_vector_db
+from src.data_ingest.modules.numpy_index import export_numpy_index
+from src.data_ingest.modules.vector_db import (
+    get_exported_generation,
+    get_generation,
+    load_vector_db,
+    sync_vector_db,
+)
 from src.pipeline.common import CURRENT_VERSION
+from src.rag_api.modules.logs import setup_logging
 from src.utils.paths import get_data_dir
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 INPUT_DIR = "src/data/facts"
 DB_PATH = os.environ.get("CHROMA_DIR", get_data_dir("chroma_db"))
-
-
-def main() -> None:
+NUMPY_INDEX_DIR = os.environ.get(
+    "NUMPY_INDEX_DIR", os.path.join(DB_PATH, "numpy_index")
+)
+EXPORT_NUMPY_INDEX = os.environ.get("EXPORT_NUMPY_INDEX", "1") == "1"
+BM25_INDEX_DIR = os.environ.get("BM25_INDEX_DIR", os.path.join(DB_PATH, "bm25_index"))
+EXPORT_BM25_INDEX = os.environ.get("EXPORT_BM25_INDEX", "1") == "1"
+# Vectors of previously embedded facts, reused across rebuilds; empty to disable.
+EMBEDDING_STORE_DIR = os.environ.get(
+    "EMBEDDING_STORE_DIR", get_data_dir("cache", "embeddings")
+)
+
+
+def iter_facts(
+    input_dir: str = INPUT_DIR, failed: list[str] | None = None
+) -> Iterator[tuple[str, str]]:
     """
-    Ingests facts from JSON files, generates embeddings, and saves them to ChromaDB.
+    Yields the facts of the JSON files in the input directory, one file at a time.
 
-    This function reads all JSON files from the configured input directory, extracts
-    facts and source URLs, generates vector embeddings for each fact, and stores
-    everything in the vector database. It also logs progress and any errors encountered.
+    Files that cannot be read or have the wrong format are logged and skipped,
+    as are items of a file that are not JSON objects.
 
     Parameters
     ----------
-    None
-
-    Returns
-    -------
-    None
+    input_dir : str, optional
+        Directory with the facts files, by default INPUT_DIR.
+    failed : list[str] | None, optional
+        If given, the names of the skipped files are appended to it.
+
+    Yields
+    ------
+    tuple[str, str]
+        The fact text and its source URL.
     """
-    logger.info(f"Starting ingestion for pipeline version: {CURRENT_VERSION}")
-
-    embedder = Embedder()
-
-    all_text_chunks = []
-    all_urls = []
-
-    files = [f for f in os.listdir(INPUT_DIR) if f.endswith(".json")]
-    logger.info(f"Found {len(files)} files with facts to ingest.")
+    files = sorted(f for f in os.listdir(input_dir) if f.endswith(".json"))
 
     for filename in files:
-        path = os.path.join(INPUT_DIR, filename)
+        path = os.path.join(input_dir, filename)
 
+        # A file's facts are collected before yielding, so that an error in the
+        # middle of a file skips the whole file rather than ending the stream.
+        file_facts = []
         try:
             with open(path, encoding="utf-8") as f:
                 facts_list = json.load(f)
@@ -51,29 +69,139 @@ def main() -> None:
                 logger.warning(
                     f"File {filename} has wrong format, expected a list of facts."
                 )
+                if failed is not None:
+                    failed.append(filename)
                 continue
 
-            for item in facts_list:
+            for position, item in enumerate(facts_list):
+                if not isinstance(item, dict):
+                    logger.warning(
+                        f"Skipping item {position} of {filename}, expected an object."
+                    )
+                    continue
                 fact_text = item.get("fact")
                 source_url = item.get("source", "unknown")
                 if fact_text:
-                    all_text_chunks.append(fact_text)
-                    all_urls.append(source_url)
+                    file_facts.append((fact_text, source_url))
 
         except Exception as e:
             logger.error(f"Error reading file {filename}: {e}")
+            if failed is not None:
+                failed.append(filename)
+            continue
+
+        yield from file_facts
+
+
+def export_indexes(
+    db_path: str = DB_PATH,
+    numpy_index_dir: str | None = NUMPY_INDEX_DIR if EXPORT_NUMPY_INDEX else None,
+    bm25_index_dir: str | None = BM25_INDEX_DIR if EXPORT_BM25_INDEX else None,
+) -> list[str]:
+    """
+    Exports the indexes that were not built from the current database generation.
+
+    Every index records the database generation it was exported from, so an index
+    left stale by a crashed or skipped export is rebuilt by the next run, while a
+    rerun that changed nothing exports nothing.
+
+    Parameters
+    ----------
+    db_path : str, optional
+        The source Chroma database, by default DB_PATH.
+    numpy_index_dir : str | None, optional
+        Directory of the numpy index, or None to skip it. By default
+        NUMPY_INDEX_DIR if EXPORT_NUMPY_INDEX is set.
+    bm25_index_dir : str | None, optional
+        Directory of the BM25 index, or None to skip it. By default
+        BM25_INDEX_DIR if EXPORT_BM25_INDEX is set.
+
+    Returns
+    -------
+    list[str]
+        The directories of the exported indexes.
+    """
+    generation = get_generation(db_path)
+    exported = []
+
+    if numpy_index_dir and get_exported_generation(numpy_index_dir) != generation:
+        logger.info(f"Exporting numpy index ({numpy_index_dir})...")
+        export_numpy_index(
+            load_vector_db(db_path), numpy_index_dir, source_generation=generation
+        )
+        exported.append(numpy_index_dir)
+
+    if bm25_index_dir and get_exported_generation(bm25_index_dir) != generation:
+        logger.info(f"Exporting BM25 index ({bm25_index_dir})...")
+        export_bm25_index(
+            load_vector_db(db_path), bm25_index_dir, source_generation=generation
+        )
+        exported.append(bm25_index_dir)
+
+    return exported
+
+
+def main() -> None:
+    """
+    Ingests facts from JSON files, generates embeddings, and saves them to ChromaDB.
+
+    This function streams the facts and source URLs from the JSON files in the
+    configured input directory and syncs the vector database with them: only facts
+    that are not stored yet are embedded, in fixed-size batches written while the
+    next batch is embedded, and stored facts missing from the input are deleted.
+    If any facts file could not be read, nothing is deleted, since the facts of
+    that file would otherwise look stale. An input without any facts is refused
+    (ValueError) rather than emptying an existing database.
+    Memory use does not grow with the corpus, reruns never duplicate records, and
+    an interrupted run is resumed by starting it again.
 
-    if not all_text_chunks:
-        logger.warning("No data to ingest.")
-        return
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    logger.info(f"Starting ingestion for pipeline version: {CURRENT_VERSION}")
+
+    files = [f for f in os.listdir(INPUT_DIR) if f.endswith(".json")]
+    logger.info(f"Found {len(files)} files with facts to ingest.")
 
-    logger.info(f"Generating embeddings for {len(all_text_chunks)} facts...")
-    embeddings = embedder.generate_embeddings(all_text_chunks)
+    embedder = Embedder(store_dir=EMBEDDING_STORE_DIR or None)
+
+    logger.info(f"Syncing facts with ChromaDB ({DB_PATH})...")
+    failed: list[str] = []
+    counts = sync_vector_db(
+        lambda: iter_facts(failed=failed),
+        DB_PATH,
+        embedder.generate_embeddings,
+        embedding_model=embedder.model_name,
+        keep_stale=lambda: bool(failed),
+    )
+    logger.info(
+        "Added {added}, migrated {migrated}, deleted {deleted}, "
+        "kept {unchanged} facts.".format(**counts)
+    )
+    if failed:
+        logger.warning(
+            "Skipped unreadable files %s; kept %d stale facts instead of deleting "
+            "them. Fix the files and ingest again.",
+            sorted(set(failed)),
+            counts["kept"],
+        )
+    store_stats = embedder.store_stats()
+    if store_stats is not None:
+        logger.info(
+            "Embedding store: {hits} hits, {misses} misses "
+            "(hit rate {hit_rate:.1%}).".format(**store_stats)
+        )
+
+    export_indexes()
 
-    logger.info(f"Saving to ChromaDB ({DB_PATH})...")
-    save_to_vector_db(all_text_chunks, embeddings, all_urls, DB_PATH)
     logger.info("Ready for deployment!")
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -7,10 +7,10 @@ from dotenv import load_dotenv
 from firecrawl import Firecrawl
 
 from src.pipeline.common import CURRENT_VERSION
+from src.rag_api.modules.logs import setup_logging
 
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -199,4 +199,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -1,18 +1,199 @@
+import asyncio
+import json
 import logging
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from typing import Any
 
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
-from src.rag_api.main import query_llm
-from src.rag_api.modules.prompt_builder import build_prompt
-from src.rag_api.modules.retrieval import get_top_k_chunks
-from src.rag_api.modules.translator import translate_text
+from src.rag_api.main import (
+    LLM_ERROR_MESSAGE,
+    get_async_client,
+    query_llm_async,
+    stream_llm_async,
+)
+from src.rag_api.modules.answer_cache import SemanticAnswerCache
+from src.rag_api.modules.cache import normalize_query
+from src.rag_api.modules.logs import SAMPLED, RequestIdMiddleware, setup_logging
+from src.rag_api.modules.metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    MetricsMiddleware,
+    record_cache,
+    render,
+    stage,
+    start_timings,
+)
+from src.rag_api.modules.prompt_builder import build_prompt, select_context
+from src.rag_api.modules.retrieval import (
+    embed_queries_async,
+    embed_query_async,
+    get_index_generation,
+    get_top_k_chunks_async,
+    get_top_k_chunks_batch_async,
+    warmup,
+)
+from src.rag_api.modules.single_flight import AsyncSingleFlight, LeaderAbortedError
+from src.rag_api.modules.translator import (
+    TranslationError,
+    stream_translate_text_async,
+    translate_text_async,
+    translation_cache,
+)
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Requires an index built with a multilingual EMBEDDING_MODEL.
+MULTILINGUAL_RETRIEVAL = os.environ.get("MULTILINGUAL_RETRIEVAL", "0") == "1"
+TRANSLATE_QUERY_FOR_PROMPT = os.environ.get("TRANSLATE_QUERY_FOR_PROMPT", "1") == "1"
+WARMUP_RETRY_SECONDS = int(os.environ.get("WARMUP_RETRY_SECONDS", 10))
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 256))
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", 32))
+
+NO_RESULTS_MESSAGE = "Przepraszam, nie znalazłem w bazie informacji na ten temat."
+
+STATIC_TRANSLATIONS = {
+    NO_RESULTS_MESSAGE: {
+        "en": "Sorry, I could not find any information on this topic in the database.",
+        "ua": "Вибачте, я не знайшов у базі інформації на цю тему.",
+    },
+    LLM_ERROR_MESSAGE: {
+        "en": LLM_ERROR_MESSAGE,
+        "ua": "Вибачте, під час створення відповіді сталася помилка.",
+    },
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Runs application startup and shutdown hooks.
+
+    Parameters
+    ----------
+    app : FastAPI
+        The application instance.
+
+    Yields
+    ------
+    None
+    """
+    translation_cache.prepopulate(STATIC_TRANSLATIONS)
+    app.state.ready = False
+    warmup_task = asyncio.create_task(_warmup(app))
+    yield
+    warmup_task.cancel()
+
+
+async def _warmup(app: FastAPI) -> None:
+    """
+    Loads the embedding model and opens the index in the background.
+
+    The server accepts liveness probes immediately, while /ready reports 503 until
+    the warmup has succeeded. Failures (e.g. the index is not ingested yet) are
+    retried periodically.
+
+    Parameters
+    ----------
+    app : FastAPI
+        The application instance; app.state.ready is set on success.
+
+    Returns
+    -------
+    None
+    """
+    while True:
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(warmup)
+            get_async_client()
+        except Exception as e:
+            logger.error("Warmup failed, retrying in %ds: %s", WARMUP_RETRY_SECONDS, e)
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+            continue
+
+        app.state.ready = True
+        logger.info(
+            "Warmup finished in %.2fs, ready for traffic.", time.perf_counter() - start
+        )
+        return
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(
+    MetricsMiddleware,
+    endpoints={
+        "/chat",
+        "/chat/stream",
+        "/chat/batch",
+        "/health",
+        "/ready",
+        "/metrics",
+    },
+)
+app.add_middleware(RequestIdMiddleware)
+
+
+@app.get("/health")
+async def health_endpoint() -> dict[str, str]:
+    """
+    Liveness probe: answers as soon as the server process is up.
+
+    Returns
+    -------
+    dict[str, str]
+        {"status": "ok"}.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready_endpoint() -> dict[str, str]:
+    """
+    Readiness probe: succeeds only once the embedder and the index are warmed up.
+
+    Returns
+    -------
+    dict[str, str]
+        {"status": "ready"}.
+
+    Raises
+    ------
+    HTTPException
+        While the warmup is still running (503 Service Unavailable).
+    """
+    if not getattr(app.state, "ready", False):
+        raise HTTPException(status_code=503, detail="Warming up")
+    return {"status": "ready"}
+
+
+@app.get("/metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+    """
+    Exposes stage latencies, cache and LLM error counters and in-flight gauges.
+
+    Returns
+    -------
+    PlainTextResponse
+        The metrics in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+answer_cache = SemanticAnswerCache(
+    maxsize=int(os.environ.get("ANSWER_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("ANSWER_CACHE_TTL", 3600)),
+    threshold=float(os.environ.get("ANSWER_CACHE_THRESHOLD", 0.95)),
+)
+
+
+# Identical questions asked concurrently share one retrieval and LLM call.
+chat_flight = AsyncSingleFlight()
 
 
 class QueryRequest(BaseModel):
@@ -23,22 +204,98 @@ class QueryRequest(BaseModel):
     ----------
     query : str
         The question or text input provided by the user.
+    language : str
+        The language of the answer ("pl", "en" or "ua").
+    debug : bool
+        Whether to add per-stage timings in milliseconds to the response.
     """
 
     query: str
     language: str = "pl"
+    debug: bool = False
 
 
-@app.post("/chat")
-def chat_endpoint(request: QueryRequest) -> dict[str, Any]:
+class BatchQueryRequest(BaseModel):
     """
-    Handles chat interactions by retrieving context and generating an LLM response.
+    Pydantic model representing a batch of chat requests.
 
-    1. Validates the input query.
-    2. Retrieves the top-k relevant text chunks from the vector database.
-    3. Builds a prompt using the retrieved context.
-    4. Queries the LLM to generate an answer.
-    5. Returns the answer along with source URLs.
+    Attributes
+    ----------
+    items : list[QueryRequest]
+        The queries to answer, in the order the results should be returned;
+        at most BATCH_MAX_ITEMS.
+    concurrency : int
+        Maximum number of concurrent LLM calls for this batch, between 1 and
+        BATCH_MAX_CONCURRENCY.
+    """
+
+    items: list[QueryRequest] = Field(max_length=BATCH_MAX_ITEMS)
+    concurrency: int = Field(8, ge=1, le=BATCH_MAX_CONCURRENCY)
+
+
+def _extract_sources(sorted_chunks: list[dict[str, Any]]) -> list[str]:
+    """
+    Returns the source URLs of the top retrieved chunks.
+
+    Parameters
+    ----------
+    sorted_chunks : list[dict[str, Any]]
+        Retrieved chunks ordered by relevance.
+
+    Returns
+    -------
+    list[str]
+        Source URLs of at most the first five chunks.
+    """
+    return [chunk.get("source_url", "Unknown") for chunk in sorted_chunks[:5]]
+
+
+def _build_messages(
+    processing_query: str, sorted_chunks: list[dict[str, Any]]
+) -> tuple[list[dict[str, str]], list[dict[str, Any]]]:
+    """
+    Builds the LLM messages from the chunks that fit in the context budget.
+
+    Parameters
+    ----------
+    processing_query : str
+        The query placed in the prompt.
+    sorted_chunks : list[dict[str, Any]]
+        Retrieved chunks ordered by relevance.
+
+    Returns
+    -------
+    tuple[list[dict[str, str]], list[dict[str, Any]]]
+        The messages, and the chunks that made it into the prompt, whose
+        sources are the ones shown to the user.
+    """
+    context = select_context([chunk["text_chunk"] for chunk in sorted_chunks])
+    messages = build_prompt(processing_query, context, fit_to_budget=False)
+    return messages, sorted_chunks[: len(context)]
+
+
+def _sse_event(event: str, data: dict[str, Any]) -> str:
+    """
+    Formats a single Server-Sent Event with a JSON payload.
+
+    Parameters
+    ----------
+    event : str
+        The event name (e.g. 'token', 'sources', 'done').
+    data : dict[str, Any]
+        The payload, serialized as JSON on a single data line.
+
+    Returns
+    -------
+    str
+        The encoded event, terminated by a blank line.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _flight_key(request: QueryRequest) -> tuple[str, str]:
+    """
+    Returns the key under which identical concurrent requests are coalesced.
 
     Parameters
     ----------
@@ -47,47 +304,541 @@ def chat_endpoint(request: QueryRequest) -> dict[str, Any]:
 
     Returns
     -------
-    dict[str, Any]
-        A dictionary containing:
-        - 'answer': The generated response string.
-        - 'sources': A list of source URLs used for the context.
+    tuple[str, str]
+        The normalized query and the target language.
+    """
+    return normalize_query(request.query), request.language
+
+
+def _response_events(
+    response: dict[str, Any], done: dict[str, Any] | None = None
+) -> list[str]:
+    """
+    Encodes a complete response as the SSE events of the streaming endpoint.
+
+    Parameters
+    ----------
+    response : dict[str, Any]
+        A response with 'answer' and 'sources'.
+    done : dict[str, Any] | None, optional
+        Payload of the 'done' event, by default empty.
+
+    Returns
+    -------
+    list[str]
+        A single 'token' event with the whole answer, then 'sources' and 'done'.
+    """
+    return [
+        _sse_event("token", {"text": response["answer"]}),
+        _sse_event("sources", {"sources": response["sources"]}),
+        _sse_event("done", done or {}),
+    ]
+
+
+def _with_total(timings: dict[str, float], start: float) -> dict[str, float]:
+    """
+    Returns the stage timings completed with the total request time.
+
+    Parameters
+    ----------
+    timings : dict[str, float]
+        Milliseconds per stage, as collected since start_timings().
+    start : float
+        time.perf_counter() at the start of the request.
+
+    Returns
+    -------
+    dict[str, float]
+        A copy of the timings with a 'total' entry.
+    """
+    return {**timings, "total": round((time.perf_counter() - start) * 1000, 3)}
+
+
+async def _single_token(text: str) -> AsyncIterator[str]:
+    """
+    Yields the whole text as a single delta.
+    """
+    yield text
+
+
+def _validate_request(request: QueryRequest) -> None:
+    """
+    Rejects requests that cannot be answered.
+
+    Parameters
+    ----------
+    request : QueryRequest
+        The request body containing the user's query.
 
     Raises
     ------
     HTTPException
         If the query is empty (400 Bad Request).
     """
+    if not request.query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    logger.info(
+        "Received query: %s | Target lang: %s",
+        request.query,
+        request.language,
+        extra=SAMPLED,
+    )
+
+
+async def _lookup_cached_answer(
+    request: QueryRequest,
+) -> tuple[list[float], str | None, dict[str, Any] | None]:
+    """
+    Checks the semantic answer cache for a paraphrase of the query.
+
+    Parameters
+    ----------
+    request : QueryRequest
+        The request body containing the user's query.
+
+    Returns
+    -------
+    tuple[list[float], str | None, dict[str, Any] | None]
+        The query embedding and index generation (needed to store the answer
+        later) and the cached response, or None on a miss.
+    """
+    generation = get_index_generation()
+    query_vector = await embed_query_async(request.query)
+    with stage("answer_cache"):
+        cached = await asyncio.to_thread(
+            answer_cache.lookup, query_vector, request.language, generation
+        )
+    record_cache("answer", cached is not None)
+    if cached is not None:
+        logger.info("Serving answer from the semantic answer cache.")
+    return query_vector, generation, cached
+
+
+async def _translate_query(query: str) -> tuple[str, bool]:
+    """
+    Translates the query to Polish, falling back to the original query.
+
+    Parameters
+    ----------
+    query : str
+        The user's query.
+
+    Returns
+    -------
+    tuple[str, bool]
+        The Polish query, and whether the translation succeeded. Answers built
+        on an untranslated query must not be cached.
+    """
+    try:
+        translated = await translate_text_async(
+            query, target_lang_code="pl", strict=True
+        )
+    except TranslationError:
+        return query, False
+    return translated, True
+
+
+async def _retrieve_context(
+    request: QueryRequest,
+) -> tuple[str, list[dict[str, Any]], bool]:
+    """
+    Translates the query to Polish if needed and retrieves context.
+
+    With MULTILINGUAL_RETRIEVAL enabled the original query is embedded directly,
+    so retrieval no longer waits for the translation: both run concurrently, or the
+    translation is skipped entirely if TRANSLATE_QUERY_FOR_PROMPT is disabled.
+
+    Parameters
+    ----------
+    request : QueryRequest
+        The request body containing the user's query.
+
+    Returns
+    -------
+    tuple[str, list[dict[str, Any]], bool]
+        The query used in the prompt, the retrieved chunks, and whether the
+        query translation (if any) succeeded.
+    """
     query = request.query
     lang = request.language
-    if not query:
-        raise HTTPException(status_code=400, detail="Query cannot be empty")
 
-    logger.info(f"Received query: {query} | Target lang: {lang}")
+    if lang == "pl":
+        return query, await get_top_k_chunks_async(query), True
 
-    processing_query = query
-    if lang != "pl":
-        processing_query = translate_text(query, target_lang_code="pl")
+    if MULTILINGUAL_RETRIEVAL:
+        if not TRANSLATE_QUERY_FOR_PROMPT:
+            return query, await get_top_k_chunks_async(query), True
+
+        (processing_query, translated), sorted_chunks = await asyncio.gather(
+            _translate_query(query),
+            get_top_k_chunks_async(query),
+        )
         logger.info(f"Translated query to PL: '{processing_query}'")
+        return processing_query, sorted_chunks, translated
+
+    processing_query, translated = await _translate_query(query)
+    logger.info(f"Translated query to PL: '{processing_query}'")
 
-    sorted_chunks = get_top_k_chunks(processing_query)
+    sorted_chunks = await get_top_k_chunks_async(processing_query)
+    return processing_query, sorted_chunks, translated
 
+
+async def _generate_response(
+    processing_query: str,
+    sorted_chunks: list[dict[str, Any]],
+    lang: str,
+    query_vector: list[float],
+    generation: str | None,
+    cacheable: bool = True,
+) -> dict[str, Any]:
+    """
+    Generates the final answer from retrieved context and caches it.
+
+    The answer is cached only if the query translation, the LLM call and the
+    answer translation succeeded; otherwise it is returned without being stored.
+
+    Parameters
+    ----------
+    processing_query : str
+        The query placed in the prompt.
+    sorted_chunks : list[dict[str, Any]]
+        Retrieved chunks ordered by relevance.
+    lang : str
+        Target language of the answer.
+    query_vector : list[float]
+        Embedding of the original query, used as the answer cache key.
+    generation : str | None
+        Index generation the context was retrieved from.
+    cacheable : bool, optional
+        False if the query translation fell back to the original query.
+
+    Returns
+    -------
+    dict[str, Any]
+        A dictionary with 'answer' and 'sources'.
+    """
     if not sorted_chunks:
-        polish_msg = "Przepraszam, nie znalazłem w bazie informacji na ten temat."
-        final_msg = translate_text(polish_msg, lang) if lang != "pl" else polish_msg
+        final_msg = (
+            await translate_text_async(NO_RESULTS_MESSAGE, lang)
+            if lang != "pl"
+            else NO_RESULTS_MESSAGE
+        )
         return {
             "answer": final_msg,
             "sources": [],
         }
 
-    text_only_chunks = [chunk["text_chunk"] for chunk in sorted_chunks]
-    prompt = build_prompt(processing_query, text_only_chunks)
+    messages, used_chunks = _build_messages(processing_query, sorted_chunks)
 
-    polish_answer = query_llm(prompt)
+    polish_answer = await query_llm_async(messages)
     final_answer = polish_answer
+    complete = cacheable and polish_answer != LLM_ERROR_MESSAGE
     if lang != "pl":
         logger.info(f"Translating answer from PL to {lang}...")
-        final_answer = translate_text(polish_answer, target_lang_code=lang)
+        try:
+            final_answer = await translate_text_async(
+                polish_answer, target_lang_code=lang, strict=True
+            )
+        except TranslationError:
+            complete = False
+
+    response = {"answer": final_answer, "sources": _extract_sources(used_chunks)}
+    if complete:
+        answer_cache.store(query_vector, lang, response, generation)
+
+    return response
+
+
+@app.post("/chat")
+async def chat_endpoint(request: QueryRequest) -> dict[str, Any]:
+    """
+    Handles chat interactions by retrieving context and generating an LLM response.
+
+    The whole request path is asynchronous: OpenRouter calls are awaited and the
+    CPU-bound retrieval runs in a worker thread, so a single worker can hold many
+    conversations that are waiting on the LLM.
+
+    1. Validates the input query.
+    2. Joins an identical request that is already being answered, if any.
+    3. Returns a cached answer if a paraphrase of the query was answered recently.
+    4. Retrieves the top-k relevant text chunks from the vector database.
+    5. Builds a prompt using the retrieved context.
+    6. Queries the LLM to generate an answer.
+    7. Returns the answer along with source URLs.
+
+    Parameters
+    ----------
+    request : QueryRequest
+        The request body containing the user's query.
+
+    Returns
+    -------
+    dict[str, Any]
+        A dictionary containing:
+        - 'answer': The generated response string.
+        - 'sources': A list of source URLs used for the context.
+        - 'timings': Milliseconds per stage, only if request.debug is set.
+
+    Raises
+    ------
+    HTTPException
+        If the query is empty (400 Bad Request).
+    """
+    _validate_request(request)
+    start = time.perf_counter()
+    timings = start_timings()
+
+    response = await chat_flight.do(_flight_key(request), lambda: _answer(request))
+    if request.debug:
+        # The response may be shared with coalesced requests, so it is copied.
+        response = {**response, "timings": _with_total(timings, start)}
+    return response
+
+
+async def _answer(request: QueryRequest) -> dict[str, Any]:
+    """
+    Answers a single request from the answer cache or through the RAG pipeline.
+
+    Parameters
+    ----------
+    request : QueryRequest
+        The request body containing the user's query.
+
+    Returns
+    -------
+    dict[str, Any]
+        A dictionary with 'answer' and 'sources'.
+    """
+    query_vector, generation, cached = await _lookup_cached_answer(request)
+    if cached is not None:
+        return cached
+
+    processing_query, sorted_chunks, translated = await _retrieve_context(request)
+
+    return await _generate_response(
+        processing_query,
+        sorted_chunks,
+        request.language,
+        query_vector,
+        generation,
+        cacheable=translated,
+    )
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: QueryRequest) -> StreamingResponse:
+    """
+    Streams the chat answer as Server-Sent Events while the LLM generates it.
+
+    Emits a sequence of 'token' events carrying text deltas, then a single
+    'sources' event with the source URLs and a final 'done' event (carrying the
+    stage 'timings' if request.debug is set). For non-Polish
+    requests the Polish answer is generated first and its translation is streamed,
+    since the translation is the last step producing user-visible text. A request
+    identical to one already in flight waits for it and receives the whole answer
+    in a single 'token' event, like an answer cache hit. Only completed answers
+    are shared; if the leader's stream fails, its followers answer on their own.
+
+    Parameters
+    ----------
+    request : QueryRequest
+        The request body containing the user's query.
+
+    Returns
+    -------
+    StreamingResponse
+        A 'text/event-stream' response.
+
+    Raises
+    ------
+    HTTPException
+        If the query is empty (400 Bad Request).
+    """
+    _validate_request(request)
+    lang = request.language
+    key = _flight_key(request)
+
+    async def event_stream() -> AsyncIterator[str]:
+        start = time.perf_counter()
+        timings = start_timings()
+
+        def done_payload() -> dict[str, Any]:
+            return {"timings": _with_total(timings, start)} if request.debug else {}
+
+        shared = await chat_flight.join(key)
+        if shared is not None:
+            logger.info("Joined an identical in-flight request.")
+            for event in _response_events(shared, done_payload()):
+                yield event
+            return
+
+        with chat_flight.lead(key) as flight:
+            query_vector, generation, cached = await _lookup_cached_answer(request)
+            if cached is not None:
+                flight.set_result(cached)
+                for event in _response_events(cached, done_payload()):
+                    yield event
+                return
+
+            processing_query, sorted_chunks, translated = await _retrieve_context(
+                request
+            )
+
+            # Text shown instead if the translation fails before its first token.
+            untranslated = None
+            used_chunks: list[dict[str, Any]] = []
+            if not sorted_chunks:
+                if lang != "pl":
+                    untranslated = NO_RESULTS_MESSAGE
+                    tokens = stream_translate_text_async(
+                        NO_RESULTS_MESSAGE, lang, strict=True
+                    )
+                else:
+                    tokens = _single_token(NO_RESULTS_MESSAGE)
+            else:
+                messages, used_chunks = _build_messages(processing_query, sorted_chunks)
+
+                if lang == "pl":
+                    tokens = stream_llm_async(messages)
+                else:
+                    untranslated = await query_llm_async(messages)
+                    logger.info(f"Streaming answer translation from PL to {lang}...")
+                    tokens = stream_translate_text_async(
+                        untranslated, lang, strict=True
+                    )
+
+            parts = []
+            complete = translated and untranslated != LLM_ERROR_MESSAGE
+            try:
+                async for delta in tokens:
+                    parts.append(delta)
+                    yield _sse_event("token", {"text": delta})
+            except Exception as e:
+                logger.error("Answer stream was interrupted: %s", e)
+                complete = False
+                if not parts and untranslated is not None:
+                    parts.append(untranslated)
+                    yield _sse_event("token", {"text": untranslated})
+
+            sources = _extract_sources(used_chunks)
+            response = {"answer": "".join(parts), "sources": sources}
+            complete = complete and response["answer"] != LLM_ERROR_MESSAGE
+            if complete:
+                flight.set_result(response)
+                if sorted_chunks:
+                    answer_cache.store(query_vector, lang, response, generation)
+            else:
+                # Release the followers now, they run the pipeline themselves.
+                flight.set_exception(LeaderAbortedError("Leader's answer failed."))
+
+            yield _sse_event("sources", {"sources": sources})
+            yield _sse_event("done", done_payload())
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(request: BatchQueryRequest) -> StreamingResponse:
+    """
+    Answers many queries in one call and streams the results back as JSON Lines.
+
+    All queries are embedded in one model call and searched with one multi-vector
+    query; translations and LLM calls run concurrently, at most
+    `request.concurrency` at a time. Each output line carries the 'index' of the
+    input item and is emitted in input order. Paraphrases of cached questions are
+    served from the answer cache, and new answers are added to it, so the endpoint
+    can also be used to pre-warm the cache.
+
+    Parameters
+    ----------
+    request : BatchQueryRequest
+        The queries to answer and the concurrency limit.
+
+    Returns
+    -------
+    StreamingResponse
+        An 'application/x-ndjson' response with one JSON object per input item,
+        containing 'index' and either 'answer' and 'sources' or 'error'.
+    """
+    items = request.items
+    semaphore = asyncio.Semaphore(request.concurrency)
+    logger.info("Received batch of %d queries.", len(items))
+
+    valid = [i for i, item in enumerate(items) if item.query]
+    generation = get_index_generation()
+    query_vectors = dict(
+        zip(
+            valid,
+            await embed_queries_async([items[i].query for i in valid]),
+            strict=True,
+        )
+    )
+
+    cached = {}
+    for i in valid:
+        hit = answer_cache.lookup(query_vectors[i], items[i].language, generation)
+        record_cache("answer", hit is not None)
+        if hit is not None:
+            cached[i] = hit
+    pending = [i for i in valid if i not in cached]
+
+    async def translate(i: int) -> tuple[str, bool]:
+        item = items[i]
+        if item.language == "pl" or (
+            MULTILINGUAL_RETRIEVAL and not TRANSLATE_QUERY_FOR_PROMPT
+        ):
+            return item.query, True
+        async with semaphore:
+            return await _translate_query(item.query)
+
+    # Unlike gather, the task group cancels the other translations as soon as one
+    # fails or the request is cancelled.
+    async with asyncio.TaskGroup() as group:
+        translation_tasks = {i: group.create_task(translate(i)) for i in pending}
+    translations = {i: task.result() for i, task in translation_tasks.items()}
+    processing_queries = {i: query for i, (query, _) in translations.items()}
+    retrieval_queries = [
+        items[i].query if MULTILINGUAL_RETRIEVAL else processing_queries[i]
+        for i in pending
+    ]
+    chunks = dict(
+        zip(pending, await get_top_k_chunks_batch_async(retrieval_queries), strict=True)
+    )
+
+    async def generate(i: int) -> dict[str, Any]:
+        async with semaphore:
+            return await _generate_response(
+                processing_queries[i],
+                chunks[i],
+                items[i].language,
+                query_vectors[i],
+                generation,
+                cacheable=translations[i][1],
+            )
+
+    async def answer(i: int) -> dict[str, Any]:
+        return await chat_flight.do(_flight_key(items[i]), lambda: generate(i))
 
-    sources = [chunk.get("source_url", "Unknown") for chunk in sorted_chunks[:5]]
+    async def result_stream() -> AsyncIterator[str]:
+        # Started with the stream, so a response that is never sent leaves no
+        # work behind; an error or a client disconnect cancels what is left.
+        tasks = {i: asyncio.create_task(answer(i)) for i in pending}
+        try:
+            for i in range(len(items)):
+                if i in cached:
+                    result = cached[i]
+                elif i in tasks:
+                    result = await tasks[i]
+                else:
+                    result = {"error": "Query cannot be empty"}
+                yield json.dumps({"index": i, **result}, ensure_ascii=False) + "\n"
+        finally:
+            for task in tasks.values():
+                task.cancel()
 
-    return {"answer": final_answer, "sources": sources}
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
@@ -1,41 +1,114 @@
+import argparse
+import json
 import logging
 import os
+import sys
+import time
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from typing import Any
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
-from src.rag_api.modules.prompt_builder import build_prompt
-from src.rag_api.modules.retrieval import get_top_k_chunks
+from src.pipeline.common import OPENROUTER_BASE_URL
+from src.rag_api.modules.cache import normalize_query
+from src.rag_api.modules.llm_router import (
+    LLM_MODELS,
+    complete,
+    complete_async,
+    stream_async,
+)
+from src.rag_api.modules.logs import setup_logging
+from src.rag_api.modules.metrics import (
+    LLM_FAILED_REQUESTS,
+    LLM_IN_FLIGHT,
+    record_stage,
+    stage,
+)
+from src.rag_api.modules.prompt_builder import build_prompt, select_context
+from src.rag_api.modules.retrieval import get_top_k_chunks, get_top_k_chunks_batch
+from src.rag_api.modules.single_flight import SingleFlight
+from src.rag_api.modules.translator import translate_text
 
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 if not OPENROUTER_API_KEY:
     logger.warning("OPENROUTER_API_KEY not found in environment variables.")
 
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY,
-)
+
+@cache
+def get_client() -> OpenAI:
+    """
+    Returns the shared OpenRouter client, creating it on first use.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    openai.OpenAI
+        The synchronous client.
+    """
+    return OpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=OPENROUTER_API_KEY,
+        # Retries and timeouts are handled per model by llm_router.
+        max_retries=0,
+    )
+
+
+@cache
+def get_async_client() -> AsyncOpenAI:
+    """
+    Returns the shared asynchronous OpenRouter client, creating it on first use.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    openai.AsyncOpenAI
+        The asynchronous client.
+    """
+    return AsyncOpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=OPENROUTER_API_KEY,
+        max_retries=0,
+    )
+
+
 # Highly recommended for usage with RAG, because it's free and has a good performance.
 # In order to run it, one needs to create an account on OpenRouter and get the API key.
 # Then put the API key in the .env file
+# The fallback chain is configured with LLM_MODELS (see llm_router).
 
-MODEL_NAME = "mistralai/mistral-7b-instruct:free"  # "openai/gpt-oss-20b:free"
+MODEL_NAME = LLM_MODELS[0]  # "mistralai/mistral-7b-instruct:free"
 
+LLM_ERROR_MESSAGE = "Sorry, I encountered an error while generating the response."
 
-def query_llm(prompt: str) -> str:
+# Identical questions answered concurrently by the blocking path share one LLM call.
+chat_flight = SingleFlight()
+
+
+def query_llm(messages: list[dict[str, str]]) -> str:
     """
     Generates an answer using the OpenRouter API.
 
+    Models from LLM_MODELS are tried in order, each with a hard timeout and
+    jittered retries; models that keep failing are skipped by a circuit breaker.
+
     Parameters
     ----------
-    prompt : str
-        The full prompt string containing the system instructions,
-        context, and user query.
+    messages : list[dict[str, str]]
+        The chat messages built by build_prompt: the system instructions
+        followed by the context and user query.
 
     Returns
     -------
@@ -43,30 +116,207 @@ def query_llm(prompt: str) -> str:
         The generated text response from the LLM.
     """
     try:
-        logger.debug("Sending request to OpenRouter model: %s", MODEL_NAME)
+        logger.debug("Sending request to OpenRouter models: %s", LLM_MODELS)
 
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5,
-            max_tokens=500,
-        )
+        with LLM_IN_FLIGHT.track_inprogress(), stage("llm"):
+            answer = complete(get_client(), messages, temperature=0.5, max_tokens=500)
+        logger.debug("LLM query successful.")
+        return answer
+
+    except Exception as e:
+        logger.error("Failed to query OpenRouter: %s", e)
+        LLM_FAILED_REQUESTS.inc(error=type(e).__name__)
+        return LLM_ERROR_MESSAGE
+
+
+async def query_llm_async(messages: list[dict[str, str]]) -> str:
+    """
+    Generates an answer using the OpenRouter API without blocking the event loop.
+
+    Uses the same model chain as query_llm and, with LLM_HEDGE=1, also sends a
+    hedged request to the next model when the primary is slower than its p95.
+
+    Parameters
+    ----------
+    messages : list[dict[str, str]]
+        The chat messages built by build_prompt: the system instructions
+        followed by the context and user query.
+
+    Returns
+    -------
+    str
+        The generated text response from the LLM.
+    """
+    try:
+        logger.debug("Sending async request to OpenRouter models: %s", LLM_MODELS)
 
-        answer = completion.choices[0].message.content.strip()
+        with LLM_IN_FLIGHT.track_inprogress(), stage("llm"):
+            answer = await complete_async(
+                get_async_client(), messages, temperature=0.5, max_tokens=500
+            )
         logger.debug("LLM query successful.")
         return answer
 
     except Exception as e:
         logger.error("Failed to query OpenRouter: %s", e)
-        return "Sorry, I encountered an error while generating the response."
+        LLM_FAILED_REQUESTS.inc(error=type(e).__name__)
+        return LLM_ERROR_MESSAGE
+
+
+async def stream_llm_async(messages: list[dict[str, str]]) -> AsyncIterator[str]:
+    """
+    Streams the answer from the OpenRouter API token by token.
+
+    Falls back along the model chain until a model produces its first token.
+
+    Parameters
+    ----------
+    messages : list[dict[str, str]]
+        The chat messages built by build_prompt: the system instructions
+        followed by the context and user query.
+
+    Yields
+    ------
+    str
+        Consecutive text deltas of the generated response. If the request fails
+        before anything was produced, a single error message is yielded instead.
+
+    Raises
+    ------
+    Exception
+        The error that broke the stream, if it failed after the first token, so
+        that callers do not take the partial answer for a complete one.
+    """
+    produced = False
+    try:
+        logger.debug("Opening stream to OpenRouter models: %s", LLM_MODELS)
+
+        # Timestamps are taken as deltas arrive, so the time the consumer spends
+        # on the last delta (and on the rest of the response) is not counted.
+        start = time.perf_counter()
+        with LLM_IN_FLIGHT.track_inprogress():
+            async for delta in stream_async(
+                get_async_client(), messages, temperature=0.5, max_tokens=500
+            ):
+                last_token = time.perf_counter()
+                if not produced:
+                    first_token = last_token
+                    record_stage("llm_first_token", first_token - start)
+                produced = True
+                yield delta
+
+        if produced:
+            record_stage("llm", last_token - first_token)
+        logger.debug("LLM stream finished.")
+
+    except Exception as e:
+        logger.error("Failed to stream from OpenRouter: %s", e)
+        LLM_FAILED_REQUESTS.inc(error=type(e).__name__)
+        if produced:
+            raise
+        yield LLM_ERROR_MESSAGE
+
+
+def run_batch(input_path: str, output_path: str | None, concurrency: int) -> None:
+    """
+    Answers queries from a JSONL file and writes the results as JSONL in input order.
+
+    Each input line is an object with 'query' and an optional 'language' (default
+    "pl"). All queries are retrieved with one batched embedding call and one
+    multi-vector search; translations and LLM calls run in a thread pool of
+    `concurrency` workers. Identical queries processed at the same time share
+    one LLM call.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to the input JSONL file.
+    output_path : str | None
+        Path to the output JSONL file, or None to write to stdout.
+    concurrency : int
+        Maximum number of concurrent OpenRouter calls.
+
+    Returns
+    -------
+    None
+    """
+    with open(input_path, encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    logger.info("Loaded %d queries from %s", len(items), input_path)
+
+    def to_polish(item: dict[str, Any]) -> str:
+        query = item.get("query", "")
+        if not query or item.get("language", "pl") == "pl":
+            return query
+        return translate_text(query, target_lang_code="pl")
+
+    def generate(
+        processing_query: str, sorted_chunks: list[dict[str, Any]], lang: str
+    ) -> dict[str, Any]:
+        if not sorted_chunks:
+            return {
+                "answer": "No relevant information found in the database.",
+                "sources": [],
+            }
+
+        context = select_context([chunk["text_chunk"] for chunk in sorted_chunks])
+        polish_answer = query_llm(
+            build_prompt(processing_query, context, fit_to_budget=False)
+        )
+        final_answer = (
+            translate_text(polish_answer, target_lang_code=lang)
+            if lang != "pl"
+            else polish_answer
+        )
+        # Only chunks that fit in the prompt budget are cited.
+        sources = [
+            chunk.get("source_url", "Unknown")
+            for chunk in sorted_chunks[: min(len(context), 5)]
+        ]
+        return {"answer": final_answer, "sources": sources}
+
+    def answer(
+        args: tuple[dict[str, Any], str, list[dict[str, Any]]],
+    ) -> dict[str, Any]:
+        item, processing_query, sorted_chunks = args
+        lang = item.get("language", "pl")
+        if not processing_query:
+            return {"error": "Query cannot be empty"}
+        return chat_flight.do(
+            (normalize_query(item["query"]), lang),
+            lambda: generate(processing_query, sorted_chunks, lang),
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        processing_queries = list(executor.map(to_polish, items))
+        non_empty = [i for i, query in enumerate(processing_queries) if query]
+        retrieved = get_top_k_chunks_batch([processing_queries[i] for i in non_empty])
+        chunks: list[list[dict[str, Any]]] = [[] for _ in items]
+        for i, result in zip(non_empty, retrieved, strict=True):
+            chunks[i] = result
+
+        out = open(output_path, "w", encoding="utf-8") if output_path else sys.stdout
+        try:
+            results = executor.map(
+                answer, zip(items, processing_queries, chunks, strict=True)
+            )
+            for i, result in enumerate(results):
+                out.write(json.dumps({"index": i, **result}, ensure_ascii=False) + "\n")
+                out.flush()
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+    logger.info("Batch finished.")
 
 
 def main() -> None:
     """
-    Runs the interactive command-line interface (CLI) for the RAG API.
+    Runs the command-line interface (CLI) for the RAG API.
 
-    Loops indefinitely, accepting user queries via stdin, retrieving context,
-    generating answers, and printing them to stdout.
+    By default loops indefinitely, accepting user queries via stdin, retrieving
+    context, generating answers, and printing them to stdout. With --batch, answers
+    all queries from a JSONL file instead (see run_batch).
 
     Parameters
     ----------
@@ -76,9 +326,26 @@ def main() -> None:
     -------
     None
     """
+    parser = argparse.ArgumentParser(description="MiNI chatbot RAG CLI.")
+    parser.add_argument(
+        "--batch", metavar="INPUT.jsonl", help="Answer queries from a JSONL file."
+    )
+    parser.add_argument(
+        "--output", metavar="OUTPUT.jsonl", help="Batch output file (default: stdout)."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Concurrent LLM calls in batch mode."
+    )
+    args = parser.parse_args()
+
+    setup_logging()
     logger.info("RAG API script started.")
     logger.info(f"Using Model: {MODEL_NAME}")
 
+    if args.batch:
+        run_batch(args.batch, args.output, args.concurrency)
+        return
+
     while True:
         query = input("\nEnter your query (or 'q' to quit): ").strip()
 
@@ -97,10 +364,10 @@ def main() -> None:
             continue
 
         text_only_chunks = [chunk["text_chunk"] for chunk in sorted_chunks]
-        prompt = build_prompt(query, text_only_chunks)
+        messages = build_prompt(query, text_only_chunks)
 
         print("\nThinking...")
-        answer = query_llm(prompt)
+        answer = query_llm(messages)
 
         print("\n=== Answer ===")
         print(answer)
@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    In-process cache of final answers keyed on query-embedding similarity.
+
+    Query vectors are kept normalized in a preallocated float32 matrix, so a lookup
+    is a single matrix-vector product followed by an argmax. A lookup hits when the
+    most similar cached query for the same language has cosine similarity of at
+    least `threshold` and has not expired. Entries are evicted in LRU order once
+    `maxsize` is reached, and the whole cache is dropped when the index generation
+    changes (i.e. after the 'mini_docs' collection was re-ingested).
+    """
+
+    def __init__(
+        self, maxsize: int = 1024, ttl: float = 3600.0, threshold: float = 0.95
+    ):
+        """
+        Initializes an empty cache. Storage is allocated on the first insert,
+        once the embedding dimension is known.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            Maximum number of cached answers, by default 1024.
+        ttl : float, optional
+            Entry lifetime in seconds, by default 3600.
+        threshold : float, optional
+            Minimum cosine similarity for a hit, by default 0.95.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._generation: str | None = None
+        self._vectors: np.ndarray | None = None
+        self._stored_at = np.zeros(maxsize, dtype=np.float64)
+        self._language_masks: dict[str, np.ndarray] = {}
+        self._values: list[dict[str, Any] | None] = [None] * maxsize
+        self._lru: OrderedDict[int, None] = OrderedDict()
+        self._free = list(range(maxsize - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector: list[float] | np.ndarray) -> np.ndarray:
+        """
+        Converts a vector to a unit-length float32 array.
+        """
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
+
+    def _clear_locked(self) -> None:
+        """
+        Drops all entries; the caller must hold the lock.
+        """
+        for mask in self._language_masks.values():
+            mask[:] = False
+        self._values = [None] * self.maxsize
+        self._lru.clear()
+        self._free = list(range(self.maxsize - 1, -1, -1))
+
+    def _check_generation_locked(self, generation: str | None) -> None:
+        """
+        Invalidates the cache if the index generation changed; the caller must hold the lock.
+        """
+        if generation != self._generation:
+            if self._lru:
+                logger.info(
+                    "Index generation changed, dropping %d cached answers.",
+                    len(self._lru),
+                )
+            self._clear_locked()
+            self._generation = generation
+
+    def lookup(
+        self, vector: list[float], language: str, generation: str | None
+    ) -> dict[str, Any] | None:
+        """
+        Returns the cached answer for the most similar query, if similar enough.
+
+        Parameters
+        ----------
+        vector : list[float]
+            Embedding of the incoming query.
+        language : str
+            Language code of the request; only entries of the same language match.
+        generation : str | None
+            Current generation of the index; a change invalidates the cache.
+
+        Returns
+        -------
+        dict[str, Any] | None
+            The stored value (e.g. 'answer' and 'sources') or None on a miss.
+        """
+        query = self._normalize(vector)
+
+        with self._lock:
+            self._check_generation_locked(generation)
+
+            mask = self._language_masks.get(language)
+            if self._vectors is None or mask is None or not self._lru:
+                self.misses += 1
+                return None
+
+            candidates = mask & (self._stored_at > time.monotonic() - self.ttl)
+            if not candidates.any():
+                self.misses += 1
+                return None
+
+            scores = self._vectors @ query
+            scores[~candidates] = -np.inf
+            best = int(np.argmax(scores))
+
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._lru.move_to_end(best)
+            self.hits += 1
+            logger.debug("Answer cache hit (similarity %.4f).", scores[best])
+            return self._values[best]
+
+    def store(
+        self,
+        vector: list[float],
+        language: str,
+        value: dict[str, Any],
+        generation: str | None,
+    ) -> None:
+        """
+        Caches a value for the given query embedding.
+
+        Values computed against an older index generation are not stored.
+
+        Parameters
+        ----------
+        vector : list[float]
+            Embedding of the query the value answers.
+        language : str
+            Language code of the request.
+        value : dict[str, Any]
+            The value to return on future hits.
+        generation : str | None
+            Index generation the value was computed against.
+        """
+        if self.maxsize <= 0:
+            return
+
+        query = self._normalize(vector)
+
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            if self._vectors is None:
+                self._vectors = np.zeros(
+                    (self.maxsize, query.shape[0]), dtype=np.float32
+                )
+
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot, _ = self._lru.popitem(last=False)
+                for mask in self._language_masks.values():
+                    mask[slot] = False
+
+            mask = self._language_masks.setdefault(
+                language, np.zeros(self.maxsize, dtype=bool)
+            )
+            self._vectors[slot] = query
+            self._stored_at[slot] = time.monotonic()
+            self._values[slot] = value
+            mask[slot] = True
+            self._lru[slot] = None
+
+    def clear(self) -> None:
+        """
+        Removes all entries. Counters are preserved.
+        """
+        with self._lock:
+            self._clear_locked()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the cache counters.
+
+        Returns
+        -------
+        dict[str, Any]
+            'hits', 'misses', 'size', 'maxsize' and 'hit_rate'.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._lru),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,134 @@
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+# Letters that NFKD does not decompose into a base letter plus a combining mark.
+_EXTRA_FOLDS = str.maketrans({"ł": "l", "Ł": "L", "ø": "o", "Ø": "O", "đ": "d"})
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalizes a query string for use as a cache key.
+
+    Folds case and diacritics (e.g. "Kto jest Dziekanem?" and "kto  jest dziekanem?"
+    map to the same key) and collapses whitespace.
+
+    Parameters
+    ----------
+    text : str
+        The raw query text.
+
+    Returns
+    -------
+    str
+        The normalized key.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.translate(_EXTRA_FOLDS))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe LRU cache with an optional time-to-live.
+
+    Hit and miss counters are kept for monitoring and exposed via stats().
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        """
+        Initializes an empty cache.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            Maximum number of entries kept before the least recently used one is
+            evicted, by default 1024.
+        ttl : float | None, optional
+            Entry lifetime in seconds; None disables expiry, by default None.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the cached value for key, or default if missing or expired.
+
+        Parameters
+        ----------
+        key : Hashable
+            The cache key.
+        default : Any, optional
+            Value returned on a miss, by default None.
+
+        Returns
+        -------
+        Any
+            The cached value or default.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Stores a value, evicting the least recently used entry if the cache is full.
+
+        Parameters
+        ----------
+        key : Hashable
+            The cache key.
+        value : Any
+            The value to store.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Removes all entries. Counters are preserved.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the cache counters.
+
+        Returns
+        -------
+        dict[str, Any]
+            'hits', 'misses', 'size', 'maxsize' and 'hit_rate'.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,611 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from typing import Any
+
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+from src.rag_api.modules.metrics import LLM_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Models tried in order; the first one is the primary, the rest are fallbacks.
+LLM_MODELS = [
+    model.strip()
+    for model in os.environ.get(
+        "LLM_MODELS", "mistralai/mistral-7b-instruct:free,openai/gpt-oss-20b:free"
+    ).split(",")
+    if model.strip()
+]
+# Hard limit for a single request (time to the first token when streaming).
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 20))
+# Hard limit for the whole chain, retries and fallbacks included.
+LLM_TOTAL_TIMEOUT = float(os.environ.get("LLM_TOTAL_TIMEOUT", 45))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 1))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", 0.5))
+
+# Hedging: if the primary has not answered after its p95 latency, ask the next model too.
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_DELAY = float(os.environ.get("LLM_HEDGE_DELAY", 4.0))
+LLM_HEDGE_MIN_DELAY = float(os.environ.get("LLM_HEDGE_MIN_DELAY", 1.0))
+LLM_HEDGE_MIN_SAMPLES = 20
+
+LLM_BREAKER_THRESHOLD = int(os.environ.get("LLM_BREAKER_THRESHOLD", 5))
+LLM_BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", 30))
+
+
+class LLMUnavailableError(RuntimeError):
+    """
+    Raised when no model in the chain produced an answer.
+    """
+
+
+class EmptyCompletionError(RuntimeError):
+    """
+    Raised when a model returns no text; treated like a transient failure.
+    """
+
+
+# Worth retrying on the same model; anything else moves straight to the next model.
+RETRYABLE_ERRORS = (
+    TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    EmptyCompletionError,
+)
+
+
+class CircuitBreaker:
+    """
+    Per-model circuit breaker.
+
+    After `threshold` consecutive failures the model is skipped for `cooldown`
+    seconds. Once the cooldown has passed a single probe request is let through
+    (and the cooldown restarts); its success closes the breaker, its failure
+    keeps it open.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        threshold: int = LLM_BREAKER_THRESHOLD,
+        cooldown: float = LLM_BREAKER_COOLDOWN,
+    ):
+        """
+        Initializes a closed breaker.
+
+        Parameters
+        ----------
+        name : str
+            The model name, used in log messages.
+        threshold : int, optional
+            Consecutive failures that open the breaker, by default LLM_BREAKER_THRESHOLD.
+        cooldown : float, optional
+            Seconds the breaker stays open, by default LLM_BREAKER_COOLDOWN.
+        """
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+
+    def allow(self) -> bool:
+        """
+        Tells whether a request may be sent to the model now.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.cooldown:
+                return False
+            self._opened_at = now
+            return True
+
+    def record_success(self) -> None:
+        """
+        Closes the breaker.
+        """
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        """
+        Counts a failure, opening the breaker at the threshold.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold and self._opened_at is None:
+                logger.warning(
+                    "Circuit for %s opened after %d consecutive failures.",
+                    self.name,
+                    self._failures,
+                )
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        """
+        Whether the breaker currently rejects requests.
+        """
+        return self._opened_at is not None
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent successful request latencies.
+    """
+
+    def __init__(self, window: int = 200):
+        """
+        Parameters
+        ----------
+        window : int, optional
+            Number of most recent latencies kept, by default 200.
+        """
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """
+        Adds a latency sample.
+        """
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        """
+        Returns the q-th percentile (0-100), or None with too few samples.
+        """
+        with self._lock:
+            if len(self._samples) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_latencies: dict[str, LatencyTracker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    """
+    Returns the circuit breaker of a model, creating it on first use.
+    """
+    with _registry_lock:
+        return _breakers.get(model) or _breakers.setdefault(
+            model, CircuitBreaker(model)
+        )
+
+
+def get_latency_tracker(model: str) -> LatencyTracker:
+    """
+    Returns the latency tracker of a model, creating it on first use.
+    """
+    with _registry_lock:
+        return _latencies.setdefault(model, LatencyTracker())
+
+
+def get_router_stats() -> dict[str, dict[str, Any]]:
+    """
+    Returns the breaker state and p95 latency of every model used so far.
+    """
+    return {
+        model: {
+            "circuit_open": get_breaker(model).is_open,
+            "p95_seconds": get_latency_tracker(model).percentile(95),
+        }
+        for model in sorted(set(_breakers) | set(_latencies))
+    }
+
+
+def hedge_delay(model: str) -> float:
+    """
+    Returns how long to wait for a model before sending a hedged request.
+
+    Parameters
+    ----------
+    model : str
+        The primary model.
+
+    Returns
+    -------
+    float
+        Its p95 latency (at least LLM_HEDGE_MIN_DELAY), or LLM_HEDGE_DELAY until
+        enough samples have been collected.
+    """
+    p95 = get_latency_tracker(model).percentile(95)
+    if p95 is None:
+        return LLM_HEDGE_DELAY
+    return max(LLM_HEDGE_MIN_DELAY, p95)
+
+
+def _retry_delay(attempt: int) -> float:
+    """
+    Returns an exponential backoff delay with full jitter.
+    """
+    return random.uniform(0, LLM_RETRY_BASE_DELAY * 2**attempt)
+
+
+def _extract_answer(completion: Any) -> str:
+    """
+    Returns the stripped answer text of a completion.
+
+    Raises
+    ------
+    EmptyCompletionError
+        If the completion contains no text.
+    """
+    content = completion.choices[0].message.content if completion.choices else None
+    if not content or not content.strip():
+        raise EmptyCompletionError("Model returned an empty completion.")
+    return content.strip()
+
+
+def _record_failure(model: str, error: Exception, attempt: int) -> None:
+    """
+    Logs a failed attempt and reports it to the model's circuit breaker.
+    """
+    logger.warning(
+        "LLM request to %s failed (attempt %d): %s: %s",
+        model,
+        attempt + 1,
+        type(error).__name__,
+        error,
+    )
+    LLM_ERRORS.inc(model=model, error=type(error).__name__)
+    get_breaker(model).record_failure()
+
+
+def _record_success(model: str, seconds: float) -> None:
+    """
+    Reports a successful attempt and its latency.
+    """
+    get_breaker(model).record_success()
+    get_latency_tracker(model).record(seconds)
+    logger.debug("LLM request to %s took %.2f s.", model, seconds)
+
+
+def complete(
+    client: OpenAI,
+    messages: list[dict[str, str]],
+    models: list[str] | None = None,
+    **params: Any,
+) -> str:
+    """
+    Returns a chat completion, walking the model chain on failures.
+
+    Every model gets up to LLM_MAX_RETRIES retries of transient errors (timeouts,
+    connection errors, 429 and 5xx) with jittered exponential backoff; other
+    errors move on to the next model at once. The circuit breaker is checked
+    before every attempt, so a model whose breaker opens mid-chain is not
+    retried. Each attempt is bounded by the client timeout, capped by what is
+    left of LLM_TOTAL_TIMEOUT. Blocking callers get no hedging.
+
+    Parameters
+    ----------
+    client : openai.OpenAI
+        The OpenRouter client. It should not retry on its own (max_retries=0).
+    messages : list[dict[str, str]]
+        The chat messages.
+    models : list[str] | None, optional
+        The model chain, by default LLM_MODELS.
+    **params : Any
+        Extra arguments of chat.completions.create (temperature, max_tokens, ...).
+
+    Returns
+    -------
+    str
+        The stripped answer text.
+
+    Raises
+    ------
+    LLMUnavailableError
+        If every model failed, was skipped, or the total timeout was exceeded.
+    """
+    deadline = time.monotonic() + LLM_TOTAL_TIMEOUT
+    last_error: Exception | None = None
+
+    for model in models or LLM_MODELS:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            if not get_breaker(model).allow():
+                logger.debug("Skipping %s, circuit open.", model)
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMUnavailableError("LLM chain exceeded its total timeout.")
+
+            start = time.perf_counter()
+            try:
+                completion = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    timeout=min(LLM_TIMEOUT, remaining),
+                    **params,
+                )
+                answer = _extract_answer(completion)
+            except RETRYABLE_ERRORS as e:
+                last_error = e
+                _record_failure(model, e, attempt)
+                if attempt < LLM_MAX_RETRIES:
+                    time.sleep(
+                        min(
+                            _retry_delay(attempt), max(0.0, deadline - time.monotonic())
+                        )
+                    )
+                    continue
+                break
+            except Exception as e:
+                last_error = e
+                _record_failure(model, e, attempt)
+                break
+
+            _record_success(model, time.perf_counter() - start)
+            return answer
+
+    raise LLMUnavailableError(
+        f"No model in the chain answered (last error: {last_error})."
+    )
+
+
+async def _complete_chain_async(
+    client: AsyncOpenAI,
+    messages: list[dict[str, str]],
+    models: list[str],
+    params: dict[str, Any],
+    deadline: float,
+) -> str:
+    """
+    Asynchronous counterpart of the model chain in complete().
+    """
+    last_error: Exception | None = None
+
+    for model in models:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            if not get_breaker(model).allow():
+                logger.debug("Skipping %s, circuit open.", model)
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMUnavailableError("LLM chain exceeded its total timeout.")
+
+            start = time.perf_counter()
+            try:
+                timeout = min(LLM_TIMEOUT, remaining)
+                completion = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=model, messages=messages, timeout=timeout, **params
+                    ),
+                    timeout=timeout,
+                )
+                answer = _extract_answer(completion)
+            except RETRYABLE_ERRORS as e:
+                last_error = e
+                _record_failure(model, e, attempt)
+                if attempt < LLM_MAX_RETRIES:
+                    await asyncio.sleep(
+                        min(
+                            _retry_delay(attempt), max(0.0, deadline - time.monotonic())
+                        )
+                    )
+                    continue
+                break
+            except Exception as e:
+                last_error = e
+                _record_failure(model, e, attempt)
+                break
+
+            _record_success(model, time.perf_counter() - start)
+            return answer
+
+    raise LLMUnavailableError(
+        f"No model in the chain answered (last error: {last_error})."
+    )
+
+
+async def complete_async(
+    client: AsyncOpenAI,
+    messages: list[dict[str, str]],
+    models: list[str] | None = None,
+    hedge: bool = LLM_HEDGE,
+    **params: Any,
+) -> str:
+    """
+    Returns a chat completion, with fallbacks and optional hedging.
+
+    Runs the same chain as complete(). With hedging enabled, if the primary
+    model has not answered within its p95 latency (see hedge_delay), a second
+    chain starting at the next model is started and the first answer wins; the
+    slower request is cancelled.
+
+    Parameters
+    ----------
+    client : openai.AsyncOpenAI
+        The OpenRouter client. It should not retry on its own (max_retries=0).
+    messages : list[dict[str, str]]
+        The chat messages.
+    models : list[str] | None, optional
+        The model chain, by default LLM_MODELS.
+    hedge : bool, optional
+        Whether to send a hedged request, by default LLM_HEDGE.
+    **params : Any
+        Extra arguments of chat.completions.create (temperature, max_tokens, ...).
+
+    Returns
+    -------
+    str
+        The stripped answer text.
+
+    Raises
+    ------
+    LLMUnavailableError
+        If every model failed, was skipped, or the total timeout was exceeded.
+    """
+    models = models or LLM_MODELS
+    deadline = time.monotonic() + LLM_TOTAL_TIMEOUT
+    primary = asyncio.create_task(
+        _complete_chain_async(client, messages, models, params, deadline)
+    )
+    if not hedge or len(models) < 2:
+        return await primary
+
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay(models[0]))
+        if not done:
+            logger.info(
+                "%s is slow, sending a hedged request to %s.", models[0], models[1]
+            )
+            tasks.add(
+                asyncio.create_task(
+                    _complete_chain_async(
+                        client, messages, models[1:] + models[:1], params, deadline
+                    )
+                )
+            )
+
+        last_error: BaseException | None = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+        raise last_error or LLMUnavailableError("No model in the chain answered.")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _open_stream(
+    client: AsyncOpenAI,
+    model: str,
+    messages: list[dict[str, str]],
+    params: dict[str, Any],
+    timeout: float,
+) -> tuple[Any, AsyncIterator[Any], str]:
+    """
+    Opens a completion stream and waits for its first non-empty text delta.
+
+    `timeout` is passed to the client, so it bounds every HTTP operation of the
+    stream, chunk reads included. The stream is closed if no delta arrives, so
+    failed attempts do not leak their HTTP connection.
+
+    Returns
+    -------
+    tuple[Any, AsyncIterator[Any], str]
+        The stream, its chunk iterator and the first delta.
+
+    Raises
+    ------
+    EmptyCompletionError
+        If the stream ends without producing any text.
+    """
+    stream = await client.chat.completions.create(
+        model=model, messages=messages, stream=True, timeout=timeout, **params
+    )
+    try:
+        iterator = stream.__aiter__()
+        async for chunk in iterator:
+            if chunk.choices and chunk.choices[0].delta.content:
+                return stream, iterator, chunk.choices[0].delta.content
+        raise EmptyCompletionError("Model returned an empty stream.")
+    except BaseException:
+        # Also on cancellation by the attempt timeout: release the connection
+        # before the chain moves on to the next attempt.
+        await stream.close()
+        raise
+
+
+async def stream_async(
+    client: AsyncOpenAI,
+    messages: list[dict[str, str]],
+    models: list[str] | None = None,
+    **params: Any,
+) -> AsyncIterator[str]:
+    """
+    Streams a chat completion, walking the model chain until one starts answering.
+
+    The per-attempt timeout applies to the first token. Once text has been
+    yielded the answer cannot be switched to another model, so later errors are
+    raised to the caller.
+
+    Parameters
+    ----------
+    client : openai.AsyncOpenAI
+        The OpenRouter client. It should not retry on its own (max_retries=0).
+    messages : list[dict[str, str]]
+        The chat messages.
+    models : list[str] | None, optional
+        The model chain, by default LLM_MODELS.
+    **params : Any
+        Extra arguments of chat.completions.create (temperature, max_tokens, ...).
+
+    Yields
+    ------
+    str
+        Consecutive text deltas of the answer.
+
+    Raises
+    ------
+    LLMUnavailableError
+        If no model started answering.
+    """
+    deadline = time.monotonic() + LLM_TOTAL_TIMEOUT
+    last_error: Exception | None = None
+
+    for model in models or LLM_MODELS:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            if not get_breaker(model).allow():
+                logger.debug("Skipping %s, circuit open.", model)
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMUnavailableError("LLM chain exceeded its total timeout.")
+
+            try:
+                timeout = min(LLM_TIMEOUT, remaining)
+                stream, iterator, first = await asyncio.wait_for(
+                    _open_stream(client, model, messages, params, timeout),
+                    timeout=timeout,
+                )
+            except RETRYABLE_ERRORS as e:
+                last_error = e
+                _record_failure(model, e, attempt)
+                if attempt < LLM_MAX_RETRIES:
+                    await asyncio.sleep(
+                        min(
+                            _retry_delay(attempt), max(0.0, deadline - time.monotonic())
+                        )
+                    )
+                    continue
+                break
+            except Exception as e:
+                last_error = e
+                _record_failure(model, e, attempt)
+                break
+
+            get_breaker(model).record_success()
+            try:
+                yield first
+                async for chunk in iterator:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+            return
+
+    raise LLMUnavailableError(
+        f"No model in the chain answered (last error: {last_error})."
+    )
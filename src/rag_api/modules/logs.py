@@ -1,11 +1,40 @@
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
+import uuid
+import zlib
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any
 
-DEFAULT_LOG_FORMAT = "%(asctime)s - %(levelname)-8s - %(name)-15s - %(message)s"
+DEFAULT_LOG_FORMAT = (
+    "%(asctime)s - %(levelname)-8s - %(name)-15s - [%(request_id)s] - %(message)s"
+)
 DEFAULT_LOG_LEVEL = "INFO"
 
+# Pass as `extra=SAMPLED` to INFO messages logged on every request (full queries,
+# prompts) so that only LOG_SAMPLE_RATE of them are kept.
+SAMPLED = {"sampled": True}
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else was passed through `extra`.
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
+    "request_id",
+    "sampled",
+    "taskName",
+}
+
+_listener: QueueListener | None = None
+
 
 def _parse_log_level(value: str) -> int:
     """
@@ -21,59 +50,225 @@ def _parse_log_level(value: str) -> int:
     int
         The corresponding logging level constant.
     """
-    try:
-        # getLevelByName handles string names ("INFO")
-        lvl = value.upper()
-        numeric = logging.getLevelByName(lvl)
-        if isinstance(numeric, int):
-            return numeric
-    except Exception:
-        pass
-    # fallback
-    return logging.INFO
-
-
-def setup_logging(log_file: str | None = None) -> None:
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    return logging.getLevelNamesMapping().get(value.upper(), logging.INFO)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Stamps records with the current request ID and drops unsampled messages.
+
+    Runs in the thread that logs the message, before it is queued, so the
+    request's context variables are still visible. Messages marked with SAMPLED
+    are kept for a stable fraction of requests (decided by hashing the request
+    ID), so sampled requests keep their complete trace; outside a request the
+    decision is random.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        """
+        Parameters
+        ----------
+        sample_rate : float, optional
+            Fraction of SAMPLED messages to keep, by default 1.0 (all).
+        """
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = request_id_var.get()
+        record.request_id = request_id
+
+        if self.sample_rate >= 1.0 or not getattr(record, "sampled", False):
+            return True
+        if record.levelno > logging.INFO:
+            return True
+        if request_id == "-":
+            return random.random() < self.sample_rate
+        return zlib.crc32(request_id.encode()) % 10_000 < self.sample_rate * 10_000
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects.
+
+    Fields passed through `extra` are included as top-level keys.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RecordQueueHandler(QueueHandler):
+    """
+    QueueHandler that keeps the traceback apart from the message.
+
+    The stock prepare() formats the record before queueing it, which folds the
+    traceback into the message and clears exc_info. Here only the message
+    arguments are merged; the traceback is rendered into exc_text, so the
+    formatters on the listener thread still see it as a separate field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(
+    log_file: str | None = None,
+    json_format: bool | None = None,
+    sample_rate: float | None = None,
+) -> None:
     """
     Configure the root logger for the application.
 
-    Call once at application startup before other imports that create loggers.
-    If log_file is provided, a rotating file handler will also be created.
+    This is the single logging entry point of the API and the pipeline scripts.
+    The root logger gets a QueueHandler only, so logging a message is a queue
+    put; formatting and writing to stderr and the file (including rotation)
+    happen on a background QueueListener thread. Calling it again replaces the
+    previous configuration.
 
     Parameters
     ----------
     log_file : str, optional
-        Path to a file where logs should be written. If None, logs
-        will only go to the console (stderr).
+        Path to a file where logs should be written (rotating, 5MB x 5).
+        Defaults to LOG_FILE; if unset, logs only go to the console (stderr).
+    json_format : bool, optional
+        Whether to write JSON lines instead of plain text. Defaults to
+        LOG_FORMAT=json.
+    sample_rate : float, optional
+        Fraction of high-volume INFO messages (logged with extra=SAMPLED) to
+        keep. Defaults to LOG_SAMPLE_RATE, or 1.0.
     """
-    log_level_env = os.getenv("LOG_LEVEL", DEFAULT_LOG_LEVEL)
-    level = _parse_log_level(log_level_env)
+    global _listener
 
-    root_logger = logging.getLogger()
-    root_logger.setLevel(level)
+    level = _parse_log_level(os.getenv("LOG_LEVEL", DEFAULT_LOG_LEVEL))
+    log_file = log_file or os.getenv("LOG_FILE") or None
+    if json_format is None:
+        json_format = os.getenv("LOG_FORMAT", "text").lower() == "json"
+    if sample_rate is None:
+        sample_rate = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
 
-    # Avoid duplicate handlers on re-run
-    if root_logger.hasHandlers():
-        root_logger.handlers.clear()
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    formatter = (
+        JsonFormatter() if json_format else logging.Formatter(DEFAULT_LOG_FORMAT)
+    )
 
     # Console handler (always active)
-    console_handler = logging.StreamHandler(sys.stderr)
-    # NOTSET makes the handler inherit the level from the root logger
-    console_handler.setLevel(logging.NOTSET)
-    console_handler.setFormatter(logging.Formatter(DEFAULT_LOG_FORMAT))
-    root_logger.addHandler(console_handler)
+    handlers: list[logging.Handler] = [logging.StreamHandler(sys.stderr)]
 
     # Optional file handler (with rotation)
     if log_file:
         # Rotate: 5MB per file, keep 5 backups
-        file_handler = RotatingFileHandler(
-            log_file, maxBytes=5 * 1024 * 1024, backupCount=5
+        handlers.append(
+            RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=5)
         )
-        file_handler.setLevel(logging.NOTSET)
-        file_handler.setFormatter(logging.Formatter(DEFAULT_LOG_FORMAT))
-        root_logger.addHandler(file_handler)
+
+    for handler in handlers:
+        # NOTSET makes the handler inherit the level from the root logger
+        handler.setLevel(logging.NOTSET)
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = RecordQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter(sample_rate))
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+
+    # Avoid duplicate handlers on re-run
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+        handler.close()
+    root_logger.addHandler(queue_handler)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
 
     logger = logging.getLogger(__name__)
     logger.info("Logging configured. Level set to %s.", logging.getLevelName(level))
     if log_file:
         logger.info("Logging to file: %s", log_file)
+
+
+def _stop_listener() -> None:
+    """
+    Flushes the queued records and stops the listener thread at exit.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware assigning a request ID to every HTTP request.
+
+    The ID is taken from the X-Request-ID header or generated, stored in
+    request_id_var for the log records of the request (including work offloaded
+    with asyncio.to_thread) and echoed in the X-Request-ID response header.
+    """
+
+    def __init__(self, app: Any):
+        """
+        Parameters
+        ----------
+        app : Any
+            The wrapped ASGI application.
+        """
+        self.app = app
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64]
+        request_id = request_id or uuid.uuid4().hex[:16]
+
+        async def send_wrapper(message: dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-request-id", request_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,429 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+# Upper bounds in seconds; stages range from sub-millisecond lookups to LLM calls.
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    40.0,
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    """
+    Formats a label set as {name="value",...}, or an empty string.
+    """
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return "{" + pairs + "}"
+
+
+class Metric(ABC):
+    """
+    Base class of the metrics: a name, help text, label names and a lock.
+
+    Metrics register themselves in the module-level registry on creation and are
+    exposed by render(). Updating a metric is a dictionary lookup under a lock,
+    which keeps the instrumentation overhead around a microsecond.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        """
+        Parameters
+        ----------
+        name : str
+            The metric name.
+        documentation : str
+            The HELP text.
+        labelnames : tuple[str, ...], optional
+            Names of the labels every sample must carry, by default none.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        """
+        Returns the label values in label-name order.
+        """
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def _samples(self) -> Iterator[str]:
+        """
+        Yields the exposition lines of the metric's samples.
+        """
+
+    def render(self) -> str:
+        """
+        Returns the metric in the Prometheus text format.
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    A monotonically increasing value.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        # A metric without labels is exposed from the start, with value 0.
+        self._values: dict[tuple[str, ...], float] = {} if labelnames else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        """
+        Increases the counter of the given label set.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        """
+        Returns the current value of the given label set.
+        """
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(Counter):
+    """
+    A value that can go up and down.
+    """
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        """
+        Decreases the gauge of the given label set.
+        """
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        """
+        Sets the gauge of the given label set.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels: Any) -> Iterator[None]:
+        """
+        Increments the gauge for the duration of the block.
+        """
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    """
+    Counts observations in cumulative buckets, with their sum and count.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        """
+        Parameters
+        ----------
+        name : str
+            The metric name.
+        documentation : str
+            The HELP text.
+        labelnames : tuple[str, ...], optional
+            Names of the labels every sample must carry, by default none.
+        buckets : tuple[float, ...], optional
+            Sorted bucket upper bounds, by default DEFAULT_BUCKETS.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf) and the sum.
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """
+        Records one observation for the given label set.
+        """
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            snapshot = [
+                (key, list(counts), self._sums[key])
+                for key, counts in self._counts.items()
+            ]
+        bucket_labels = (*self.labelnames, "le")
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(
+                (*map(str, self.buckets), "+Inf"), counts, strict=True
+            ):
+                cumulative += count
+                labels = _format_labels(bucket_labels, (*key, bound))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+_registry: list[Metric] = []
+
+
+def render() -> str:
+    """
+    Returns all registered metrics in the Prometheus text exposition format.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    str
+        The body of the /metrics response.
+    """
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+STAGE_DURATION = Histogram(
+    "rag_stage_duration_seconds",
+    "Duration of the stages of answering a chat request.",
+    ("stage",),
+)
+CACHE_REQUESTS = Counter(
+    "rag_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ("cache", "result"),
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "rag_embedding_batch_size",
+    "Number of distinct queries embedded per model call by the micro-batcher.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+LLM_ERRORS = Counter(
+    "rag_llm_errors_total",
+    "Failed LLM attempts by model and error type.",
+    ("model", "error"),
+)
+LLM_FAILED_REQUESTS = Counter(
+    "rag_llm_failed_requests_total",
+    "LLM requests that failed after the whole model chain, by error type.",
+    ("error",),
+)
+LLM_IN_FLIGHT = Gauge(
+    "rag_llm_requests_in_flight",
+    "LLM generations currently running.",
+)
+HTTP_IN_FLIGHT = Gauge(
+    "rag_http_requests_in_flight",
+    "HTTP requests currently being served.",
+    ("endpoint",),
+)
+HTTP_REQUESTS = Counter(
+    "rag_http_requests_total",
+    "Served HTTP requests by endpoint and status code.",
+    ("endpoint", "status"),
+)
+HTTP_DURATION = Histogram(
+    "rag_http_request_duration_seconds",
+    "Time until the last byte of the response was sent.",
+    ("endpoint",),
+)
+
+_timings: ContextVar[dict[str, float] | None] = ContextVar("timings", default=None)
+
+
+def start_timings() -> dict[str, float]:
+    """
+    Starts collecting stage timings for the current request.
+
+    The dictionary is bound to the current context, so stages running later in
+    the same request (including in worker threads started with asyncio.to_thread)
+    add their durations to it.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    dict[str, float]
+        The dictionary that will hold the durations in milliseconds per stage.
+    """
+    timings: dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """
+    Records the duration of a stage in the histogram and the request timings.
+
+    Parameters
+    ----------
+    name : str
+        The stage name.
+    seconds : float
+        The measured duration.
+
+    Returns
+    -------
+    None
+    """
+    STAGE_DURATION.observe(seconds, stage=name)
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = round(timings.get(name, 0.0) + seconds * 1000, 3)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Times the enclosed block as a stage of the request.
+
+    Parameters
+    ----------
+    name : str
+        The stage name, e.g. "embed" or "llm".
+
+    Yields
+    ------
+    None
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """
+    Counts a cache lookup.
+
+    Parameters
+    ----------
+    cache : str
+        The cache name, e.g. "answer" or "translation".
+    hit : bool
+        Whether the lookup was a hit.
+
+    Returns
+    -------
+    None
+    """
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests, their duration and how many are in flight.
+
+    Unlike an HTTP middleware based on call_next, it measures streaming responses
+    until their last chunk has been sent.
+    """
+
+    def __init__(self, app: Any, endpoints: set[str] | None = None):
+        """
+        Parameters
+        ----------
+        app : Any
+            The wrapped ASGI application.
+        endpoints : set[str] | None, optional
+            Paths reported under their own label; others are reported as
+            "other" to keep the label set bounded. By default every path.
+        """
+        self.app = app
+        self.endpoints = endpoints
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = scope["path"]
+        if self.endpoints is not None and endpoint not in self.endpoints:
+            endpoint = "other"
+        status = 500
+
+        async def send_wrapper(message: dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc(endpoint=endpoint)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec(endpoint=endpoint)
+            HTTP_DURATION.observe(time.perf_counter() - start, endpoint=endpoint)
+            HTTP_REQUESTS.inc(endpoint=endpoint, status=status)
@@ -0,0 +1,135 @@
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-item calls into batched calls of a function.
+
+    Callers (typically worker threads started with asyncio.to_thread) submit one
+    item each and block until its result is ready. A background thread takes the
+    first waiting item, collects more until the batch is full or the wait time
+    since that item has passed, and runs the function once for the whole batch.
+    Items arriving while a batch is being computed form the next batch, so under
+    load batches grow even without waiting. Identical items within a batch are
+    computed once.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[list[Hashable]], list[Any]],
+        max_batch_size: int = 16,
+        max_wait: float = 0.005,
+        name: str = "micro-batcher",
+    ):
+        """
+        Parameters
+        ----------
+        fn : Callable[[list[Hashable]], list[Any]]
+            Computes the results of a batch, aligned with its items.
+        max_batch_size : int, optional
+            Maximum number of items per call, by default 16. With 1 or less,
+            submit() calls fn directly.
+        max_wait : float, optional
+            Maximum time in seconds a batch waits for more items after its first
+            one, by default 0.005. With 0, only items already waiting are batched.
+        name : str, optional
+            Name of the background thread, by default "micro-batcher".
+        """
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._queue: queue.SimpleQueue[tuple[Hashable, Future]] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def submit(self, item: Hashable) -> Any:
+        """
+        Computes the result of one item as part of a batch.
+
+        Parameters
+        ----------
+        item : Hashable
+            The input of fn.
+
+        Returns
+        -------
+        Any
+            The result of fn for the item.
+        """
+        if self.max_batch_size <= 1:
+            return self.fn([item])[0]
+
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name=self.name, daemon=True
+                    )
+                    self._thread.start()
+
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _collect(self) -> list[tuple[Hashable, Future]]:
+        """
+        Waits for the next batch of submitted items.
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        """
+        Computes batches until the process exits.
+        """
+        while True:
+            batch = self._collect()
+            unique = list(dict.fromkeys(item for item, _ in batch))
+            try:
+                results = dict(zip(unique, self.fn(unique), strict=True))
+            except BaseException as e:
+                logger.error("Batch of %d items failed: %s", len(unique), e)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(unique))
+            for item, future in batch:
+                future.set_result(results[item])
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the number of batches and items and the achieved batch sizes.
+        """
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": (
+                round(self.items / self.batches, 3) if self.batches else 0.0
+            ),
+            "largest_batch": self.largest_batch,
+        }
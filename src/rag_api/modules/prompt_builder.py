@@ -1,7 +1,23 @@
 import logging
+import os
+from functools import cache
+from typing import Any
+
+from src.rag_api.modules.logs import SAMPLED
+from src.rag_api.modules.metrics import stage
 
 logger = logging.getLogger(__name__)
 
+# Token budget for the retrieved context; the static prefix and the question come on top.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("PROMPT_CONTEXT_TOKEN_BUDGET", 2500))
+# A chunk cut to fewer tokens than this is dropped instead of truncated.
+MIN_TRUNCATED_CHUNK_TOKENS = int(os.environ.get("PROMPT_MIN_CHUNK_TOKENS", 64))
+# tiktoken encoding used to count tokens; falls back to a character heuristic.
+PROMPT_TOKENIZER = os.environ.get("PROMPT_TOKENIZER", "cl100k_base")
+# Polish text averages fewer characters per token than English, so stay conservative.
+CHARS_PER_TOKEN = 3
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
 ERROR_PROMPT = (
     "Przepraszamy, wystąpił wewnętrzny błąd podczas tworzenia zapytania. "
     "Prosimy spróbować ponownie później."
@@ -34,78 +50,240 @@ STATIC_FAQ = (
 )
 
 
+# Instructions and static FAQ, identical for every request. Built once and sent first
+# as a separate system message, so provider-side prompt caching can reuse the prefix.
+SYSTEM_PROMPT = (
+    "Jesteś pomocnym asystentem o imieniu MiNIonek. Odpowiadasz na pytania studentów i pracowników Wydziału Matematyki i Nauk Informacyjnych (MiNI).\n"
+    "Stworzyli Cię członkowie Koła Naukowego Data Science (KNDS), działającego przy Wydziale MiNI PW. Projekt merytorycznie nadzorowała dr inż. Anna Wróblewska.\n"
+    "ZASADY ODPOWIADANIA:\n"
+    "1. Priorytetyzacja wiedzy: Opieraj swoją odpowiedź głównie na informacjach z sekcji 'Kontekst'. Wybierz z niej maksymalnie 5 najbardziej trafnych fragmentów [Sx] i na nich zbuduj odpowiedź."
+    "Jeśli nie znajdziesz tam odpowiedzi, sprawdź sekcję 'Wiedza ogólna'. "
+    "Możesz korzystać z własnej wiedzy tylko wtedy, gdy informacji brakuje w obu powyższych źródłach.\n"
+    "2. Styl: Odpowiadaj krótko, rzeczowo i po polsku.\n"
+    "3. WAŻNE: Odpowiadaj ZAWSZE w języku POLSKIM. Twoja odpowiedź zostanie automatycznie przetłumaczona na język wybrany przez użytkownika. Nie mieszaj języków i nie dodawaj komentarzy o tłumaczeniu.\n"
+    # "3. Źródła: Na samym końcu odpowiedzi dodaj sekcję 'Źródła:' i wymień w niej maksymalnie 2 najważniejsze identyfikatory (np. [S1], [S2]), na których się opierasz. "
+    # "Nie wymieniaj wszystkich dostępnych fragmentów, jeśli z nich nie korzystasz.\n\n"
+    f"\n---\n{STATIC_FAQ}\n---\n"
+)
+
+
+@cache
+def _get_encoding() -> Any:
+    """
+    Returns the tiktoken encoding, or None if tiktoken or its data is unavailable.
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(PROMPT_TOKENIZER)
+    except Exception as e:
+        logger.warning(
+            "Tokenizer '%s' unavailable (%s), estimating token counts.",
+            PROMPT_TOKENIZER,
+            e,
+        )
+        return None
+
+
+def warmup_tokenizer() -> None:
+    """
+    Loads the tokenizer ahead of the first request.
+
+    Loading it can download and parse the BPE file, which would otherwise block
+    the event loop on the first prompt built.
+    """
+    _get_encoding()
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens of a text.
+
+    Parameters
+    ----------
+    text : str
+        The text to measure.
+
+    Returns
+    -------
+    int
+        The number of tokens (an estimate if no tokenizer is available).
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cuts a text down to at most max_tokens tokens.
+
+    Parameters
+    ----------
+    text : str
+        The text to truncate.
+    max_tokens : int
+        The maximum number of tokens to keep.
+
+    Returns
+    -------
+    str
+        The truncated text.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[:max_tokens])
+
+
+def _label(chunks: list[str]) -> list[str]:
+    """
+    Prefixes the chunks with their labels ([S1], [S2], ...).
+    """
+    return [f"[S{i}]\n{chunk}" for i, chunk in enumerate(chunks, start=1)]
+
+
+def select_context(context: list[str], budget: int = CONTEXT_TOKEN_BUDGET) -> list[str]:
+    """
+    Selects retrieved chunks that fit in the token budget, keeping their ranking.
+
+    Chunks are taken best first. The first chunk that does not fit is truncated
+    to the remaining budget (or dropped if too little is left), and every
+    lower-ranked chunk after it is dropped. The selected chunks are a prefix of
+    the context, so their count tells which sources made it into the prompt.
+
+    Parameters
+    ----------
+    context : list[str]
+        Retrieved text chunks, best first.
+    budget : int, optional
+        Token budget for the labeled chunks, by default CONTEXT_TOKEN_BUDGET.
+
+    Returns
+    -------
+    list[str]
+        The chunks to include in the prompt, without labels.
+    """
+    separator_tokens = count_tokens(CHUNK_SEPARATOR)
+    remaining = budget
+    packed = []
+
+    for i, chunk in enumerate(context, start=1):
+        label = f"[S{i}]\n"
+        overhead = count_tokens(label) + (separator_tokens if packed else 0)
+        chunk_tokens = count_tokens(chunk)
+
+        if overhead + chunk_tokens <= remaining:
+            packed.append(chunk)
+            remaining -= overhead + chunk_tokens
+            continue
+
+        if remaining - overhead >= MIN_TRUNCATED_CHUNK_TOKENS:
+            packed.append(truncate_to_tokens(chunk, remaining - overhead))
+        logger.info(
+            "Context budget of %d tokens reached, kept %d of %d chunks.",
+            budget,
+            len(packed),
+            len(context),
+        )
+        break
+
+    return packed
+
+
+def pack_context(context: list[str], budget: int = CONTEXT_TOKEN_BUDGET) -> list[str]:
+    """
+    Selects the chunks that fit in the token budget (see select_context).
+
+    Parameters
+    ----------
+    context : list[str]
+        Retrieved text chunks, best first.
+    budget : int, optional
+        Token budget for the labeled chunks, by default CONTEXT_TOKEN_BUDGET.
+
+    Returns
+    -------
+    list[str]
+        The labeled chunks ([S1], [S2], ...) to include in the prompt.
+    """
+    return _label(select_context(context, budget))
+
+
 def build_prompt(
     query: str,
     context: list[str],
     field_of_study: str | None = None,
     semester: str | None = None,
-) -> str:
+    fit_to_budget: bool = True,
+) -> list[dict[str, str]]:
     """
-    Builds a prompt for the LLM based on the provided user query and context.
+    Builds the chat messages for the LLM based on the user query and context.
 
-    Constructs a formatted string including system instructions, static FAQ knowledge,
-    retrieved context chunks, and optional student metadata (field of study, semester).
+    The first message is the precomputed system prompt (instructions and static
+    FAQ knowledge). The second one carries the per-request part: optional student
+    metadata (field of study, semester), the retrieved context chunks packed
+    against the token budget, and the question.
 
     Parameters
     ----------
     query : str
         The user's question or input.
     context : list[str]
-        A list of text chunks retrieved from the vector database.
+        A list of text chunks retrieved from the vector database, best first.
     field_of_study : str | None, optional
         The student's field of study (e.g., "Informatyka"), by default None.
     semester : str | None, optional
         The student's current semester, by default None.
+    fit_to_budget : bool, optional
+        Whether to pack the context against the token budget. Pass False for a
+        context already returned by select_context, by default True.
 
     Returns
     -------
-    str
-        The fully formatted prompt string ready to be sent to the LLM.
+    list[dict[str, str]]
+        The system and user messages ready to be sent to the LLM.
     """
     logger.info(
         "Building prompt for query: '%s', Field: %s, Sem: %s",
         query,
         field_of_study,
         semester,
+        extra=SAMPLED,
     )
 
-    try:
-        labeled = [f"[S{i}]\n{c}" for i, c in enumerate(context, start=1)]
-        joined_context = "\n\n---\n\n".join(labeled)
+    with stage("build_prompt"):
+        try:
+            labeled = pack_context(context) if fit_to_budget else _label(context)
+            joined_context = CHUNK_SEPARATOR.join(labeled)
+
+            logger.debug("Joined %d context chunks into prompt.", len(labeled))
 
-        logger.debug("Joined %d context chunks into prompt.", len(labeled))
+            student_info = ""
+            if field_of_study and semester:
+                student_info = (
+                    f"Informacja o użytkowniku: Użytkownik studiuje na kierunku '{field_of_study}', "
+                    f"semestr {semester}. Wykorzystaj tę wiedzę przy pytaniach o plan zajęć, "
+                    "przedmioty, sale wykładowe lub egzaminy.\n\n"
+                )
+            elif field_of_study:
+                student_info = f"Informacja o użytkowniku: Użytkownik studiuje na kierunku '{field_of_study}'.\n\n"
 
-        student_info = ""
-        if field_of_study and semester:
-            student_info = (
-                f"Informacja o użytkowniku: Użytkownik studiuje na kierunku '{field_of_study}', "
-                f"semestr {semester}. Wykorzystaj tę wiedzę przy pytaniach o plan zajęć, "
-                "przedmioty, sale wykładowe lub egzaminy."
+            user_prompt = (
+                f"{student_info}"
+                f"---\nKontekst:\n{joined_context}\n---\n\n"
+                f"Pytanie: {query}\n\n"
+                "Odpowiedź:"
             )
-        elif field_of_study:
-            student_info = f"Informacja o użytkowniku: Użytkownik studiuje na kierunku '{field_of_study}'."
-
-        prompt = (
-            "Jesteś pomocnym asystentem o imieniu MiNIonek. Odpowiadasz na pytania studentów i pracowników Wydziału Matematyki i Nauk Informacyjnych (MiNI).\n"
-            "Stworzyli Cię członkowie Koła Naukowego Data Science (KNDS), działającego przy Wydziale MiNI PW. Projekt merytorycznie nadzorowała dr inż. Anna Wróblewska.\n"
-            "ZASADY ODPOWIADANIA:\n"
-            "1. Priorytetyzacja wiedzy: Opieraj swoją odpowiedź głównie na informacjach z sekcji 'Kontekst'. Wybierz z niej maksymalnie 5 najbardziej trafnych fragmentów [Sx] i na nich zbuduj odpowiedź."
-            "Jeśli nie znajdziesz tam odpowiedzi, sprawdź sekcję 'Wiedza ogólna'. "
-            "Możesz korzystać z własnej wiedzy tylko wtedy, gdy informacji brakuje w obu powyższych źródłach.\n"
-            "2. Styl: Odpowiadaj krótko, rzeczowo i po polsku.\n"
-            "3. WAŻNE: Odpowiadaj ZAWSZE w języku POLSKIM. Twoja odpowiedź zostanie automatycznie przetłumaczona na język wybrany przez użytkownika. Nie mieszaj języków i nie dodawaj komentarzy o tłumaczeniu.\n"
-            # "3. Źródła: Na samym końcu odpowiedzi dodaj sekcję 'Źródła:' i wymień w niej maksymalnie 2 najważniejsze identyfikatory (np. [S1], [S2]), na których się opierasz. "
-            # "Nie wymieniaj wszystkich dostępnych fragmentów, jeśli z nich nie korzystasz.\n\n"
-            f"{student_info}\n\n"
-            f"---\n{STATIC_FAQ}\n---\n\n"
-            f"---\nKontekst:\n{joined_context}\n---\n\n"
-            f"Pytanie: {query}\n\n"
-            "Odpowiedź:"
-        )
 
-        logger.info("Prompt built successfully.")
-        return prompt
+            logger.info("Prompt built successfully.")
+            return [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ]
 
-    except Exception as e:
-        logger.error("Failed to build prompt: %s", e, exc_info=True)
-        return ERROR_PROMPT
+        except Exception as e:
+            logger.error("Failed to build prompt: %s", e, exc_info=True)
+            return [{"role": "user", "content": ERROR_PROMPT}]
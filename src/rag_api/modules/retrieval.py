@@ -1,26 +1,479 @@
+import asyncio
 import logging
 import os
+import threading
+import time
 from typing import Any
 
+from src.data_ingest.modules.bm25_index import load_bm25_index
 from src.data_ingest.modules.embedder import Embedder
-from src.data_ingest.modules.vector_db import load_vector_db
+from src.data_ingest.modules.numpy_index import load_numpy_index
+from src.data_ingest.modules.vector_db import (
+    CollectionHandle,
+    get_embedding_model,
+    get_generation,
+)
+from src.rag_api.modules.cache import LRUCache, normalize_query
+from src.rag_api.modules.logs import SAMPLED
+from src.rag_api.modules.metrics import EMBEDDING_BATCH_SIZE, record_cache, stage
+from src.rag_api.modules.micro_batch import MicroBatcher
+from src.rag_api.modules.prompt_builder import warmup_tokenizer
 from src.utils.paths import get_data_dir
 
 logger = logging.getLogger(__name__)
 
 DATABASE_PATH = os.environ.get("CHROMA_DIR", get_data_dir("chroma_db"))
+NUMPY_INDEX_DIR = os.environ.get(
+    "NUMPY_INDEX_DIR", os.path.join(DATABASE_PATH, "numpy_index")
+)
+# "chroma" (HNSW) or "numpy" (exact search over a memory-mapped matrix)
+RETRIEVAL_BACKEND = os.environ.get("RETRIEVAL_BACKEND", "chroma")
 
-logger.info("Loading Embedder model for retrieval...")
-embedder = Embedder()
-logger.info("Embedder loaded.")
+# Hybrid retrieval: BM25 results are fused with the dense ones when the index exists.
+BM25_ENABLED = os.environ.get("BM25_ENABLED", "1") == "1"
+BM25_INDEX_DIR = os.environ.get(
+    "BM25_INDEX_DIR", os.path.join(DATABASE_PATH, "bm25_index")
+)
+# Candidates taken from each retriever before fusion, as a multiple of top_k.
+HYBRID_CANDIDATES_FACTOR = int(os.environ.get("HYBRID_CANDIDATES_FACTOR", 3))
+RRF_K = int(os.environ.get("RRF_K", 60))
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", 2048))
+QUERY_EMBEDDING_CACHE_TTL = float(os.environ.get("QUERY_EMBEDDING_CACHE_TTL", 86400))
+
+# Concurrent query embeddings are grouped into one model call of up to this many
+# queries, waiting at most EMBEDDING_MAX_WAIT_MS for more; 1 disables batching.
+EMBEDDING_MAX_BATCH_SIZE = int(os.environ.get("EMBEDDING_MAX_BATCH_SIZE", 16))
+EMBEDDING_MAX_WAIT_MS = float(os.environ.get("EMBEDDING_MAX_WAIT_MS", 5))
+# Seconds get_index_generation reuses the generation read from disk.
+INDEX_GENERATION_TTL = float(os.environ.get("INDEX_GENERATION_TTL", 1))
+
+if RETRIEVAL_BACKEND == "numpy":
+    collection_handle = CollectionHandle(NUMPY_INDEX_DIR, loader=load_numpy_index)
+else:
+    collection_handle = CollectionHandle(DATABASE_PATH)
+bm25_handle = CollectionHandle(BM25_INDEX_DIR, loader=load_bm25_index)
+query_embedding_cache = LRUCache(
+    maxsize=QUERY_EMBEDDING_CACHE_SIZE,
+    ttl=QUERY_EMBEDDING_CACHE_TTL or None,
+)
+
+_embedder: Embedder | None = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> Embedder:
+    """
+    Returns the process-wide Embedder, loading the model on first use.
+
+    Loading is deferred so that importing this module stays cheap; the API warms
+    it up in the background at startup (see warmup()).
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    Embedder
+        The shared embedder instance.
+    """
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                logger.info("Loading Embedder model for retrieval...")
+                _embedder = Embedder()
+                logger.info("Embedder loaded.")
+    return _embedder
+
+
+def _embed_batch(queries: list[str]) -> list[list[float]]:
+    """
+    Embeds one micro-batch of queries with a single model call.
+    """
+    EMBEDDING_BATCH_SIZE.observe(len(queries))
+    return get_embedder().generate_embeddings(queries)
+
+
+embedding_batcher = MicroBatcher(
+    _embed_batch,
+    max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+    max_wait=EMBEDDING_MAX_WAIT_MS / 1000,
+    name="query-embedding-batcher",
+)
+
+
+def warmup() -> None:
+    """
+    Loads the embedding model and the prompt tokenizer, runs one forward pass
+    and opens the index.
+
+    Called in the background at API startup, so the first request does not pay
+    for model loading and lazy framework initialization.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    get_embedder().generate_embeddings(["warmup"])
+    warmup_tokenizer()
+    collection_handle.get()
+    if _bm25_available():
+        bm25_handle.get()
+
+
+_checked_generation: str | None = None
+
+
+def _check_embedding_model(vector_db: Any) -> None:
+    """
+    Warns once per index generation if the index was built with another model.
+
+    Parameters
+    ----------
+    vector_db : Any
+        The loaded collection.
+
+    Returns
+    -------
+    None
+    """
+    global _checked_generation
+    if collection_handle.generation == _checked_generation:
+        return
+    _checked_generation = collection_handle.generation
+
+    index_model = get_embedding_model(vector_db)
+    if index_model and index_model != get_embedder().model_name:
+        logger.warning(
+            "Index was built with '%s' but queries are embedded with '%s'. "
+            "Set EMBEDDING_MODEL to the same value for ingest and API.",
+            index_model,
+            get_embedder().model_name,
+        )
+
+
+def embed_query(query: str) -> list[float]:
+    """
+    Returns the embedding of a query, reusing cached vectors for repeated queries.
+
+    The cache is keyed on the normalized query (case, whitespace and diacritics
+    folded), so frequent questions skip the model forward pass entirely. Cache
+    misses of concurrent requests are embedded together by embedding_batcher.
+
+    Parameters
+    ----------
+    query : str
+        The user's search query.
+
+    Returns
+    -------
+    list[float]
+        The query embedding.
+    """
+    key = (get_embedder().model_name, normalize_query(query))
+    vector = query_embedding_cache.get(key)
+    record_cache("query_embedding", vector is not None)
+    if vector is None:
+        logger.debug("Generating embedding for query...")
+        # Concurrent requests share one model call (see embedding_batcher)
+        with stage("embed"):
+            vector = embedding_batcher.submit(query)
+        query_embedding_cache.set(key, vector)
+    return vector
+
+
+async def embed_query_async(query: str) -> list[float]:
+    """
+    Runs embed_query in a worker thread so the event loop stays free.
+
+    Parameters
+    ----------
+    query : str
+        The user's search query.
+
+    Returns
+    -------
+    list[float]
+        The query embedding.
+    """
+    return await asyncio.to_thread(embed_query, query)
+
+
+async def embed_queries_async(queries: list[str]) -> list[list[float]]:
+    """
+    Runs embed_queries in a worker thread so the event loop stays free.
+
+    Parameters
+    ----------
+    queries : list[str]
+        The user queries.
+
+    Returns
+    -------
+    list[list[float]]
+        The query embeddings, aligned with the input.
+    """
+    return await asyncio.to_thread(embed_queries, queries)
+
+
+# (generation, time.monotonic() when it was read)
+_index_generation: tuple[str | None, float] | None = None
+
+
+def get_index_generation() -> str | None:
+    """
+    Returns the generation of the index currently written on disk.
+
+    The value is read from disk at most once per INDEX_GENERATION_TTL seconds,
+    since it is called on the event loop for every request.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    str | None
+        The generation identifier, or None if the database does not exist.
+    """
+    global _index_generation
+
+    now = time.monotonic()
+    cached = _index_generation
+    if cached is not None and now - cached[1] < INDEX_GENERATION_TTL:
+        return cached[0]
+
+    generation = get_generation(collection_handle.path_to_database)
+    _index_generation = (generation, now)
+    return generation
+
+
+def get_query_embedding_cache_stats() -> dict[str, Any]:
+    """
+    Returns hit/miss counters of the query embedding cache.
+
+    Returns
+    -------
+    dict[str, Any]
+        The statistics reported by LRUCache.stats().
+    """
+    return query_embedding_cache.stats()
+
+
+def get_embedding_batch_stats() -> dict[str, Any]:
+    """
+    Returns the number of micro-batches and the achieved batch sizes.
+
+    Returns
+    -------
+    dict[str, Any]
+        The statistics reported by MicroBatcher.stats().
+    """
+    return embedding_batcher.stats()
+
+
+def _structure_results(
+    documents: list[str], metadatas: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    """
+    Converts the documents and metadatas of one query result into chunk dicts.
+
+    Parameters
+    ----------
+    documents : list[str]
+        Retrieved documents, best first.
+    metadatas : list[dict[str, Any]]
+        Metadata aligned with the documents.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        Dictionaries with 'text_chunk' and 'source_url'.
+    """
+    return [
+        {
+            "text_chunk": doc,
+            "source_url": (meta or {}).get("url", "Unknown Source"),
+        }
+        for doc, meta in zip(documents, metadatas, strict=False)
+    ]
+
+
+def _bm25_available() -> bool:
+    """
+    Tells whether hybrid retrieval is enabled and a BM25 index has been exported.
+    """
+    return BM25_ENABLED and get_generation(BM25_INDEX_DIR) is not None
+
+
+def _reciprocal_rank_fusion(
+    rankings: list[dict[str, list[Any]]], top_k: int, k: int = RRF_K
+) -> dict[str, list[Any]]:
+    """
+    Merges several ranked result lists with reciprocal-rank fusion.
+
+    Each document scores sum(1 / (k + rank)) over the lists it appears in, so
+    documents ranked well by both retrievers come first. Only ranks are used,
+    which avoids calibrating cosine distances against BM25 scores.
+
+    Parameters
+    ----------
+    rankings : list[dict[str, list[Any]]]
+        Result lists of a single query, each with aligned 'ids', 'documents'
+        and 'metadatas'.
+    top_k : int
+        Number of fused results to return.
+    k : int, optional
+        Rank smoothing constant, by default RRF_K.
+
+    Returns
+    -------
+    dict[str, list[Any]]
+        The fused 'documents' and 'metadatas', best first.
+    """
+    scores: dict[str, float] = {}
+    records: dict[str, tuple[str, dict[str, Any]]] = {}
+    for ranking in rankings:
+        for rank, (doc_id, doc, meta) in enumerate(
+            zip(
+                ranking["ids"], ranking["documents"], ranking["metadatas"], strict=True
+            ),
+            start=1,
+        ):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+            records.setdefault(doc_id, (doc, meta))
+
+    fused = sorted(scores, key=scores.__getitem__, reverse=True)[:top_k]
+    return {
+        "documents": [records[doc_id][0] for doc_id in fused],
+        "metadatas": [records[doc_id][1] for doc_id in fused],
+    }
+
+
+def _search(
+    vector_db: Any,
+    queries: list[str],
+    query_embeddings: list[list[float]],
+    top_k: int,
+) -> list[list[dict[str, Any]]]:
+    """
+    Runs dense search, fused with BM25 when available, for several queries.
+
+    Parameters
+    ----------
+    vector_db : Any
+        The loaded collection.
+    queries : list[str]
+        The query texts.
+    query_embeddings : list[list[float]]
+        Their embeddings, aligned with queries.
+    top_k : int
+        Number of results per query.
+
+    Returns
+    -------
+    list[list[dict[str, Any]]]
+        Structured results per query, in input order.
+    """
+    if not _bm25_available():
+        logger.debug("Querying vector database with %d vectors...", len(queries))
+        with stage("search"):
+            results = vector_db.query(
+                query_embeddings=query_embeddings,
+                n_results=top_k,
+                include=["documents", "metadatas"],
+            )
+        documents = results["documents"] or [[] for _ in queries]
+        metadatas = results["metadatas"] or [[] for _ in queries]
+        return [
+            _structure_results(docs, metas)
+            for docs, metas in zip(documents, metadatas, strict=True)
+        ]
+
+    n_candidates = top_k * HYBRID_CANDIDATES_FACTOR
+    logger.debug("Hybrid search for %d queries...", len(queries))
+    with stage("search"):
+        dense = vector_db.query(
+            query_embeddings=query_embeddings,
+            n_results=n_candidates,
+            include=["documents", "metadatas"],
+        )
+    with stage("bm25"):
+        lexical = bm25_handle.get().query(
+            query_texts=queries,
+            n_results=n_candidates,
+            include=["documents", "metadatas"],
+        )
+
+    structured = []
+    for i in range(len(queries)):
+        fused = _reciprocal_rank_fusion(
+            [
+                {field: dense[field][i] for field in ("ids", "documents", "metadatas")},
+                {
+                    field: lexical[field][i]
+                    for field in ("ids", "documents", "metadatas")
+                },
+            ],
+            top_k,
+        )
+        structured.append(_structure_results(fused["documents"], fused["metadatas"]))
+    return structured
+
+
+def embed_queries(queries: list[str]) -> list[list[float]]:
+    """
+    Embeds several queries, running the model once for all cache misses.
+
+    Parameters
+    ----------
+    queries : list[str]
+        The user queries.
+
+    Returns
+    -------
+    list[list[float]]
+        The query embeddings, aligned with the input.
+    """
+    keys = [(get_embedder().model_name, normalize_query(query)) for query in queries]
+    vectors = [query_embedding_cache.get(key) for key in keys]
+    for vector in vectors:
+        record_cache("query_embedding", vector is not None)
+
+    missing: dict[tuple[str, str], str] = {}
+    for key, query, vector in zip(keys, queries, vectors, strict=True):
+        if vector is None:
+            missing.setdefault(key, query)
+
+    if missing:
+        logger.debug("Generating embeddings for %d queries...", len(missing))
+        with stage("embed"):
+            embeddings = get_embedder().generate_embeddings(list(missing.values()))
+        computed = dict(zip(missing, embeddings, strict=True))
+        for key, vector in computed.items():
+            query_embedding_cache.set(key, vector)
+        vectors = [
+            computed[key] if vector is None else vector
+            for key, vector in zip(keys, vectors, strict=True)
+        ]
+
+    return vectors
 
 
 def get_top_k_chunks(query: str, top_k: int = 5) -> list[dict[str, Any]]:
     """
     Retrieves the top-k most relevant text chunks from the vector database.
 
-    Connects to the ChromaDB, generates an embedding for the user query,
-    and performs a similarity search to find the most relevant documents.
+    Uses the process-wide ChromaDB handle, generates an embedding for the user
+    query, and performs a similarity search to find the most relevant documents.
+    When a BM25 index is available, lexical matches (course codes, room numbers,
+    surnames) are fused with the dense results using reciprocal-rank fusion.
 
     Parameters
     ----------
@@ -36,36 +489,16 @@ def get_top_k_chunks(query: str, top_k: int = 5) -> list[dict[str, Any]]:
         - 'text_chunk': The text content of the retrieved document.
         - 'source_url': The URL source of the document.
     """
-    logger.info("Starting retrieval for top %d chunks. Query: '%s'", top_k, query)
+    logger.info(
+        "Starting retrieval for top %d chunks. Query: '%s'", top_k, query, extra=SAMPLED
+    )
 
     try:
-        logger.debug("Loading vector database from: %s", DATABASE_PATH)
-        vector_db = load_vector_db(DATABASE_PATH)
-
-        logger.debug("Generating embedding for query...")
-        # Embedder expects a list of strings and returns a list of vectors
-        query_embedding = embedder.generate_embeddings([query])
-
-        logger.debug("Querying vector database...")
-        results = vector_db.query(
-            query_embeddings=query_embedding,
-            n_results=top_k,
-            include=["documents", "metadatas"],
-        )
+        vector_db = collection_handle.get()
+        _check_embedding_model(vector_db)
 
-        structured_results = []
-
-        if results["documents"] and results["documents"][0]:
-            documents = results["documents"][0]
-            metadatas = results["metadatas"][0]
-
-            for doc, meta in zip(documents, metadatas, strict=False):
-                structured_results.append(
-                    {
-                        "text_chunk": doc,
-                        "source_url": meta.get("url", "Unknown Source"),
-                    }
-                )
+        query_embedding = embed_query(query)
+        structured_results = _search(vector_db, [query], [query_embedding], top_k)[0]
 
         logger.info("Successfully retrieved %d results.", len(structured_results))
         return structured_results
@@ -73,3 +506,87 @@ def get_top_k_chunks(query: str, top_k: int = 5) -> list[dict[str, Any]]:
     except Exception as e:
         logger.error("Failed during chunk retrieval: %s", e, exc_info=True)
         return []
+
+
+async def get_top_k_chunks_async(query: str, top_k: int = 5) -> list[dict[str, Any]]:
+    """
+    Runs get_top_k_chunks in a worker thread so the event loop stays free.
+
+    The embedding forward pass and the ANN search are CPU-bound and release
+    the GIL for most of their work, so they are offloaded instead of awaited inline.
+
+    Parameters
+    ----------
+    query : str
+        The user's search query.
+    top_k : int, optional
+        The number of top results to retrieve, by default 5.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        The same structure as returned by get_top_k_chunks.
+    """
+    return await asyncio.to_thread(get_top_k_chunks, query, top_k)
+
+
+def get_top_k_chunks_batch(
+    queries: list[str], top_k: int = 5
+) -> list[list[dict[str, Any]]]:
+    """
+    Retrieves the top-k chunks for many queries at once.
+
+    All queries are embedded in a single model call and searched with one
+    multi-vector query, which is much cheaper than one call per query.
+
+    Parameters
+    ----------
+    queries : list[str]
+        The user's search queries.
+    top_k : int, optional
+        The number of top results to retrieve per query, by default 5.
+
+    Returns
+    -------
+    list[list[dict[str, Any]]]
+        One result list per query, in input order, each with the same structure
+        as returned by get_top_k_chunks. On failure every list is empty.
+    """
+    if not queries:
+        return []
+
+    logger.info(
+        "Starting batch retrieval of top %d chunks for %d queries.", top_k, len(queries)
+    )
+
+    try:
+        vector_db = collection_handle.get()
+        _check_embedding_model(vector_db)
+
+        query_embeddings = embed_queries(queries)
+        return _search(vector_db, queries, query_embeddings, top_k)
+
+    except Exception as e:
+        logger.error("Failed during batch chunk retrieval: %s", e, exc_info=True)
+        return [[] for _ in queries]
+
+
+async def get_top_k_chunks_batch_async(
+    queries: list[str], top_k: int = 5
+) -> list[list[dict[str, Any]]]:
+    """
+    Runs get_top_k_chunks_batch in a worker thread so the event loop stays free.
+
+    Parameters
+    ----------
+    queries : list[str]
+        The user's search queries.
+    top_k : int, optional
+        The number of top results to retrieve per query, by default 5.
+
+    Returns
+    -------
+    list[list[dict[str, Any]]]
+        The same structure as returned by get_top_k_chunks_batch.
+    """
+    return await asyncio.to_thread(get_top_k_chunks_batch, queries, top_k)
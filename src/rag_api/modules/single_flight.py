@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import threading
+from collections.abc import Awaitable, Callable, Hashable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderAbortedError(RuntimeError):
+    """
+    Raised to followers when the in-flight computation was abandoned without a
+    result (e.g. the streaming client disconnected).
+    """
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent identical calls made from threads.
+
+    The first caller for a key (the leader) runs the function; callers arriving
+    while it runs wait for it and receive the same result or exception. Nothing
+    is kept once the call has finished, so this is not a cache.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty table of in-flight calls.
+        """
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, tuple[threading.Event, dict[str, Any]]] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Runs fn once for all concurrent callers with the same key.
+
+        Parameters
+        ----------
+        key : Hashable
+            Identifies identical calls.
+        fn : Callable[[], Any]
+            The computation to run.
+
+        Returns
+        -------
+        Any
+            The result of fn, shared by all callers that joined the call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = (threading.Event(), {})
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+            else:
+                self.followers += 1
+                leader = False
+
+        done, outcome = call
+        if not leader:
+            done.wait()
+            if "error" in outcome:
+                raise outcome["error"]
+            return outcome["result"]
+
+        try:
+            outcome["result"] = fn()
+            return outcome["result"]
+        except BaseException as e:
+            outcome["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            done.set()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the number of executed and coalesced calls.
+        """
+        return {"leaders": self.leaders, "followers": self.followers}
+
+
+class AsyncSingleFlight:
+    """
+    Deduplicates concurrent identical calls within one event loop.
+
+    The leader's computation runs as a separate task and followers await it
+    through asyncio.shield, so a client that disconnects cancels only its own
+    wait, never the work the other callers depend on. Computations that produce
+    their result piece by piece (e.g. a token stream) can take part through
+    lead(), which publishes the final result once it is known.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty table of in-flight calls.
+        """
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _track(self, key: Hashable, future: asyncio.Future) -> None:
+        """
+        Registers an in-flight call and removes it once it completes.
+        """
+
+        def forget(done: asyncio.Future) -> None:
+            if self._calls.get(key) is done:
+                del self._calls[key]
+            if not done.cancelled():
+                # Mark the exception as retrieved even if no follower awaited it.
+                done.exception()
+
+        self._calls[key] = future
+        future.add_done_callback(forget)
+        self.leaders += 1
+
+    async def join(self, key: Hashable) -> Any | None:
+        """
+        Waits for an in-flight call with the same key, if there is one.
+
+        Parameters
+        ----------
+        key : Hashable
+            Identifies identical calls.
+
+        Returns
+        -------
+        Any | None
+            The shared result, or None if nothing is in flight. When it returns
+            None the caller can become the leader without awaiting in between.
+        """
+        while (future := self._calls.get(key)) is not None:
+            self.followers += 1
+            try:
+                return await asyncio.shield(future)
+            except LeaderAbortedError:
+                # Another follower may have taken over in the meantime.
+                continue
+        return None
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Awaits the computation once for all concurrent callers with the same key.
+
+        Parameters
+        ----------
+        key : Hashable
+            Identifies identical calls.
+        factory : Callable[[], Awaitable[Any]]
+            Creates the coroutine computing the result.
+
+        Returns
+        -------
+        Any
+            The result, shared by all callers that joined the call.
+        """
+        if key in self._calls:
+            result = await self.join(key)
+            if result is not None:
+                return result
+
+        task = asyncio.ensure_future(factory())
+        self._track(key, task)
+        return await asyncio.shield(task)
+
+    @contextmanager
+    def lead(self, key: Hashable) -> Iterator[asyncio.Future]:
+        """
+        Registers the caller as the leader of a call it computes itself.
+
+        The caller must set the result on the yielded future. If the block is
+        left without a result, followers are released and compute on their own.
+
+        Parameters
+        ----------
+        key : Hashable
+            Identifies identical calls. Call join() first; there must be no
+            call in flight for the key.
+
+        Yields
+        ------
+        asyncio.Future
+            The future to resolve with the final result.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._track(key, future)
+        try:
+            yield future
+        finally:
+            if not future.done():
+                future.set_exception(
+                    LeaderAbortedError("Leader finished without a result.")
+                )
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the number of executed and coalesced calls.
+        """
+        return {"leaders": self.leaders, "followers": self.followers}
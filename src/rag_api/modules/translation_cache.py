@@ -0,0 +1,207 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from src.rag_api.modules.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationCache:
+    """
+    Two-tier cache of LLM translations keyed on (text hash, target language, model).
+
+    The front tier is an in-memory LRU; the back tier is a sqlite file that survives
+    restarts. The sqlite table is capped at `max_entries` rows, evicting the least
+    recently used translations first.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model: str,
+        memory_size: int = 1024,
+        max_entries: int = 100_000,
+    ):
+        """
+        Opens (or creates) the sqlite cache file.
+
+        Parameters
+        ----------
+        path : str
+            Path to the sqlite file.
+        model : str
+            Name of the translation model; part of the cache key.
+        memory_size : int, optional
+            Number of entries kept in the in-memory tier, by default 1024.
+        max_entries : int, optional
+            Maximum number of rows kept on disk, by default 100000.
+        """
+        self.path = path
+        self.model = model
+        self.max_entries = max_entries
+        self.memory = LRUCache(maxsize=memory_size)
+        self._lock = threading.Lock()
+        self._inserts_since_trim = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                text_hash TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                model TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (text_hash, target_lang, model)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_used ON translations (last_used)"
+        )
+        self._conn.commit()
+        self.disk_hits = 0
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        """
+        Returns the SHA-256 hex digest of the text.
+        """
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, text: str, target_lang_code: str) -> str | None:
+        """
+        Returns the cached translation of text, or None if it is not cached.
+
+        Parameters
+        ----------
+        text : str
+            The source text.
+        target_lang_code : str
+            The target language code.
+
+        Returns
+        -------
+        str | None
+            The cached translation or None.
+        """
+        key = (self._hash(text), target_lang_code)
+        translation = self.memory.get(key)
+        if translation is not None:
+            return translation
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT translation FROM translations "
+                "WHERE text_hash = ? AND target_lang = ? AND model = ?",
+                (key[0], target_lang_code, self.model),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE translations SET last_used = ? "
+                "WHERE text_hash = ? AND target_lang = ? AND model = ?",
+                (time.time(), key[0], target_lang_code, self.model),
+            )
+            self._conn.commit()
+            self.disk_hits += 1
+
+        self.memory.set(key, row[0])
+        return row[0]
+
+    def set(self, text: str, target_lang_code: str, translation: str) -> None:
+        """
+        Stores a translation in both tiers.
+
+        Parameters
+        ----------
+        text : str
+            The source text.
+        target_lang_code : str
+            The target language code.
+        translation : str
+            The translated text.
+        """
+        self.set_many([(text, target_lang_code, translation)])
+
+    def set_many(self, entries: list[tuple[str, str, str]]) -> None:
+        """
+        Stores several translations in a single transaction.
+
+        Parameters
+        ----------
+        entries : list[tuple[str, str, str]]
+            (text, target_lang_code, translation) triples.
+        """
+        now = time.time()
+        rows = []
+        for text, target_lang_code, translation in entries:
+            text_hash = self._hash(text)
+            self.memory.set((text_hash, target_lang_code), translation)
+            rows.append((text_hash, target_lang_code, self.model, translation, now))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations "
+                "(text_hash, target_lang, model, translation, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._inserts_since_trim += len(rows)
+            if self._inserts_since_trim >= max(1, self.max_entries // 100):
+                self._trim_locked()
+            self._conn.commit()
+
+    def _trim_locked(self) -> None:
+        """
+        Deletes the least recently used rows above max_entries; the caller must hold the lock.
+        """
+        self._inserts_since_trim = 0
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM translations WHERE rowid IN ("
+                "SELECT rowid FROM translations ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            logger.info("Evicted %d translations from the cache.", excess)
+
+    def prepopulate(self, translations: dict[str, dict[str, str]]) -> None:
+        """
+        Seeds the cache with known translations of fixed strings.
+
+        Parameters
+        ----------
+        translations : dict[str, dict[str, str]]
+            Mapping of source text to {target_lang_code: translation}.
+        """
+        self.set_many(
+            [
+                (text, lang, translated)
+                for text, by_lang in translations.items()
+                for lang, translated in by_lang.items()
+            ]
+        )
+        logger.info(
+            "Translation cache seeded with %d fixed strings.", len(translations)
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the counters of the in-memory tier and the number of disk hits.
+
+        Returns
+        -------
+        dict[str, Any]
+            LRUCache.stats() extended with 'disk_hits'.
+        """
+        return {**self.memory.stats(), "disk_hits": self.disk_hits}
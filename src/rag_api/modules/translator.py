@@ -1,44 +1,192 @@
+import asyncio
 import logging
+import os
+from collections.abc import AsyncIterator
 
-from src.pipeline.common import MODEL_WORKER, get_llm_client
+from src.pipeline.common import MODEL_WORKER, get_async_llm_client, get_llm_client
+from src.rag_api.modules.metrics import record_cache, stage
+from src.rag_api.modules.translation_cache import TranslationCache
+from src.utils.paths import get_data_dir
 
 logger = logging.getLogger(__name__)
 
+LANG_MAP = {"pl": "Polish", "en": "English", "ua": "Ukrainian"}
 
-def translate_text(text: str, target_lang_code: str) -> str:
+
+class TranslationError(RuntimeError):
     """
-    Translates the input text into the target language specified by target_lang_code.
-    Supported target_lang_code values: "pl" (Polish), "en" (English), "ua" (Ukrainian).
+    Raised by the strict translation helpers when the translation request fails.
     """
-    if not text:
-        return ""
 
-    lang_map = {"pl": "Polish", "en": "English", "ua": "Ukrainian"}
 
-    target_lang_name = lang_map.get(target_lang_code, "Polish")
+TRANSLATION_CACHE_PATH = os.environ.get(
+    "TRANSLATION_CACHE_PATH", get_data_dir("cache", "translations.sqlite3")
+)
 
-    client = get_llm_client()
+translation_cache = TranslationCache(
+    TRANSLATION_CACHE_PATH,
+    model=MODEL_WORKER,
+    memory_size=int(os.environ.get("TRANSLATION_CACHE_MEMORY_SIZE", 1024)),
+    max_entries=int(os.environ.get("TRANSLATION_CACHE_MAX_ENTRIES", 100_000)),
+)
 
+
+def _build_messages(text: str, target_lang_name: str) -> list[dict[str, str]]:
+    """
+    Builds the chat messages asking the LLM to translate text.
+
+    Parameters
+    ----------
+    text : str
+        The text to translate.
+    target_lang_name : str
+        Full English name of the target language (e.g. "Polish").
+
+    Returns
+    -------
+    list[dict[str, str]]
+        The system and user messages for the chat completion call.
+    """
     system_prompt = (
         f"You are a professional translator. Translate the following text into {target_lang_name}."
         "Preserve the original meaning, tone, formatting, and specific terminology (e.g. university names)."
         "Return ONLY the translated text, without any additional comments, introductory phrases, and explanations."
         "Use appropriate vocabulary and grammatical structures specific to the given language."
     )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": text},
+    ]
+
+
+def translate_text(text: str, target_lang_code: str) -> str:
+    """
+    Translates the input text into the target language specified by target_lang_code.
+    Supported target_lang_code values: "pl" (Polish), "en" (English), "ua" (Ukrainian).
+    Successful translations are cached on disk and reused across restarts.
+    """
+    if not text:
+        return ""
+
+    cached = translation_cache.get(text, target_lang_code)
+    record_cache("translation", cached is not None)
+    if cached is not None:
+        return cached
+
+    target_lang_name = LANG_MAP.get(target_lang_code, "Polish")
+
+    client = get_llm_client()
+
+    try:
+        logger.debug(f"Translating text to {target_lang_name}...")
+        with stage("translate"):
+            response = client.chat.completions.create(
+                model=MODEL_WORKER,
+                messages=_build_messages(text, target_lang_name),
+                temperature=0.1,
+            )
+        translated_text = response.choices[0].message.content.strip()
+        if translated_text:
+            translation_cache.set(text, target_lang_code, translated_text)
+        return translated_text
+
+    except Exception as e:
+        logger.error(f"Translation to {target_lang_name} failed: {e}")
+        return text
+
+
+async def translate_text_async(
+    text: str, target_lang_code: str, strict: bool = False
+) -> str:
+    """
+    Asynchronous variant of translate_text that does not block the event loop.
+    Falls back to the original text if the translation fails, or raises
+    TranslationError instead if strict is set.
+    """
+    if not text:
+        return ""
+
+    # The sqlite tier is queried in a worker thread to keep the event loop free.
+    cached = await asyncio.to_thread(translation_cache.get, text, target_lang_code)
+    record_cache("translation", cached is not None)
+    if cached is not None:
+        return cached
+
+    target_lang_name = LANG_MAP.get(target_lang_code, "Polish")
+
+    client = get_async_llm_client()
 
     try:
         logger.debug(f"Translating text to {target_lang_name}...")
-        response = client.chat.completions.create(
-            model=MODEL_WORKER,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": text},
-            ],
-            temperature=0.1,
-        )
+        with stage("translate"):
+            response = await client.chat.completions.create(
+                model=MODEL_WORKER,
+                messages=_build_messages(text, target_lang_name),
+                temperature=0.1,
+            )
         translated_text = response.choices[0].message.content.strip()
+        if translated_text:
+            await asyncio.to_thread(
+                translation_cache.set, text, target_lang_code, translated_text
+            )
         return translated_text
 
     except Exception as e:
         logger.error(f"Translation to {target_lang_name} failed: {e}")
+        if strict:
+            raise TranslationError(str(e)) from e
         return text
+
+
+async def stream_translate_text_async(
+    text: str, target_lang_code: str, strict: bool = False
+) -> AsyncIterator[str]:
+    """
+    Streams the translation of text token by token.
+    Yields the original text if the translation fails before producing any output.
+    If strict is set, any failure raises TranslationError instead, also after
+    part of the translation has been yielded.
+    """
+    if not text:
+        return
+
+    cached = await asyncio.to_thread(translation_cache.get, text, target_lang_code)
+    record_cache("translation", cached is not None)
+    if cached is not None:
+        yield cached
+        return
+
+    target_lang_name = LANG_MAP.get(target_lang_code, "Polish")
+
+    client = get_async_llm_client()
+
+    parts = []
+    try:
+        logger.debug(f"Streaming translation to {target_lang_name}...")
+        with stage("translate"):
+            stream = await client.chat.completions.create(
+                model=MODEL_WORKER,
+                messages=_build_messages(text, target_lang_name),
+                temperature=0.1,
+                stream=True,
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+
+        translated_text = "".join(parts).strip()
+        if translated_text:
+            await asyncio.to_thread(
+                translation_cache.set, text, target_lang_code, translated_text
+            )
+
+    except Exception as e:
+        logger.error(f"Streaming translation to {target_lang_name} failed: {e}")
+        if strict:
+            raise TranslationError(str(e)) from e
+        if not parts:
+            yield text
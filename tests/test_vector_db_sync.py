@@ -0,0 +1,277 @@
+import hashlib
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from src.data_ingest.modules.vector_db import (  # noqa: E402
+    _get_or_create_collection,
+    fact_id,
+    get_generation,
+    iter_collection,
+    sync_vector_db,
+)
+from src.pipeline import ingest_facts  # noqa: E402
+from src.pipeline.ingest_facts import export_indexes, iter_facts  # noqa: E402
+
+
+class FakeEmbedder:
+    """
+    Deterministic embedder recording the texts it was asked to embed.
+    """
+
+    def __init__(self):
+        self.calls: list[str] = []
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        self.calls.extend(texts)
+        return [
+            [b / 255 for b in hashlib.sha256(text.encode()).digest()[:8]]
+            for text in texts
+        ]
+
+
+def write_facts(input_dir, filename, facts):
+    path = input_dir / filename
+    path.write_text(
+        json.dumps([{"fact": text, "source": url} for text, url in facts]),
+        encoding="utf-8",
+    )
+    return path
+
+
+def stored_records(db_path):
+    collection = _get_or_create_collection(str(db_path), None)
+    records = {}
+    for page in iter_collection(collection, include=["documents", "metadatas"]):
+        for id_, doc, meta in zip(
+            page["ids"], page["documents"], page["metadatas"], strict=True
+        ):
+            records[id_] = (doc, meta["url"])
+    return records
+
+
+def sync(input_dir, db_path, embed):
+    failed: list[str] = []
+    counts = sync_vector_db(
+        lambda: iter_facts(str(input_dir), failed=failed),
+        str(db_path),
+        embed,
+        keep_stale=lambda: bool(failed),
+    )
+    return counts, failed
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    input_dir = tmp_path / "facts"
+    input_dir.mkdir()
+    return input_dir, tmp_path / "chroma_db"
+
+
+def test_adds_new_facts(dirs):
+    input_dir, db_path = dirs
+    write_facts(input_dir, "a.json", [("Fact A1", "url-a"), ("Fact A2", "url-a")])
+    embed = FakeEmbedder()
+
+    counts, _ = sync(input_dir, db_path, embed)
+
+    assert counts["added"] == 2
+    assert sorted(embed.calls) == ["Fact A1", "Fact A2"]
+    assert stored_records(db_path) == {
+        fact_id("Fact A1", "url-a"): ("Fact A1", "url-a"),
+        fact_id("Fact A2", "url-a"): ("Fact A2", "url-a"),
+    }
+
+
+def test_unchanged_input_embeds_nothing(dirs):
+    input_dir, db_path = dirs
+    write_facts(input_dir, "a.json", [("Fact A1", "url-a")])
+    sync(input_dir, db_path, FakeEmbedder())
+    generation = get_generation(str(db_path))
+    embed = FakeEmbedder()
+
+    counts, _ = sync(input_dir, db_path, embed)
+
+    assert counts == {
+        "added": 0,
+        "migrated": 0,
+        "deleted": 0,
+        "unchanged": 1,
+        "kept": 0,
+    }
+    assert embed.calls == []
+    assert get_generation(str(db_path)) == generation
+
+
+def test_changed_fact_replaces_the_old_one(dirs):
+    input_dir, db_path = dirs
+    write_facts(input_dir, "a.json", [("Fact A1", "url-a"), ("Fact A2", "url-a")])
+    sync(input_dir, db_path, FakeEmbedder())
+    write_facts(input_dir, "a.json", [("Fact A1", "url-a"), ("Fact A2 v2", "url-a")])
+    embed = FakeEmbedder()
+
+    counts, _ = sync(input_dir, db_path, embed)
+
+    assert (counts["added"], counts["deleted"], counts["unchanged"]) == (1, 1, 1)
+    assert embed.calls == ["Fact A2 v2"]
+    assert {doc for doc, _ in stored_records(db_path).values()} == {
+        "Fact A1",
+        "Fact A2 v2",
+    }
+
+
+def test_removed_file_deletes_its_facts(dirs):
+    input_dir, db_path = dirs
+    write_facts(input_dir, "a.json", [("Fact A1", "url-a")])
+    b = write_facts(input_dir, "b.json", [("Fact B1", "url-b")])
+    sync(input_dir, db_path, FakeEmbedder())
+    b.unlink()
+
+    counts, _ = sync(input_dir, db_path, FakeEmbedder())
+
+    assert counts["deleted"] == 1
+    assert list(stored_records(db_path).values()) == [("Fact A1", "url-a")]
+
+
+@pytest.mark.parametrize("content", ["{not json", '{"fact": "not a list"}'])
+def test_unreadable_file_keeps_its_facts(dirs, content):
+    input_dir, db_path = dirs
+    write_facts(input_dir, "a.json", [("Fact A1", "url-a")])
+    b = write_facts(input_dir, "b.json", [("Fact B1", "url-b")])
+    sync(input_dir, db_path, FakeEmbedder())
+    b.write_text(content, encoding="utf-8")
+    write_facts(input_dir, "c.json", [("Fact C1", "url-c")])
+
+    counts, failed = sync(input_dir, db_path, FakeEmbedder())
+
+    assert set(failed) == {"b.json"}
+    assert (counts["added"], counts["deleted"], counts["kept"]) == (1, 0, 1)
+    assert {doc for doc, _ in stored_records(db_path).values()} == {
+        "Fact A1",
+        "Fact B1",
+        "Fact C1",
+    }
+
+
+def test_legacy_ids_are_migrated_without_embedding(dirs):
+    input_dir, db_path = dirs
+    embed = FakeEmbedder()
+    collection = _get_or_create_collection(str(db_path), None)
+    collection.add(
+        ids=["ids_1", "ids_2", "ids_3"],
+        documents=["Fact A1", "Fact A2", "Fact A1"],
+        embeddings=embed(["Fact A1", "Fact A2", "Fact A1"]),
+        metadatas=[{"url": "url-a"}] * 3,
+    )
+    write_facts(input_dir, "a.json", [("Fact A1", "url-a"), ("Fact A3", "url-a")])
+    embed = FakeEmbedder()
+
+    counts, _ = sync(input_dir, db_path, embed)
+
+    assert (counts["added"], counts["migrated"], counts["deleted"]) == (1, 1, 1)
+    assert embed.calls == ["Fact A3"]
+    assert stored_records(db_path) == {
+        fact_id("Fact A1", "url-a"): ("Fact A1", "url-a"),
+        fact_id("Fact A3", "url-a"): ("Fact A3", "url-a"),
+    }
+
+
+def test_legacy_duplicates_are_removed_when_input_is_incomplete(dirs):
+    input_dir, db_path = dirs
+    embed = FakeEmbedder()
+    collection = _get_or_create_collection(str(db_path), None)
+    collection.add(
+        ids=["ids_1", "ids_2"],
+        documents=["Fact A1", "Fact B1"],
+        embeddings=embed(["Fact A1", "Fact B1"]),
+        metadatas=[{"url": "url-a"}, {"url": "url-b"}],
+    )
+    write_facts(input_dir, "a.json", [("Fact A1", "url-a")])
+    (input_dir / "b.json").write_text("{not json", encoding="utf-8")
+
+    counts, _ = sync(input_dir, db_path, FakeEmbedder())
+
+    assert (counts["migrated"], counts["deleted"], counts["kept"]) == (1, 0, 1)
+    assert set(stored_records(db_path)) == {fact_id("Fact A1", "url-a"), "ids_2"}
+
+
+def test_empty_input_is_refused(dirs):
+    input_dir, db_path = dirs
+    a = write_facts(input_dir, "a.json", [("Fact A1", "url-a")])
+    sync(input_dir, db_path, FakeEmbedder())
+    a.unlink()
+
+    with pytest.raises(ValueError, match="no facts"):
+        sync(input_dir, db_path, FakeEmbedder())
+
+    assert list(stored_records(db_path).values()) == [("Fact A1", "url-a")]
+
+
+def test_malformed_items_are_skipped(dirs):
+    input_dir, db_path = dirs
+    (input_dir / "a.json").write_text(
+        json.dumps(["bare string", {"fact": "Fact A1", "source": "url-a"}, None]),
+        encoding="utf-8",
+    )
+    write_facts(input_dir, "b.json", [("Fact B1", "url-b")])
+
+    counts, failed = sync(input_dir, db_path, FakeEmbedder())
+
+    assert failed == []
+    assert counts["added"] == 2
+    assert {doc for doc, _ in stored_records(db_path).values()} == {
+        "Fact A1",
+        "Fact B1",
+    }
+
+
+def test_collection_handle_stops_the_replaced_system(dirs, monkeypatch):
+    from chromadb.api.client import SharedSystemClient
+
+    from src.data_ingest.modules import vector_db
+
+    input_dir, db_path = dirs
+    monkeypatch.setattr(vector_db, "RETIRED_SYSTEM_GRACE_SECONDS", 0)
+    other = input_dir.parent / "other_db"
+    _get_or_create_collection(str(other), None)
+    write_facts(input_dir, "a.json", [("Fact A1", "url-a")])
+    sync(input_dir, db_path, FakeEmbedder())
+    handle = vector_db.CollectionHandle(str(db_path))
+    assert handle.get().count() == 1
+    old_system = SharedSystemClient._identifier_to_system[str(db_path)]
+    stopped = threading.Event()
+    monkeypatch.setattr(old_system, "stop", stopped.set)
+
+    write_facts(input_dir, "b.json", [("Fact B1", "url-b")])
+    sync(input_dir, db_path, FakeEmbedder())
+
+    assert handle.get().count() == 2
+    assert stopped.wait(5)
+    assert str(other) in SharedSystemClient._identifier_to_system
+
+
+def test_interrupted_export_is_redone_by_the_next_run(dirs, monkeypatch):
+    input_dir, db_path = dirs
+    numpy_dir, bm25_dir = str(db_path / "numpy_index"), str(db_path / "bm25_index")
+    write_facts(input_dir, "a.json", [("Fact A1", "url-a")])
+    sync(input_dir, db_path, FakeEmbedder())
+    export_indexes(str(db_path), numpy_dir, bm25_dir)
+    write_facts(input_dir, "b.json", [("Fact B1", "url-b")])
+    sync(input_dir, db_path, FakeEmbedder())
+
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    with monkeypatch.context() as m:
+        m.setattr(ingest_facts, "export_bm25_index", crash)
+        with pytest.raises(KeyboardInterrupt):
+            export_indexes(str(db_path), numpy_dir, bm25_dir)
+
+    # The BM25 index still holds the previous generation and is rebuilt alone.
+    assert export_indexes(str(db_path), numpy_dir, bm25_dir) == [bm25_dir]
+    assert export_indexes(str(db_path), numpy_dir, bm25_dir) == []
+    with open(f"{bm25_dir}/documents.jsonl", encoding="utf-8") as f:
+        assert len(f.readlines()) == 2